@@ -1,6 +1,7 @@
 from google import genai
 import os
 from dotenv import load_dotenv
+from llm_budget import get_budget, is_rate_limit_error
 
 load_dotenv()
 
@@ -9,6 +10,7 @@ if not api_key:
     raise ValueError("GEMINI_API_KEY not found in .env")
 
 client = genai.Client(api_key=api_key)
+budget = get_budget()
 
 def generate_summary(project, percent, delayed):
 
@@ -34,9 +36,20 @@ Include:
 Do not explain instructions.
 """
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt
-    )
+    # Summaries are optional: a template answers once the budget runs low
+    reservation = budget.acquire("summary", prompt)
+    if reservation is None:
+        return (f"{project} is {percent:.1f}% complete with {delayed} delayed task(s). "
+                f"Risk level: {risk}. (local summary)")
+
+    try:
+        response = client.models.generate_content(
+            model="gemini-2.5-flash",
+            contents=prompt
+        )
+    except Exception as e:
+        budget.settle(reservation, failed=True, rate_limited=is_rate_limit_error(e))
+        raise
+    budget.settle(reservation, getattr(response, "usage_metadata", None))
 
     return response.text.strip()
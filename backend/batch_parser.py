@@ -0,0 +1,161 @@
+"""
+Batch parsing pipeline for transcript replays and meeting-note imports.
+
+Runs the local regex parser plus spaCy entity enrichment over many
+messages at once. Never touches the database or the Gemini API.
+
+Messages are split into chunks and fanned out over a process pool sized
+to the available cores. Each worker loads its own spaCy pipeline once and
+enriches its chunk with `nlp.pipe`, so results can be streamed back chunk
+by chunk as they complete.
+"""
+
+import os
+from concurrent.futures import as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import spacy
+
+from parser import parse_command
+from config import config
+from process_pools import get_process_pool
+
+
+SPACY_MODEL = "en_core_web_sm"
+
+# Custom EntityRuler patterns for project names and task counts
+ENTITY_PATTERNS = [
+    {"label": "PROJECT", "pattern": [{"LOWER": "project"}, {"IS_ALPHA": True}]},
+    {"label": "PROJECT", "pattern": [{"LOWER": "project"}, {"IS_ALPHA": True}, {"IS_ALPHA": True}]},
+    {"label": "TASK_COUNT", "pattern": [{"IS_DIGIT": True}, {"LOWER": {"IN": ["tasks", "task", "items"]}}]},
+]
+
+_local_nlp = None        # Pipeline used when parsing in-process
+_local_nlp_loaded = False
+_worker_nlp = None       # Pipeline owned by a pool worker process
+
+
+def load_spacy_pipeline(verbose: bool = True):
+    """
+    Load the spaCy model with the custom entity patterns.
+
+    Returns:
+        spaCy Language object, or None if the model is not installed
+    """
+    try:
+        nlp = spacy.load(SPACY_MODEL)
+        if "entity_ruler" not in nlp.pipe_names:
+            ruler = nlp.add_pipe("entity_ruler", before="ner")
+            ruler.add_patterns(ENTITY_PATTERNS)
+        if verbose:
+            print("DEBUG: spaCy model loaded with custom entity patterns.")
+        return nlp
+    except OSError:
+        if verbose:
+            print(f"WARNING: spaCy model '{SPACY_MODEL}' not found. Entity extraction will be limited.")
+        return None
+
+
+def extract_entities(doc) -> Dict[str, List[str]]:
+    """Group the entities of a spaCy doc by the labels the app cares about."""
+    entities = {
+        "people": [],
+        "dates": [],
+        "orgs": [],
+        "projects": [],
+        "task_counts": []
+    }
+    labels = {
+        "PERSON": "people",
+        "DATE": "dates",
+        "ORG": "orgs",
+        "PROJECT": "projects",
+        "TASK_COUNT": "task_counts"
+    }
+    for ent in doc.ents:
+        key = labels.get(ent.label_)
+        if key:
+            entities[key].append(ent.text)
+    return entities
+
+
+def _parse_chunk_with(nlp, chunk: List[Tuple[int, str]]) -> List[Dict]:
+    """Parse one chunk of (index, message) pairs with the given pipeline."""
+    texts = [text for _, text in chunk]
+    if nlp is not None:
+        docs = nlp.pipe(texts, batch_size=config.PARSE_BATCH_SPACY_BATCH_SIZE)
+    else:
+        docs = [None] * len(texts)
+
+    results = []
+    for (index, text), doc in zip(chunk, docs):
+        parsed = parse_command(text)
+        parsed["index"] = index
+        parsed["message"] = text
+        if doc is not None:
+            parsed["entities"] = extract_entities(doc)
+        results.append(parsed)
+    return results
+
+
+def _init_worker():
+    """Pool initializer: load spaCy once per worker process."""
+    global _worker_nlp
+    _worker_nlp = load_spacy_pipeline(verbose=False)
+
+
+def _parse_chunk(chunk: List[Tuple[int, str]]) -> List[Dict]:
+    """Pool task: parse a chunk using the worker's pipeline."""
+    return _parse_chunk_with(_worker_nlp, chunk)
+
+
+def _get_local_nlp():
+    global _local_nlp, _local_nlp_loaded
+    if not _local_nlp_loaded:
+        _local_nlp = load_spacy_pipeline(verbose=False)
+        _local_nlp_loaded = True
+    return _local_nlp
+
+
+def default_worker_count() -> int:
+    """Number of pool workers: configured value or one per core."""
+    return config.PARSE_BATCH_WORKERS or os.cpu_count() or 1
+
+
+def parse_batch(
+    messages: List[str],
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> Iterator[List[Dict]]:
+    """
+    Parse many messages, yielding lists of results as chunks complete.
+
+    Every result carries the `index` of its message in the input, since
+    chunks may finish out of order when a pool is used. Small batches,
+    or a single worker, are parsed in-process to skip pool overhead.
+
+    Args:
+        messages: Raw user messages
+        workers: Pool size (defaults to one per core)
+        chunk_size: Messages per pool task
+
+    Yields:
+        Lists of parsed dicts (intent, project_name, allocations, entities, ...)
+    """
+    workers = workers or default_worker_count()
+    chunk_size = chunk_size or config.PARSE_BATCH_CHUNK_SIZE
+
+    indexed = list(enumerate(messages))
+    chunks = [indexed[i:i + chunk_size] for i in range(0, len(indexed), chunk_size)]
+
+    if workers <= 1 or len(chunks) <= 1:
+        nlp = _get_local_nlp()
+        for chunk in chunks:
+            yield _parse_chunk_with(nlp, chunk)
+        return
+
+    executor = get_process_pool(workers, _init_worker)
+    futures = [executor.submit(_parse_chunk, chunk) for chunk in chunks]
+    for future in as_completed(futures):
+        yield future.result()
+
@@ -0,0 +1,206 @@
+"""
+Live project change feed (the /ws/projects WebSocket).
+
+DatabaseManager reports committed project changes to ChangeFeed.publish,
+which hands each event to every subscription whose project filter matches.
+Subscriptions are per-connection asyncio queues. Writes commit on worker
+threads, so events reach each queue through loop.call_soon_threadsafe.
+
+With CHANGE_FEED_REDIS enabled, events are also published to a Redis
+channel, and a listener thread relays other workers' events to local
+subscribers. Every uvicorn worker's clients then see every change. Redis
+stays optional: while it is down local delivery continues, and the
+listener reconnects with backoff.
+
+A subscriber that falls CHANGE_FEED_QUEUE_SIZE events behind is not
+allowed to slow writers down. Its queue is replaced by a single
+{"type": "resync"} event, which tells the client to reload its projects.
+"""
+
+import asyncio
+import json
+import threading
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+import redis
+
+from config import config
+from session_backends import get_connection_pool
+
+
+RESYNC_EVENT = {"type": "resync"}
+
+
+class Subscription:
+    """One client's queue of change events and its project filter."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, projects: Optional[Iterable[str]], queue_size: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.projects = set(projects) if projects is not None else None   # None = every project
+        self.overflows = 0
+
+    def wants(self, project_name: str) -> bool:
+        return self.projects is None or project_name in self.projects
+
+    def subscribe(self, projects: Optional[Iterable[str]] = None):
+        """Follow more projects (None = every project)."""
+        if projects is None:
+            self.projects = None
+        elif self.projects is not None:
+            self.projects.update(projects)
+
+    def unsubscribe(self, projects: Optional[Iterable[str]] = None):
+        """
+        Stop following projects (None = all of them).
+
+        Naming projects while following every project has no effect. Use
+        unsubscribe() and then subscribe(names) to narrow the feed.
+        """
+        if projects is None:
+            self.projects = set()
+        elif self.projects is not None:
+            self.projects.difference_update(projects)
+
+    async def get(self) -> Dict:
+        """Wait for the next event."""
+        return await self.queue.get()
+
+    def send(self, event: Dict):
+        """
+        Queue an event for this client. Call on the subscription's event
+        loop; a full queue is replaced by a single resync event.
+        """
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflows += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_EVENT)
+
+
+class ChangeFeed:
+    """Fans project change events out to subscribers, across workers via Redis."""
+
+    def __init__(self, redis_enabled=None, channel=None, queue_size=None, host=None, port=None, db=None):
+        self.channel = channel or config.CHANGE_FEED_CHANNEL
+        self.queue_size = queue_size or config.CHANGE_FEED_QUEUE_SIZE
+        self.origin = uuid.uuid4().hex   # Lets the listener skip this worker's own events
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.published = 0
+        self.relayed = 0
+        self.redis_connected = False
+
+        self._redis = None
+        self._thread = None
+        if config.CHANGE_FEED_REDIS if redis_enabled is None else redis_enabled:
+            self._redis = redis.Redis(connection_pool=get_connection_pool(
+                host or config.REDIS_HOST,
+                port or config.REDIS_PORT,
+                db or config.REDIS_DB
+            ))
+            self._thread = threading.Thread(target=self._listen, name="change-feed", daemon=True)
+            self._thread.start()
+
+    def subscribe(self, projects: Optional[Iterable[str]] = None) -> Subscription:
+        """
+        Open a subscription on the running event loop.
+
+        Args:
+            projects: Project names to follow (None = every project)
+
+        Returns:
+            Subscription to await events from
+        """
+        subscription = Subscription(asyncio.get_running_loop(), projects, self.queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Close a subscription."""
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, events: List[Dict]):
+        """
+        Publish committed change events (DatabaseManager listener).
+
+        Delivers to local subscribers, then to other workers via Redis.
+        Safe to call from any thread.
+        """
+        self.published += len(events)
+        self._deliver(events)
+        if self._redis is not None:
+            try:
+                self._redis.publish(self.channel, json.dumps({"origin": self.origin, "events": events}))
+            except redis.RedisError as e:
+                print(f"WARNING: Change feed publish to Redis failed: {e}")
+
+    def _deliver(self, events: List[Dict]):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            for event in events:
+                if not subscription.wants(event["project"]):
+                    continue
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.send, event)
+                except RuntimeError:
+                    # Its event loop has shut down
+                    self.unsubscribe(subscription)
+                    break
+
+    def _listen(self):
+        """Relay other workers' events from Redis, reconnecting with backoff."""
+        delay = config.REDIS_PROBE_INITIAL_SECONDS
+        while not self._stopped.is_set():
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                self.redis_connected = True
+                delay = config.REDIS_PROBE_INITIAL_SECONDS
+                print(f"DEBUG: Change feed subscribed to Redis channel {self.channel}")
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None or message["type"] != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    if data.get("origin") != self.origin:
+                        self.relayed += len(data["events"])
+                        self._deliver(data["events"])
+            except (redis.RedisError, OSError, ValueError) as e:
+                if self.redis_connected or delay == config.REDIS_PROBE_INITIAL_SECONDS:
+                    print(f"WARNING: Change feed lost Redis ({e}); retrying in {delay:.0f}s")
+                self.redis_connected = False
+                self._stopped.wait(delay)
+                delay = min(delay * 2, config.REDIS_PROBE_MAX_SECONDS)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+        self.redis_connected = False
+
+    def stats(self) -> Dict:
+        """Subscriber count and delivery counters."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        return {
+            "subscribers": len(subscriptions),
+            "published": self.published,
+            "relayed": self.relayed,
+            "overflows": sum(subscription.overflows for subscription in subscriptions),
+            "redis": None if self._redis is None else ("connected" if self.redis_connected else "disconnected")
+        }
+
+    def close(self):
+        """Stop the Redis listener."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -12,15 +12,65 @@ class Config:
     
     # Google Gemini AI
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
+    # Alternative API endpoint, e.g. the load-test stub (scripts/gemini_stub.py)
+    GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL', '')
+    # Gemini quota budgets (0 = unlimited), shared by all workers through the
+    # budget backend: redis | sqlite | memory (defaults to SESSION_BACKEND)
+    LLM_BUDGET_BACKEND = os.getenv('LLM_BUDGET_BACKEND', os.getenv('SESSION_BACKEND', 'redis')).lower()
+    LLM_BUDGET_SQLITE_PATH = os.getenv('LLM_BUDGET_SQLITE_PATH', 'llm_budget.db')
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '0'))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', '0'))
+    LLM_REQUESTS_PER_DAY = int(os.getenv('LLM_REQUESTS_PER_DAY', '0'))
+    LLM_TOKENS_PER_DAY = int(os.getenv('LLM_TOKENS_PER_DAY', '0'))
+    # Most of the per-minute budgets one chat session may use
+    LLM_SESSION_SHARE = float(os.getenv('LLM_SESSION_SHARE', '0.25'))
+    # Budget fractions held back: optional calls (smart responses, summaries) stop at
+    # the low watermark, parsing at the headroom, before the provider's quota is hit
+    LLM_BUDGET_LOW_WATERMARK = float(os.getenv('LLM_BUDGET_LOW_WATERMARK', '0.2'))
+    LLM_BUDGET_HEADROOM = float(os.getenv('LLM_BUDGET_HEADROOM', '0.05'))
+    # After a 429 every call is answered locally for this long
+    LLM_RATE_LIMIT_COOLDOWN_SECONDS = float(os.getenv('LLM_RATE_LIMIT_COOLDOWN_SECONDS', '30'))
     
     # Database
     DATABASE_PATH = os.getenv('DATABASE_PATH', 'projects.db')
+    # Statement timings and slow-query log; new statements can also have their
+    # plans checked for full table scans (EXPLAIN QUERY PLAN, once per statement)
+    DB_QUERY_AUDIT_ENABLED = os.getenv('DB_QUERY_AUDIT_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '100'))
+    DB_EXPLAIN_NEW_QUERIES = os.getenv('DB_EXPLAIN_NEW_QUERIES', 'false').lower() in ('1', 'true', 'yes')
     
     # Redis
     REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
     REDIS_PORT = int(os.getenv('REDIS_PORT', '6379'))
     REDIS_DB = int(os.getenv('REDIS_DB', '0'))
     REDIS_SESSION_TTL_HOURS = int(os.getenv('REDIS_SESSION_TTL_HOURS', '1'))
+    # Session storage: redis | sqlite (shared by a node's workers, no extra service) | memory
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'redis').lower()
+    SESSION_SQLITE_PATH = os.getenv('SESSION_SQLITE_PATH', 'sessions.db')
+    SESSION_SQLITE_SWEEP_SECONDS = float(os.getenv('SESSION_SQLITE_SWEEP_SECONDS', '60'))
+    REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', '50'))
+    REDIS_SOCKET_TIMEOUT_SECONDS = float(os.getenv('REDIS_SOCKET_TIMEOUT_SECONDS', '2'))
+    # While Redis is down it is probed with exponential backoff between these bounds
+    REDIS_PROBE_INITIAL_SECONDS = float(os.getenv('REDIS_PROBE_INITIAL_SECONDS', '1'))
+    REDIS_PROBE_MAX_SECONDS = float(os.getenv('REDIS_PROBE_MAX_SECONDS', '60'))
+    # Messages kept per session (older ones are trimmed)
+    SESSION_MAX_MESSAGES = int(os.getenv('SESSION_MAX_MESSAGES', '200'))
+    # Redis histories longer than the threshold fold older turns into a summary entry
+    SESSION_COMPACT_THRESHOLD = int(os.getenv('SESSION_COMPACT_THRESHOLD', '60'))
+    SESSION_COMPACT_KEEP = int(os.getenv('SESSION_COMPACT_KEEP', '20'))
+    SESSION_SUMMARY_MAX_CHARS = int(os.getenv('SESSION_SUMMARY_MAX_CHARS', '2000'))
+    # Stored messages at least this long are zlib-compressed
+    SESSION_COMPRESS_MIN_BYTES = int(os.getenv('SESSION_COMPRESS_MIN_BYTES', '200'))
+    # In-memory session fallback bounds (least recently used sessions are evicted first)
+    SESSION_MEMORY_MAX_SESSIONS = int(os.getenv('SESSION_MEMORY_MAX_SESSIONS', '10000'))
+    SESSION_MEMORY_MAX_MB = int(os.getenv('SESSION_MEMORY_MAX_MB', '64'))
+    SESSION_MEMORY_SHARDS = int(os.getenv('SESSION_MEMORY_SHARDS', '16'))
+    
+    # Project change feed (/ws/projects); Redis pub/sub fans events out across workers
+    CHANGE_FEED_REDIS = os.getenv('CHANGE_FEED_REDIS', 'false').lower() in ('1', 'true', 'yes')
+    CHANGE_FEED_CHANNEL = os.getenv('CHANGE_FEED_CHANNEL', 'project-changes')
+    # Events buffered per client before it is told to resync instead
+    CHANGE_FEED_QUEUE_SIZE = int(os.getenv('CHANGE_FEED_QUEUE_SIZE', '256'))
     
     # Backend API
     BACKEND_HOST = os.getenv('BACKEND_HOST', '0.0.0.0')
@@ -33,12 +83,65 @@ class Config:
     ALLOWED_ORIGINS = [origin.strip() for origin in os.getenv('ALLOWED_ORIGINS', FRONTEND_URL).split(',')]
 
     
-    # Java Backend (future integration)
+    # Java Backend
     JAVA_BACKEND_URL = os.getenv('JAVA_BACKEND_URL', None)
     JAVA_API_TIMEOUT = int(os.getenv('JAVA_API_TIMEOUT', '10'))
+    # Outbox sync: project changes are POSTed in batches to JAVA_BACKEND_URL + JAVA_SYNC_PATH
+    JAVA_SYNC_PATH = os.getenv('JAVA_SYNC_PATH', '/api/projects/sync')
+    JAVA_OUTBOX_BATCH_SIZE = int(os.getenv('JAVA_OUTBOX_BATCH_SIZE', '100'))
+    JAVA_OUTBOX_POLL_SECONDS = float(os.getenv('JAVA_OUTBOX_POLL_SECONDS', '1'))
+    # Failed deliveries back off exponentially between these bounds
+    JAVA_OUTBOX_RETRY_INITIAL_SECONDS = float(os.getenv('JAVA_OUTBOX_RETRY_INITIAL_SECONDS', '1'))
+    JAVA_OUTBOX_RETRY_MAX_SECONDS = float(os.getenv('JAVA_OUTBOX_RETRY_MAX_SECONDS', '300'))
+    
+    # Response compression (brotli when the optional brotli package is installed, else gzip)
+    COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '500'))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))
+    
+    # Prometheus-format latency histograms and counters at GET /metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    
+    # On-demand request profiling (off by default; nothing is installed while disabled).
+    # Requests sending X-Profile-Token: <token>, plus a random sample, are profiled
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+    PROFILING_MODE = os.getenv('PROFILING_MODE', 'cprofile').lower()   # cprofile | sampling
+    PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILING_SAMPLE_INTERVAL_MS', '5'))
+    PROFILING_DIR = os.getenv('PROFILING_DIR', 'profiles')
+    PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', '50'))
+    
+    # Cache-Control for conditional project reads (clients and proxies revalidate with ETags)
+    PROJECT_CACHE_CONTROL = os.getenv('PROJECT_CACHE_CONTROL', 'no-cache')
     
     # Limits
-    MAX_TASKS_PER_PROJECT = int(os.getenv('MAX_TASKS_PER_PROJECT', '1000'))
+    MAX_TASKS_PER_PROJECT = int(os.getenv('MAX_TASKS_PER_PROJECT', '100000'))
+    MAX_LOOKUP_PROJECTS = int(os.getenv('MAX_LOOKUP_PROJECTS', '1000'))
+    # People carrying more tasks than this (across active projects) are overloaded
+    OVERLOAD_THRESHOLD = int(os.getenv('OVERLOAD_THRESHOLD', '20'))
+    # Rebalancer: capacity for people without their own, and the churn cost of
+    # moving a task into a project the receiver isn't on yet (0 = never)
+    DEFAULT_PERSON_CAPACITY = int(os.getenv('DEFAULT_PERSON_CAPACITY', str(OVERLOAD_THRESHOLD)))
+    REBALANCE_CROSS_PROJECT_COST = int(os.getenv('REBALANCE_CROSS_PROJECT_COST', '3'))
+    
+    # Completion forecasting: only history from the last N days is fitted
+    FORECAST_WINDOW_DAYS = int(os.getenv('FORECAST_WINDOW_DAYS', '30'))
+    # Progress history older than this is pruned (each project keeps its latest row; 0 = keep all)
+    HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', str(FORECAST_WINDOW_DAYS)))
+    
+    # Monte Carlo schedule simulation (throughput sampled over FORECAST_WINDOW_DAYS)
+    # Worker processes default to one per CPU core when unset
+    SIMULATION_TRIALS = int(os.getenv('SIMULATION_TRIALS', '10000'))
+    SIMULATION_WORKERS = int(os.getenv('SIMULATION_WORKERS', '0'))
+    SIMULATION_CACHE_SIZE = int(os.getenv('SIMULATION_CACHE_SIZE', '1024'))
+    
+    # Batch parsing (POST /parse/batch)
+    # Worker processes default to one per CPU core when unset
+    PARSE_BATCH_WORKERS = int(os.getenv('PARSE_BATCH_WORKERS', '0'))
+    PARSE_BATCH_CHUNK_SIZE = int(os.getenv('PARSE_BATCH_CHUNK_SIZE', '64'))
+    PARSE_BATCH_SPACY_BATCH_SIZE = int(os.getenv('PARSE_BATCH_SPACY_BATCH_SIZE', '256'))
+    PARSE_BATCH_MAX_MESSAGES = int(os.getenv('PARSE_BATCH_MAX_MESSAGES', '10000'))
     
     @classmethod
     def validate(cls):
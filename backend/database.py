@@ -1,22 +1,204 @@
 import sqlite3
 import os
+import re
+import threading
+import time
+from collections import deque
 from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import metrics
+from config import config
+
+# Projects in these states no longer count towards anyone's workload
+FINISHED_STATUSES = ('Completed', 'Cancelled')
+
+# Statements EXPLAIN QUERY PLAN can describe (DDL, PRAGMA and transaction control are skipped)
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+
+def table_scans(plan: List[str]) -> List[str]:
+    """
+    Tables read in full by a query plan.
+    
+    Args:
+        plan: EXPLAIN QUERY PLAN detail lines ("SCAN projects", "SEARCH p USING INDEX ...")
+    
+    Returns:
+        Names (or aliases) of tables scanned without an index
+    """
+    scanned = []
+    for detail in plan:
+        if not detail.startswith('SCAN ') or ' USING ' in detail:
+            continue
+        target = detail[5:]
+        if target == 'CONSTANT ROW' or target.startswith('(') or 'VIRTUAL TABLE' in target:
+            continue
+        scanned.append(target)
+    return scanned
+
+
+class QueryAuditor:
+    """
+    Statement timings, slow-query log and query-plan checks for one database.
+    
+    Times every execute/executemany on the database's connections and keeps
+    per-statement totals. Statements slower than DB_SLOW_QUERY_MS are logged
+    and kept in a bounded slow log. With DB_EXPLAIN_NEW_QUERIES, the first
+    execution of each statement also runs EXPLAIN QUERY PLAN, and plans that
+    scan a whole table are logged.
+    
+    Timings cover execute(), which runs a SELECT up to its first row
+    (including any sort); fetching the remaining rows is not included.
+    """
+    
+    def __init__(self, slow_ms: Optional[float] = None, explain: Optional[bool] = None,
+                 max_statements: int = 500, slow_log_size: int = 100):
+        self.slow_seconds = (config.DB_SLOW_QUERY_MS if slow_ms is None else slow_ms) / 1000
+        self.explain = config.DB_EXPLAIN_NEW_QUERIES if explain is None else explain
+        self.max_statements = max_statements
+        # Raw SQL -> [display SQL, executions, total seconds, max seconds, plan or None]
+        self.statements: Dict[str, list] = {}
+        self.slow_log = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+    
+    def record(self, conn: sqlite3.Connection, sql: str, parameters, seconds: float):
+        """Account for one statement execution (parameters is None for executemany)."""
+        with self._lock:
+            entry = self.statements.get(sql)
+            new = entry is None and len(self.statements) < self.max_statements
+            if new:
+                entry = self.statements[sql] = [' '.join(sql.split()), 0, 0.0, 0.0, None]
+            if entry is not None:
+                entry[1] += 1
+                entry[2] += seconds
+                entry[3] = max(entry[3], seconds)
+        
+        if self.slow_seconds > 0 and seconds >= self.slow_seconds:
+            display = entry[0] if entry is not None else ' '.join(sql.split())
+            self.slow_log.append({'sql': display, 'ms': round(seconds * 1000, 2), 'at': time.time()})
+            metrics.DB_SLOW_QUERIES.inc()
+            print(f"WARNING: Slow query ({seconds * 1000:.1f} ms): {display}")
+        
+        if new and self.explain and parameters is not None and EXPLAINABLE.match(sql):
+            entry[4] = self._explain(conn, sql, parameters, entry[0])
+    
+    def _explain(self, conn: sqlite3.Connection, sql: str, parameters, display: str) -> Optional[List[str]]:
+        """Run EXPLAIN QUERY PLAN and log full table scans."""
+        try:
+            # A plain cursor, so the EXPLAIN itself is not audited
+            rows = conn.cursor(sqlite3.Cursor).execute('EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            print(f"DEBUG: Could not explain query ({e}): {display}")
+            return None
+        plan = [row[3] for row in rows]
+        scanned = table_scans(plan)
+        if scanned:
+            metrics.DB_TABLE_SCANS.inc()
+            print(f"WARNING: Query plan scans {', '.join(scanned)}: {display}")
+        return plan
+    
+    def plans(self) -> Dict[str, List[str]]:
+        """Query plans of the statements explained so far."""
+        with self._lock:
+            return {entry[0]: entry[4] for entry in self.statements.values() if entry[4] is not None}
+    
+    def report(self, top: int = 10) -> Dict:
+        """
+        Summary of audited statements.
+        
+        Args:
+            top: Statements listed by total time
+        
+        Returns:
+            Totals, the statements with the most total time, recent slow
+            queries and statements whose plans scan whole tables
+        """
+        with self._lock:
+            entries = list(self.statements.values())
+            slow = list(self.slow_log)[-top:]
+        ranked = sorted(entries, key=lambda entry: entry[2], reverse=True)[:top]
+        return {
+            'statements': len(entries),
+            'executions': sum(entry[1] for entry in entries),
+            'slow_threshold_ms': self.slow_seconds * 1000,
+            'top': [
+                {'sql': sql, 'calls': calls, 'total_ms': round(total * 1000, 2),
+                 'avg_ms': round(total * 1000 / calls, 3), 'max_ms': round(worst * 1000, 2)}
+                for sql, calls, total, worst, _ in ranked
+            ],
+            'slow': slow,
+            'table_scans': [
+                {'sql': sql, 'tables': table_scans(plan)}
+                for sql, _, _, _, plan in entries if plan and table_scans(plan)
+            ],
+        }
+
+
+class _AuditedCursor(sqlite3.Cursor):
+    """Cursor reporting each statement to its connection's QueryAuditor."""
+    
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.auditor.record(self.connection, sql, parameters, time.perf_counter() - started)
+    
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.auditor.record(self.connection, sql, None, time.perf_counter() - started)
+
+
+class _AuditedConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute shortcuts) are audited."""
+    
+    auditor: QueryAuditor
+    
+    def cursor(self, factory=_AuditedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
 
 class Database:
     """
     SQLite database connection and schema management.
     """
     
-    def __init__(self, db_path='projects.db'):
-        """Initialize database connection."""
+    def __init__(self, db_path='projects.db', auditor: Optional[QueryAuditor] = None):
+        """
+        Initialize database connection.
+        
+        Args:
+            db_path: SQLite database file path
+            auditor: Statement auditor (defaults to one per database when
+                DB_QUERY_AUDIT_ENABLED)
+        """
         self.db_path = db_path
+        self.auditor = None   # Schema setup and migrations are not audited
         self.init_database()
+        if auditor is None and config.DB_QUERY_AUDIT_ENABLED:
+            auditor = QueryAuditor()
+        self.auditor = auditor
     
     @contextmanager
     def get_connection(self):
         """Context manager for database connections."""
-        conn = sqlite3.connect(self.db_path)
+        if self.auditor is not None:
+            conn = sqlite3.connect(self.db_path, factory=_AuditedConnection)
+            conn.auditor = self.auditor
+        else:
+            conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row  # Access columns by name
+        conn.execute('PRAGMA foreign_keys = ON')  # Enforce ON DELETE CASCADE
         try:
             yield conn
             conn.commit()
@@ -40,6 +222,11 @@ class Database:
                     completion INTEGER DEFAULT 0,
                     delayed_tasks INTEGER DEFAULT 0,
                     total_tasks INTEGER DEFAULT 0,
+                    tracked_tasks INTEGER DEFAULT 0,
+                    done_tasks INTEGER DEFAULT 0,
+                    risk_score INTEGER DEFAULT 0,
+                    risk_level TEXT DEFAULT 'LOW',
+                    version INTEGER DEFAULT 1,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
@@ -62,16 +249,144 @@ class Database:
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     allocation_id INTEGER NOT NULL,
                     person_name TEXT NOT NULL,
+                    assigned_tasks INTEGER DEFAULT 0,
                     FOREIGN KEY (allocation_id) REFERENCES allocations(id) ON DELETE CASCADE
                 )
             ''')
             
+            # Migrate databases created before per-person assignments were stored
+            if self._add_column_if_missing(cursor, 'team_members', 'assigned_tasks', 'INTEGER DEFAULT 0'):
+                self._backfill_assigned_tasks(cursor)
+            
+            # People table (one row per person, with maintained workload totals
+            # across active projects)
+            people_exists = self._table_exists(cursor, 'people')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS people (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT UNIQUE NOT NULL,
+                    total_assigned INTEGER DEFAULT 0,
+                    project_count INTEGER DEFAULT 0,
+                    capacity INTEGER
+                )
+            ''')
+            self._add_column_if_missing(cursor, 'people', 'capacity', 'INTEGER')
+            
+            # Per-person workload index (what each person carries per project/team)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS person_workload (
+                    person_id INTEGER NOT NULL,
+                    project_id INTEGER NOT NULL,
+                    team_name TEXT NOT NULL,
+                    assigned_tasks INTEGER DEFAULT 0,
+                    open_tasks INTEGER DEFAULT 0,
+                    PRIMARY KEY (person_id, project_id, team_name),
+                    FOREIGN KEY (person_id) REFERENCES people(id) ON DELETE CASCADE,
+                    FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE
+                )
+            ''')
+            
+            # Tasks table (individual tasks; projects keep maintained counters)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    project_id INTEGER NOT NULL,
+                    team_name TEXT,
+                    assignee TEXT,
+                    description TEXT NOT NULL,
+                    status TEXT DEFAULT 'Todo',
+                    due_date DATE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE
+                )
+            ''')
+            
+            # Append-only progress history (one row per project write)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS project_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    project_id INTEGER NOT NULL,
+                    status TEXT,
+                    completion INTEGER,
+                    delayed_tasks INTEGER,
+                    done_tasks INTEGER,
+                    tracked_tasks INTEGER,
+                    recorded_at TIMESTAMP DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+                    FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE
+                )
+            ''')
+            
+            # Transactional outbox of Java backend sync events, written in the same
+            # transaction as the project change and drained by java_outbox.
+            # Rows are deleted once delivered; next_attempt_at doubles as the
+            # claim lease and the retry backoff.
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS java_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    project_name TEXT NOT NULL,
+                    action TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    state TEXT DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    next_attempt_at REAL DEFAULT 0,
+                    last_error TEXT,
+                    created_at REAL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+                )
+            ''')
+            
+            # Last full payload sent per project; UPDATE events are diffed against it
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS java_sync_state (
+                    project_id INTEGER PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE
+                )
+            ''')
+            
+            # Portfolio-wide revision, bumped by every project write (ETag for project lists)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS portfolio_state (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    revision INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            cursor.execute('INSERT OR IGNORE INTO portfolio_state (id, revision) VALUES (1, 0)')
+            
+            # Completion timestamps feed the throughput samples of the schedule simulator
+            if self._add_column_if_missing(cursor, 'tasks', 'completed_at', 'TIMESTAMP'):
+                cursor.execute("UPDATE tasks SET completed_at = updated_at WHERE status = 'Done'")
+            
+            # Task counters on projects, maintained incrementally as task rows change
+            self._add_column_if_missing(cursor, 'projects', 'tracked_tasks', 'INTEGER DEFAULT 0')
+            self._add_column_if_missing(cursor, 'projects', 'done_tasks', 'INTEGER DEFAULT 0')
+            
+            # Version, bumped on every project write (sync payloads carry it)
+            self._add_column_if_missing(cursor, 'projects', 'version', 'INTEGER DEFAULT 1')
+            
+            # Stored risk columns, recomputed on every project write
+            added_score = self._add_column_if_missing(cursor, 'projects', 'risk_score', 'INTEGER DEFAULT 0')
+            added_level = self._add_column_if_missing(cursor, 'projects', 'risk_level', "TEXT DEFAULT 'LOW'")
+            if added_score or added_level:
+                self._backfill_risk(cursor)
+            
+            # Task assignees joined the workload index after it was introduced
+            added_open = self._add_column_if_missing(cursor, 'person_workload', 'open_tasks', 'INTEGER DEFAULT 0')
+            if added_open or not people_exists:
+                self.rebuild_workload_index(cursor)
+            
             # Create indexes for performance
             cursor.execute('''
                 CREATE INDEX IF NOT EXISTS idx_projects_name 
                 ON projects(name)
             ''')
             
+            # Project lists are ordered newest first
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_projects_created 
+                ON projects(created_at)
+            ''')
+            
             cursor.execute('''
                 CREATE INDEX IF NOT EXISTS idx_allocations_project 
                 ON allocations(project_id)
@@ -82,4 +397,149 @@ class Database:
                 ON team_members(allocation_id)
             ''')
             
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_members_person 
+                ON team_members(person_name)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_people_load 
+                ON people(total_assigned)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_workload_project 
+                ON person_workload(project_id)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_projects_risk 
+                ON projects(risk_score DESC, name)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_history_project_time 
+                ON project_history(project_id, recorded_at)
+            ''')
+            
+            # Portfolio-wide history windows and pruning read by time
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_history_time 
+                ON project_history(recorded_at)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tasks_project_status 
+                ON tasks(project_id, status)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tasks_project_team 
+                ON tasks(project_id, team_name)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tasks_assignee 
+                ON tasks(assignee)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tasks_completed 
+                ON tasks(completed_at, project_id)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_outbox_state 
+                ON java_outbox(state, id)
+            ''')
+            
             conn.commit()
+    
+    def _backfill_risk(self, cursor):
+        """Compute stored risk for projects created before the risk columns."""
+        from risk_engine import compute_risk
+        
+        cursor.execute('SELECT id, status, completion, delayed_tasks FROM projects')
+        updates = []
+        for row in cursor.fetchall():
+            risk = compute_risk(row['status'], row['completion'], row['delayed_tasks'])
+            updates.append((risk['risk_score'], risk['risk_level'], row['id']))
+        cursor.executemany('UPDATE projects SET risk_score = ?, risk_level = ? WHERE id = ?', updates)
+    
+    def _table_exists(self, cursor, table: str) -> bool:
+        """Check whether a table has already been created."""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        return cursor.fetchone() is not None
+    
+    def rebuild_workload_index(self, cursor):
+        """
+        Rebuild people and person_workload from team_members and tasks.
+        
+        A person's load in a project comes from its task rows (open tasks
+        they are assigned) once the project tracks tasks, and from the team
+        allocations until then.
+        """
+        cursor.execute('DELETE FROM person_workload')
+        cursor.execute('''
+            INSERT OR IGNORE INTO people (name)
+            SELECT person_name FROM team_members
+            UNION
+            SELECT assignee FROM tasks WHERE assignee IS NOT NULL
+        ''')
+        cursor.execute('''
+            INSERT INTO person_workload (person_id, project_id, team_name, assigned_tasks, open_tasks)
+            SELECT pe.id, load.project_id, load.team_name, SUM(load.assigned), SUM(load.open)
+            FROM (
+                SELECT tm.person_name AS person, a.project_id, a.team_name,
+                       tm.assigned_tasks AS assigned, 0 AS open
+                FROM team_members tm
+                JOIN allocations a ON a.id = tm.allocation_id
+                UNION ALL
+                SELECT assignee, project_id, COALESCE(team_name, 'unassigned'),
+                       0, status != 'Done'
+                FROM tasks
+                WHERE assignee IS NOT NULL
+            ) load
+            JOIN projects p ON p.id = load.project_id
+            JOIN people pe ON pe.name = load.person
+            GROUP BY pe.id, load.project_id, load.team_name
+        ''')
+        placeholders = ', '.join('?' for _ in FINISHED_STATUSES)
+        cursor.execute(f'''
+            UPDATE people SET
+                total_assigned = COALESCE((
+                    SELECT SUM(CASE WHEN p.tracked_tasks > 0 THEN w.open_tasks ELSE w.assigned_tasks END)
+                    FROM person_workload w JOIN projects p ON p.id = w.project_id
+                    WHERE w.person_id = people.id AND p.status NOT IN ({placeholders})
+                ), 0),
+                project_count = (
+                    SELECT COUNT(DISTINCT w.project_id)
+                    FROM person_workload w JOIN projects p ON p.id = w.project_id
+                    WHERE w.person_id = people.id AND p.status NOT IN ({placeholders})
+                )
+        ''', FINISHED_STATUSES + FINISHED_STATUSES)
+    
+    def _add_column_if_missing(self, cursor, table: str, column: str, definition: str) -> bool:
+        """Add a column to an existing table. Returns True if it was added."""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if any(row['name'] == column for row in cursor.fetchall()):
+            return False
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        return True
+    
+    def _backfill_assigned_tasks(self, cursor):
+        """Split each legacy allocation evenly across its members."""
+        from task_assigner import distribute_tasks_round_robin
+        
+        cursor.execute('SELECT id, task_count FROM allocations')
+        for alloc in cursor.fetchall():
+            cursor.execute(
+                'SELECT id, person_name FROM team_members WHERE allocation_id = ? ORDER BY id',
+                (alloc['id'],)
+            )
+            members = cursor.fetchall()
+            split = distribute_tasks_round_robin(alloc['task_count'], [m['id'] for m in members])
+            cursor.executemany(
+                'UPDATE team_members SET assigned_tasks = ? WHERE id = ?',
+                [(count, member_id) for member_id, count in split.items()]
+            )
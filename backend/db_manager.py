@@ -1,13 +1,101 @@
-from database import Database
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from database import Database, FINISHED_STATUSES
 from typing import Optional, Dict, List, Any
+from task_assigner import distribute_tasks_round_robin, generate_java_payload, diff_java_payload
+from risk_engine import compute_risk
+from metrics import DB_QUERY_SECONDS, timed_methods
 
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+MAX_QUERY_PARAMS = 500
+
+# Project fields computed from task rows once a project has any
+TASK_DERIVED_FIELDS = ('completion', 'delayed_tasks')
+
+# How often writes prune project_history past its retention
+HISTORY_PRUNE_SECONDS = 3600
+
+
+@timed_methods(DB_QUERY_SECONDS)
 class DatabaseManager:
     """
     Manages CRUD operations for projects using SQLite.
+    
+    Every project write bumps the project's version. With outbox enabled it
+    also queues a Java backend sync event in java_outbox, inside the same
+    transaction; UPDATE events carry only what changed since the last one.
+    Listeners (see add_listener) hear about changes once they commit.
+    With history_retention_days set, writes also prune older progress
+    history, at most once per HISTORY_PRUNE_SECONDS.
     """
     
-    def __init__(self, db_path='projects.db'):
+    def __init__(self, db_path='projects.db', outbox: bool = False, history_retention_days: Optional[int] = None):
         self.db = Database(db_path)
+        self.outbox = outbox
+        self.history_retention_days = history_retention_days
+        self._history_prune_due = 0.0
+        self._listeners = []
+        self._local = threading.local()
+    
+    def add_listener(self, callback):
+        """
+        Register a callback for committed project changes.
+        
+        After each write transaction commits, the callback receives a list
+        with one event per changed project (its latest state):
+        {"type": "created" | "updated" | "deleted", "project": str,
+         "version": int, "state": {...} | None}
+        Callbacks run on the writing thread, so they must not block.
+        
+        Args:
+            callback: Callable taking the list of change events
+        """
+        self._listeners.append(callback)
+    
+    @contextmanager
+    def _write_connection(self):
+        """get_connection for writes; change events go to listeners after commit."""
+        changes = self._local.changes = {}
+        try:
+            with self.db.get_connection() as conn:
+                yield conn
+        finally:
+            self._local.changes = None
+        
+        if changes:
+            events = list(changes.values())
+            for callback in self._listeners:
+                try:
+                    callback(events)
+                except Exception as e:
+                    print(f"WARNING: Change listener failed: {e}")
+    
+    def _record_change(self, cursor, project_id: int, change_type: str):
+        """Note a project change for listeners (published on commit)."""
+        changes = getattr(self._local, 'changes', None)
+        if changes is None or not self._listeners:
+            return
+        cursor.execute('''
+            SELECT name, version, status, completion, delayed_tasks, total_tasks, risk_score, risk_level
+            FROM projects WHERE id = ?
+        ''', (project_id,))
+        row = cursor.fetchone()
+        previous = changes.get(row['name'])
+        changes[row['name']] = {
+            'type': 'created' if previous and previous['type'] == 'created' else change_type,
+            'project': row['name'],
+            'version': row['version'],
+            'state': {
+                'status': row['status'],
+                'completion': row['completion'],
+                'delayed_tasks': row['delayed_tasks'],
+                'total_tasks': row['total_tasks'],
+                'risk_score': row['risk_score'],
+                'risk_level': row['risk_level']
+            }
+        }
     
     def create_project(self, name: str, total_tasks: int = 0, allocations: Dict = None) -> Dict:
         """
@@ -16,12 +104,13 @@ class DatabaseManager:
         Args:
             name: Project name
             total_tasks: Total number of tasks
-            allocations: Dict of {team_name: {count: int, people: [str]}}
+            allocations: Dict of {team_name: {count: int, people: [str], assignments: {person: int}}}
+                (assignments default to an even split when omitted)
         
         Returns:
             Created project data
         """
-        with self.db.get_connection() as conn:
+        with self._write_connection() as conn:
             cursor = conn.cursor()
             
             # Insert project
@@ -31,17 +120,21 @@ class DatabaseManager:
             ''', (name, total_tasks))
             
             project_id = cursor.lastrowid
+            member_load = {}  # (person, team) -> assigned tasks
             
             # Insert allocations if provided
             if allocations:
                 for team_name, team_data in allocations.items():
                     if isinstance(team_data, dict):
                         count = team_data.get('count', 0)
-                        people = team_data.get('people', [])
+                        # One member row per person, even if a name is listed twice
+                        people = list(dict.fromkeys(team_data.get('people', [])))
+                        assignments = team_data.get('assignments') or distribute_tasks_round_robin(count, people)
                     else:
                         # Handle old format (just numbers)
                         count = team_data
                         people = []
+                        assignments = {}
                     
                     cursor.execute('''
                         INSERT INTO allocations (project_id, team_name, task_count)
@@ -50,13 +143,24 @@ class DatabaseManager:
                     
                     allocation_id = cursor.lastrowid
                     
-                    # Insert team members
+                    # Insert team members with their assigned task counts
                     for person in people:
                         cursor.execute('''
-                            INSERT INTO team_members (allocation_id, person_name)
-                            VALUES (?, ?)
-                        ''', (allocation_id, person))
+                            INSERT INTO team_members (allocation_id, person_name, assigned_tasks)
+                            VALUES (?, ?, ?)
+                        ''', (allocation_id, person, assignments.get(person, 0)))
+                        key = (person, team_name)
+                        member_load[key] = member_load.get(key, 0) + assignments.get(person, 0)
+            
+            # Maintain the per-person workload index in the same transaction
+            if member_load:
+                self._index_project_workload(cursor, project_id, member_load)
             
+            self._record_history(cursor, project_id)
+            self._bump_revision(cursor)
+            self._record_change(cursor, project_id, 'created')
+            if self.outbox:
+                self._queue_project_sync(cursor, project_id, 'CREATE')
             conn.commit()
             return self.get_project(name)
     
@@ -70,82 +174,130 @@ class DatabaseManager:
         Returns:
             Project data dict or None if not found
         """
+        return self.get_projects([name]).get(name)
+    
+    def get_projects(self, names: List[str]) -> Dict[str, Dict]:
+        """
+        Retrieve several projects by name with their allocations.
+        
+        Uses one query for the project rows and one joined query for all
+        allocations and members, regardless of how many projects are asked for.
+        
+        Args:
+            names: Project names
+        
+        Returns:
+            Dict mapping found project names to project data dicts
+        """
+        names = list(dict.fromkeys(names))
+        projects = {}
+        
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
             
-            # Get project
-            cursor.execute('''
-                SELECT * FROM projects WHERE name = ?
-            ''', (name,))
-            
-            row = cursor.fetchone()
-            if not row:
-                return None
-            
-            project = {
-                'status': row['status'],
-                'completion': row['completion'],
-                'delayed_tasks': row['delayed_tasks'],
-                'total_tasks': row['total_tasks']
-            }
-            
-            # Get allocations
-            cursor.execute('''
-                SELECT id, team_name, task_count 
-                FROM allocations 
-                WHERE project_id = ?
-            ''', (row['id'],))
-            
-            allocations = {}
-            for alloc_row in cursor.fetchall():
-                # Get team members
-                cursor.execute('''
-                    SELECT person_name 
-                    FROM team_members 
-                    WHERE allocation_id = ?
-                ''', (alloc_row['id'],))
+            for i in range(0, len(names), MAX_QUERY_PARAMS):
+                batch = names[i:i + MAX_QUERY_PARAMS]
+                placeholders = ', '.join('?' for _ in batch)
                 
-                people = [member['person_name'] for member in cursor.fetchall()]
+                # Get projects
+                cursor.execute(f'''
+                    SELECT * FROM projects WHERE name IN ({placeholders})
+                ''', batch)
                 
-                allocations[alloc_row['team_name']] = {
-                    'count': alloc_row['task_count'],
-                    'people': people
-                }
-            
-            project['allocations'] = allocations
-            return project
+                by_id = {}
+                for row in cursor.fetchall():
+                    project = {
+                        'status': row['status'],
+                        'completion': row['completion'],
+                        'delayed_tasks': row['delayed_tasks'],
+                        'total_tasks': row['total_tasks'],
+                        'tracked_tasks': row['tracked_tasks'],
+                        'done_tasks': row['done_tasks'],
+                        'allocations': {}
+                    }
+                    projects[row['name']] = project
+                    by_id[row['id']] = project
+                
+                if not by_id:
+                    continue
+                
+                # Get allocations with their team members
+                id_placeholders = ', '.join('?' for _ in by_id)
+                cursor.execute(f'''
+                    SELECT a.project_id, a.team_name, a.task_count, tm.person_name
+                    FROM allocations a
+                    LEFT JOIN team_members tm ON tm.allocation_id = a.id
+                    WHERE a.project_id IN ({id_placeholders})
+                    ORDER BY a.id, tm.id
+                ''', list(by_id))
+                
+                for alloc_row in cursor.fetchall():
+                    allocations = by_id[alloc_row['project_id']]['allocations']
+                    team = allocations.setdefault(alloc_row['team_name'], {
+                        'count': alloc_row['task_count'],
+                        'people': []
+                    })
+                    if alloc_row['person_name'] is not None:
+                        team['people'].append(alloc_row['person_name'])
+        
+        return projects
     
-    def update_project(self, name: str, **kwargs) -> bool:
+    def update_project(self, name: str, **kwargs) -> Optional[Dict]:
         """
         Update project fields.
         
+        Projects with task rows derive completion and delayed_tasks from
+        their tasks, so manual values for those fields are not written;
+        they come back under 'ignored' instead.
+        
         Args:
             name: Project name
             **kwargs: Fields to update (status, completion, delayed_tasks, total_tasks)
         
         Returns:
-            True if updated, False if not found
+            {'updated': [fields written], 'ignored': [task-derived fields
+            not written]}, or None if not found or nothing to update
         """
         allowed_fields = ['status', 'completion', 'delayed_tasks', 'total_tasks']
         updates = {k: v for k, v in kwargs.items() if k in allowed_fields}
         
         if not updates:
-            return False
+            return None
         
-        with self.db.get_connection() as conn:
+        with self._write_connection() as conn:
             cursor = conn.cursor()
             
+            cursor.execute('SELECT id, status, tracked_tasks FROM projects WHERE name = ?', (name,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            ignored = []
+            if row['tracked_tasks'] > 0:
+                ignored = [k for k in updates if k in TASK_DERIVED_FIELDS]
+                updates = {k: v for k, v in updates.items() if k not in TASK_DERIVED_FIELDS}
+            if not updates:
+                return {'updated': [], 'ignored': ignored}
+            
             # Build update query
             set_clause = ', '.join([f"{k} = ?" for k in updates.keys()])
-            values = list(updates.values()) + [name]
+            values = list(updates.values()) + [row['id']]
             
             cursor.execute(f'''
                 UPDATE projects 
                 SET {set_clause}, updated_at = CURRENT_TIMESTAMP
-                WHERE name = ?
+                WHERE id = ?
             ''', values)
+            self._project_changed(cursor, row['id'])
             
-            return cursor.rowcount > 0
+            # Finishing (or reopening) a project changes everyone's active workload
+            if 'status' in updates:
+                was_active = row['status'] not in FINISHED_STATUSES
+                is_active = updates['status'] not in FINISHED_STATUSES
+                if was_active != is_active:
+                    self._adjust_people_totals(cursor, row['id'], 1 if is_active else -1)
+            
+            return {'updated': list(updates), 'ignored': ignored}
     
     def delete_project(self, name: str) -> bool:
         """
@@ -157,10 +309,23 @@ class DatabaseManager:
         Returns:
             True if deleted, False if not found
         """
-        with self.db.get_connection() as conn:
+        with self._write_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('DELETE FROM projects WHERE name = ?', (name,))
-            return cursor.rowcount > 0
+            cursor.execute('SELECT id, status, version FROM projects WHERE name = ?', (name,))
+            row = cursor.fetchone()
+            if not row:
+                return False
+            
+            if row['status'] not in FINISHED_STATUSES:
+                self._adjust_people_totals(cursor, row['id'], -1)
+            cursor.execute('DELETE FROM projects WHERE id = ?', (row['id'],))
+            self._bump_revision(cursor)
+            changes = getattr(self._local, 'changes', None)
+            if changes is not None:
+                changes[name] = {'type': 'deleted', 'project': name, 'version': row['version'] + 1, 'state': None}
+            if self.outbox:
+                self._enqueue_sync(cursor, name, generate_java_payload(name, 0, {}, 'DELETE', version=row['version'] + 1))
+            return True
     
     def list_all_projects(self) -> List[str]:
         """
@@ -226,3 +391,1020 @@ class DatabaseManager:
                 }
                 for row in cursor.fetchall()
             ]
+    
+    def add_tasks(self, project_name: str, tasks: List[Dict]) -> Optional[int]:
+        """
+        Bulk insert task rows for a project and update its task counters.
+        
+        Args:
+            project_name: Project name
+            tasks: List of {description, team, assignee, status, due_date} dicts
+        
+        Returns:
+            Number of tasks added, or None if the project was not found
+        """
+        with self._write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id FROM projects WHERE name = ?', (project_name,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            rows = [
+                (
+                    row['id'],
+                    task.get('team'),
+                    task.get('assignee'),
+                    task['description'],
+                    task.get('status') or 'Todo',
+                    task.get('due_date')
+                )
+                for task in tasks
+            ]
+            open_load = {}
+            for _, team, assignee, _, status, _ in rows:
+                key = (assignee, team or 'unassigned')
+                open_load[key] = open_load.get(key, 0) + (status != 'Done')
+            
+            with self._reindexing_people(cursor, row['id']):
+                cursor.executemany('''
+                    INSERT INTO tasks (project_id, team_name, assignee, description, status, due_date, completed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, CASE WHEN ?5 = 'Done' THEN CURRENT_TIMESTAMP END)
+                ''', rows)
+                
+                statuses = [r[4] for r in rows]
+                self._apply_task_deltas(
+                    cursor, row['id'],
+                    added=len(rows),
+                    done=statuses.count('Done'),
+                    delayed=statuses.count('Delayed')
+                )
+                self._index_task_load(cursor, row['id'], open_load)
+            return len(rows)
+    
+    def get_tasks(
+        self,
+        project_name: str,
+        status: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> Optional[List[Dict]]:
+        """
+        Get a page of a project's tasks.
+        
+        Args:
+            project_name: Project name
+            status: Optional status filter
+            limit: Page size
+            offset: Rows to skip
+        
+        Returns:
+            List of task dicts, or None if the project was not found
+        """
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id FROM projects WHERE name = ?', (project_name,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            query = 'SELECT * FROM tasks WHERE project_id = ?'
+            params = [row['id']]
+            if status:
+                query += ' AND status = ?'
+                params.append(status)
+            query += ' ORDER BY id LIMIT ? OFFSET ?'
+            params += [limit, offset]
+            
+            cursor.execute(query, params)
+            return [self._task_to_dict(task) for task in cursor.fetchall()]
+    
+    def update_task(self, task_id: int, **kwargs) -> bool:
+        """
+        Update a task and adjust its project's counters incrementally.
+        
+        Args:
+            task_id: Task ID
+            **kwargs: Fields to update (status, assignee, due_date, description)
+        
+        Returns:
+            True if updated, False if not found
+        """
+        allowed_fields = ['status', 'assignee', 'due_date', 'description']
+        updates = {k: v for k, v in kwargs.items() if k in allowed_fields}
+        
+        if not updates:
+            return False
+        
+        with self._write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT project_id, status, assignee, team_name FROM tasks WHERE id = ?', (task_id,))
+            row = cursor.fetchone()
+            if not row:
+                return False
+            
+            old_status, new_status = row['status'], updates.get('status', row['status'])
+            team = row['team_name'] or 'unassigned'
+            old_key, new_key = (row['assignee'], team), (updates.get('assignee', row['assignee']), team)
+            set_clause = ', '.join([f"{k} = ?" for k in updates.keys()])
+            if old_status != new_status:
+                set_clause += ", completed_at = " + ("CURRENT_TIMESTAMP" if new_status == 'Done' else "NULL")
+            
+            if old_key == new_key and (old_status == 'Done') == (new_status == 'Done'):
+                reindex = nullcontext()
+            else:
+                reindex = self._reindexing_people(cursor, row['project_id'])
+            with reindex:
+                cursor.execute(f'''
+                    UPDATE tasks
+                    SET {set_clause}, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', list(updates.values()) + [task_id])
+                
+                if old_status != new_status:
+                    self._apply_task_deltas(
+                        cursor, row['project_id'],
+                        done=(new_status == 'Done') - (old_status == 'Done'),
+                        delayed=(new_status == 'Delayed') - (old_status == 'Delayed')
+                    )
+                if old_key != new_key or old_status != new_status:
+                    open_load = {old_key: -(old_status != 'Done')}
+                    open_load[new_key] = open_load.get(new_key, 0) + (new_status != 'Done')
+                    vacated = [old_key] if old_key != new_key else []
+                    self._index_task_load(cursor, row['project_id'], open_load, vacated)
+            return True
+    
+    def _apply_task_deltas(self, cursor, project_id: int, added: int = 0, done: int = 0, delayed: int = 0):
+        """
+        Apply task counter changes to a project and re-derive completion.
+        
+        The first tasks added replace any manually entered delayed_tasks value.
+        """
+        cursor.execute('''
+            UPDATE projects SET
+                tracked_tasks = tracked_tasks + :added,
+                done_tasks = done_tasks + :done,
+                delayed_tasks = (CASE WHEN tracked_tasks = 0 THEN 0 ELSE delayed_tasks END) + :delayed,
+                completion = CASE
+                    WHEN tracked_tasks + :added > 0
+                    THEN ((done_tasks + :done) * 100) / (tracked_tasks + :added)
+                    ELSE completion
+                END,
+                total_tasks = MAX(total_tasks, tracked_tasks + :added),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = :id
+        ''', {'added': added, 'done': done, 'delayed': delayed, 'id': project_id})
+        self._project_changed(cursor, project_id)
+    
+    def _project_changed(self, cursor, project_id: int):
+        """Keep derived data in step after any write to a project row."""
+        self._refresh_risk(cursor, project_id)
+        self._record_history(cursor, project_id)
+        self._advance_version(cursor, project_id)
+    
+    def _advance_version(self, cursor, project_id: int):
+        """Bump the project's version (and the portfolio revision), note the change and queue its Java UPDATE event."""
+        cursor.execute('UPDATE projects SET version = version + 1 WHERE id = ?', (project_id,))
+        self._bump_revision(cursor)
+        self._record_change(cursor, project_id, 'updated')
+        if self.outbox:
+            self._queue_project_sync(cursor, project_id, 'UPDATE')
+    
+    def _bump_revision(self, cursor):
+        """Advance the portfolio-wide revision (any project created, changed or deleted)."""
+        cursor.execute('UPDATE portfolio_state SET revision = revision + 1 WHERE id = 1')
+    
+    def get_portfolio_revision(self) -> int:
+        """
+        Get the portfolio-wide change counter.
+        
+        Returns:
+            Revision that changes whenever any project is created, changed or deleted
+        """
+        with self.db.get_connection() as conn:
+            return conn.execute('SELECT revision FROM portfolio_state WHERE id = 1').fetchone()['revision']
+    
+    def get_project_version(self, name: str) -> Optional[tuple]:
+        """
+        Get a project's identity and version without loading it.
+        
+        Args:
+            name: Project name
+        
+        Returns:
+            (id, version) or None if not found. Ids are never reused, so the
+            pair changes even when a project is deleted and recreated.
+        """
+        with self.db.get_connection() as conn:
+            row = conn.execute('SELECT id, version FROM projects WHERE name = ?', (name,)).fetchone()
+            return (row['id'], row['version']) if row else None
+    
+    def _queue_project_sync(self, cursor, project_id: int, action: str):
+        """
+        Queue a sync event for the project's current state.
+        
+        UPDATE events are diffed against the last payload queued for the
+        project (kept in java_sync_state). Without one, e.g. for projects
+        created before the outbox was enabled, the full state is sent.
+        """
+        payload = self._project_payload(cursor, project_id, action)
+        event = payload
+        if action == 'UPDATE':
+            cursor.execute('SELECT payload FROM java_sync_state WHERE project_id = ?', (project_id,))
+            previous = cursor.fetchone()
+            if previous:
+                event = diff_java_payload(json.loads(previous['payload']), payload)
+        
+        cursor.execute('''
+            INSERT INTO java_sync_state (project_id, payload) VALUES (?, ?)
+            ON CONFLICT (project_id) DO UPDATE SET payload = excluded.payload
+        ''', (project_id, json.dumps(payload)))
+        self._enqueue_sync(cursor, payload['project']['name'], event)
+    
+    def _project_payload(self, cursor, project_id: int, action: str) -> Dict:
+        """Build the full Java payload for a project's current stored state."""
+        cursor.execute(
+            'SELECT name, status, completion, delayed_tasks, total_tasks, version FROM projects WHERE id = ?',
+            (project_id,)
+        )
+        row = cursor.fetchone()
+        cursor.execute('''
+            SELECT a.team_name, a.task_count, tm.person_name, tm.assigned_tasks
+            FROM allocations a
+            LEFT JOIN team_members tm ON tm.allocation_id = a.id
+            WHERE a.project_id = ?
+            ORDER BY a.id, tm.id
+        ''', (project_id,))
+        allocations = {}
+        for alloc_row in cursor.fetchall():
+            team = allocations.setdefault(alloc_row['team_name'], {
+                'count': alloc_row['task_count'], 'people': [], 'assignments': {}
+            })
+            person = alloc_row['person_name']
+            if person is not None:
+                if person not in team['assignments']:
+                    team['people'].append(person)
+                team['assignments'][person] = team['assignments'].get(person, 0) + alloc_row['assigned_tasks']
+        
+        return generate_java_payload(
+            row['name'], row['total_tasks'], allocations, action,
+            version=row['version'],
+            fields={
+                'status': row['status'],
+                'completion': row['completion'],
+                'delayedTasks': row['delayed_tasks']
+            }
+        )
+    
+    def _enqueue_sync(self, cursor, project_name: str, payload: Dict):
+        """Queue a Java sync event in the caller's transaction."""
+        cursor.execute(
+            'INSERT INTO java_outbox (project_name, action, payload) VALUES (?, ?, ?)',
+            (project_name, payload['action'], json.dumps(payload))
+        )
+    
+    def claim_outbox(self, limit: int, lease_seconds: float) -> List[Dict]:
+        """
+        Claim the next deliverable Java sync events, oldest first.
+        
+        Events for one project are delivered strictly in order: a project
+        whose oldest pending event is leased or backing off contributes
+        nothing until that event is resolved. Claimed events are leased by
+        pushing next_attempt_at forward, so several dispatchers (one per
+        worker process) never send the same event concurrently.
+        
+        Args:
+            limit: Maximum events to claim
+            lease_seconds: How long the claim holds before others may retry it
+        
+        Returns:
+            [{"id", "project_name", "action", "payload", "attempts", "created_at"}]
+        """
+        now = time.time()
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT id, project_name, action, payload, attempts, next_attempt_at, created_at
+                FROM java_outbox WHERE state = 'pending' ORDER BY id
+            ''')
+            claimed, blocked = [], set()
+            for row in cursor:
+                if row['project_name'] in blocked:
+                    continue
+                if row['next_attempt_at'] > now:
+                    blocked.add(row['project_name'])
+                    continue
+                claimed.append({
+                    'id': row['id'],
+                    'project_name': row['project_name'],
+                    'action': row['action'],
+                    'payload': json.loads(row['payload']),
+                    'attempts': row['attempts'],
+                    'created_at': row['created_at']
+                })
+                if len(claimed) >= limit:
+                    break
+            
+            cursor.executemany(
+                'UPDATE java_outbox SET next_attempt_at = ? WHERE id = ?',
+                [(now + lease_seconds, event['id']) for event in claimed]
+            )
+            return claimed
+    
+    def complete_outbox(self, ids: List[int]):
+        """Remove delivered events."""
+        with self.db.get_connection() as conn:
+            conn.executemany('DELETE FROM java_outbox WHERE id = ?', [(i,) for i in ids])
+    
+    def retry_outbox(self, ids: List[int], error: str, delay_seconds: float):
+        """Schedule failed events for another attempt after a delay."""
+        with self.db.get_connection() as conn:
+            conn.executemany('''
+                UPDATE java_outbox
+                SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?
+                WHERE id = ?
+            ''', [(time.time() + delay_seconds, error, i) for i in ids])
+    
+    def release_outbox(self, ids: List[int]):
+        """Drop the claim on events so they can be claimed again right away."""
+        with self.db.get_connection() as conn:
+            conn.executemany('UPDATE java_outbox SET next_attempt_at = 0 WHERE id = ?', [(i,) for i in ids])
+    
+    def fail_outbox(self, ids: List[int], error: str):
+        """Park events the backend rejected outright; later events proceed."""
+        with self.db.get_connection() as conn:
+            conn.executemany('''
+                UPDATE java_outbox
+                SET state = 'failed', attempts = attempts + 1, last_error = ?
+                WHERE id = ?
+            ''', [(error, i) for i in ids])
+    
+    def get_outbox_stats(self) -> Dict:
+        """
+        Outbox backlog summary.
+        
+        Returns:
+            {"pending": int, "failed": int, "oldest_pending_age_seconds": float | None}
+        """
+        with self.db.get_connection() as conn:
+            row = conn.execute('''
+                SELECT
+                    SUM(state = 'pending') AS pending,
+                    SUM(state = 'failed') AS failed,
+                    MIN(CASE WHEN state = 'pending' THEN created_at END) AS oldest
+                FROM java_outbox
+            ''').fetchone()
+        return {
+            'pending': row['pending'] or 0,
+            'failed': row['failed'] or 0,
+            'oldest_pending_age_seconds': round(time.time() - row['oldest'], 3) if row['oldest'] else None
+        }
+    
+    def get_query_report(self, top: int = 10) -> Dict:
+        """
+        SQL statement audit: timings, recent slow queries and full table scans.
+        
+        Args:
+            top: Statements listed by total time
+        
+        Returns:
+            QueryAuditor report, or {"enabled": False} when auditing is off
+        """
+        if self.db.auditor is None:
+            return {'enabled': False}
+        return {'enabled': True, **self.db.auditor.report(top)}
+    
+    def _record_history(self, cursor, project_id: int):
+        """Append the project's current progress to project_history."""
+        cursor.execute('''
+            INSERT INTO project_history (project_id, status, completion, delayed_tasks, done_tasks, tracked_tasks)
+            SELECT id, status, completion, delayed_tasks, done_tasks, tracked_tasks
+            FROM projects WHERE id = ?
+        ''', (project_id,))
+        if self.history_retention_days and time.monotonic() >= self._history_prune_due:
+            self._history_prune_due = time.monotonic() + HISTORY_PRUNE_SECONDS
+            self._prune_history(cursor, self.history_retention_days)
+    
+    def prune_history(self, retention_days: int) -> int:
+        """
+        Delete progress history older than retention_days, keeping each
+        project's latest entry.
+        
+        Returns:
+            Number of rows deleted
+        """
+        with self._write_connection() as conn:
+            return self._prune_history(conn.cursor(), retention_days)
+    
+    def _prune_history(self, cursor, retention_days: int) -> int:
+        cursor.execute('''
+            DELETE FROM project_history
+            WHERE recorded_at < datetime('now', ?)
+              AND EXISTS (
+                  SELECT 1 FROM project_history newer
+                  WHERE newer.project_id = project_history.project_id AND newer.id > project_history.id
+              )
+        ''', (f'-{int(retention_days)} days',))
+        return cursor.rowcount
+    
+    def _refresh_risk(self, cursor, project_id: int):
+        """Recompute the stored risk_score/risk_level columns for a project."""
+        cursor.execute(
+            'SELECT status, completion, delayed_tasks FROM projects WHERE id = ?',
+            (project_id,)
+        )
+        row = cursor.fetchone()
+        risk = compute_risk(row['status'], row['completion'], row['delayed_tasks'])
+        cursor.execute(
+            'UPDATE projects SET risk_score = ?, risk_level = ? WHERE id = ?',
+            (risk['risk_score'], risk['risk_level'], project_id)
+        )
+    
+    def _task_to_dict(self, row) -> Dict:
+        return {
+            'id': row['id'],
+            'team': row['team_name'],
+            'assignee': row['assignee'],
+            'description': row['description'],
+            'status': row['status'],
+            'due_date': row['due_date']
+        }
+    
+    def get_top_risk_projects(self, limit: int = 20) -> List[Dict]:
+        """
+        Get the highest-risk projects using the stored, indexed risk columns.
+        
+        Args:
+            limit: Number of projects to return
+        
+        Returns:
+            List of project summaries ordered by risk score (highest first)
+        """
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT name, status, completion, total_tasks, delayed_tasks, risk_score, risk_level '
+                'FROM projects ORDER BY risk_score DESC, name LIMIT ?',
+                (limit,)
+            )
+            return [
+                {
+                    'name': row['name'],
+                    'status': row['status'],
+                    'completion': row['completion'],
+                    'total_tasks': row['total_tasks'],
+                    'delayed_tasks': row['delayed_tasks'],
+                    'risk_score': row['risk_score'],
+                    'risk_level': row['risk_level']
+                }
+                for row in cursor.fetchall()
+            ]
+    
+    def get_project_history(self, name: str, limit: int = 100) -> Optional[List[Dict]]:
+        """
+        Get a project's most recent history entries (newest first).
+        
+        Args:
+            name: Project name
+            limit: Maximum entries to return
+        
+        Returns:
+            List of history dicts, or None if the project was not found
+        """
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id FROM projects WHERE name = ?', (name,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            cursor.execute('''
+                SELECT status, completion, delayed_tasks, done_tasks, tracked_tasks, recorded_at
+                FROM project_history
+                WHERE project_id = ?
+                ORDER BY recorded_at DESC, id DESC
+                LIMIT ?
+            ''', (row['id'], limit))
+            return [dict(entry) for entry in cursor.fetchall()]
+    
+    def get_completion_series(self, name: Optional[str] = None, window_days: int = 30) -> List[tuple]:
+        """
+        Get completion history as flat rows for vectorized forecasting.
+        
+        Args:
+            name: Optional project name (all projects when omitted)
+            window_days: Only include entries from the last N days
+        
+        Returns:
+            List of (project_name, julian_day, completion) tuples ordered by
+            project then time
+        """
+        query = '''
+            SELECT p.name, julianday(h.recorded_at), h.completion
+            FROM project_history h
+            JOIN projects p ON p.id = h.project_id
+            WHERE h.recorded_at >= datetime('now', ?)
+        '''
+        params = [f'-{int(window_days)} days']
+        if name is not None:
+            query += ' AND p.name = ? ORDER BY h.project_id, h.recorded_at, h.id'
+            params.append(name)
+        else:
+            # Unary + keeps the planner on the recorded_at range (idx_history_time)
+            # rather than walking all of project_history in project order
+            query += ' ORDER BY +h.project_id, h.recorded_at, h.id'
+        
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    
+    def get_change_markers(self, names: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Get a marker per project that changes whenever the project does.
+        
+        Every project write appends to project_history, so the newest
+        history id is a cheap change marker for caching derived results.
+        
+        Args:
+            names: Optional project names (all projects when omitted)
+        
+        Returns:
+            Dict mapping project names to their change marker
+        """
+        query = '''
+            SELECT p.name, (SELECT MAX(h.id) FROM project_history h WHERE h.project_id = p.id) AS marker
+            FROM projects p
+        '''
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            if names is None:
+                cursor.execute(query)
+                return {row['name']: row['marker'] or 0 for row in cursor.fetchall()}
+            
+            markers = {}
+            names = list(dict.fromkeys(names))
+            for i in range(0, len(names), MAX_QUERY_PARAMS):
+                batch = names[i:i + MAX_QUERY_PARAMS]
+                placeholders = ', '.join('?' for _ in batch)
+                cursor.execute(f'{query} WHERE p.name IN ({placeholders})', batch)
+                markers.update({row['name']: row['marker'] or 0 for row in cursor.fetchall()})
+            return markers
+    
+    def get_simulation_inputs(self, names: Optional[List[str]] = None, window_days: int = 30) -> Dict[str, Dict]:
+        """
+        Get remaining work and daily throughput samples per team.
+        
+        Projects with task rows use tasks left per team and tasks finished
+        per day (from completed_at). Projects without task rows fall back to
+        a single "project" team measured in completion percentage points,
+        with daily gains taken from project_history. Samples cover the last
+        `window_days` days, or the project's lifetime if shorter.
+        
+        Args:
+            names: Optional project names (all projects when omitted)
+            window_days: Days of history to sample throughput from
+        
+        Returns:
+            {name: {"marker": int, "teams": {team: (remaining, [units per day, oldest first])}}}
+        """
+        window = f'-{int(window_days)} days'
+        inputs = {}
+        
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            if names is None:
+                batches = [None]
+            else:
+                names = list(dict.fromkeys(names))
+                batches = [names[i:i + MAX_QUERY_PARAMS] for i in range(0, len(names), MAX_QUERY_PARAMS)]
+            
+            for batch in batches:
+                where, params = '', []
+                if batch is not None:
+                    where = f"WHERE name IN ({', '.join('?' for _ in batch)})"
+                    params = batch
+                cursor.execute(f'''
+                    SELECT id, name, status, completion, tracked_tasks,
+                           CAST(julianday('now') - julianday(created_at) AS INTEGER) AS age,
+                           (SELECT MAX(h.id) FROM project_history h WHERE h.project_id = projects.id) AS marker
+                    FROM projects {where}
+                ''', params)
+                projects = {row['id']: row for row in cursor.fetchall()}
+                if not projects:
+                    continue
+                
+                ids = list(projects)
+                id_placeholders = ', '.join('?' for _ in ids)
+                remaining: Dict[int, Dict[str, int]] = {pid: {} for pid in ids}
+                daily: Dict[int, Dict[str, Dict[int, int]]] = {pid: {} for pid in ids}
+                
+                cursor.execute(f'''
+                    SELECT project_id, COALESCE(team_name, 'unassigned') AS team, COUNT(*) AS open_tasks
+                    FROM tasks
+                    WHERE project_id IN ({id_placeholders}) AND status != 'Done'
+                    GROUP BY project_id, team
+                ''', ids)
+                for row in cursor.fetchall():
+                    remaining[row['project_id']][row['team']] = row['open_tasks']
+                
+                cursor.execute(f'''
+                    SELECT project_id, COALESCE(team_name, 'unassigned') AS team,
+                           CAST(julianday('now') - julianday(completed_at) AS INTEGER) AS age,
+                           COUNT(*) AS finished
+                    FROM tasks
+                    WHERE completed_at >= datetime('now', ?) AND project_id IN ({id_placeholders})
+                    GROUP BY project_id, team, age
+                ''', [window] + ids)
+                for row in cursor.fetchall():
+                    daily[row['project_id']].setdefault(row['team'], {})[row['age']] = row['finished']
+                
+                # Untracked projects: completion range reached on each day
+                untracked = [pid for pid, row in projects.items() if not row['tracked_tasks']]
+                progress: Dict[int, Dict[int, tuple]] = {pid: {} for pid in untracked}
+                if untracked:
+                    cursor.execute(f'''
+                        SELECT project_id, CAST(julianday('now') - julianday(recorded_at) AS INTEGER) AS age,
+                               MIN(completion) AS low, MAX(completion) AS high
+                        FROM project_history
+                        WHERE project_id IN ({', '.join('?' for _ in untracked)}) AND recorded_at >= datetime('now', ?)
+                        GROUP BY project_id, age
+                    ''', untracked + [window])
+                    for row in cursor.fetchall():
+                        progress[row['project_id']][row['age']] = (row['low'] or 0, row['high'] or 0)
+                
+                for pid, row in projects.items():
+                    span = max(1, min(int(window_days), (row['age'] or 0) + 1))
+                    finished = row['status'] in FINISHED_STATUSES
+                    if row['tracked_tasks']:
+                        teams = {
+                            team: (
+                                0 if finished else remaining[pid].get(team, 0),
+                                [counts.get(age, 0) for age in range(span - 1, -1, -1)]
+                            )
+                            for team, counts in daily[pid].items()
+                        }
+                        for team, open_tasks in remaining[pid].items():
+                            teams.setdefault(team, (0 if finished else open_tasks, [0] * span))
+                    else:
+                        gains, best = [], None
+                        for age in range(span - 1, -1, -1):
+                            if age in progress[pid]:
+                                low, high = progress[pid][age]
+                                gains.append(max(0, high - (low if best is None else best)))
+                                best = high if best is None else max(best, high)
+                            else:
+                                gains.append(0)
+                        left = 0 if finished else max(0, 100 - (row['completion'] or 0))
+                        teams = {'project': (left, gains)}
+                    inputs[row['name']] = {'marker': row['marker'] or 0, 'teams': teams}
+        
+        return inputs
+    
+    def get_person_workloads(self, people: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Get the number of tasks each person currently carries across all
+        active projects (Completed and Cancelled projects are ignored).
+        
+        Reads the maintained totals in the people table (single query).
+        
+        Args:
+            people: Optional list of names to restrict the result to
+        
+        Returns:
+            Dict mapping person name to assigned task count
+        """
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT name, total_assigned FROM people WHERE total_assigned > 0')
+            workloads = {row['name']: row['total_assigned'] for row in cursor.fetchall()}
+        
+        if people is None:
+            return workloads
+        return {person: workloads.get(person, 0) for person in people}
+    
+    def get_person(self, name: str) -> Optional[Dict]:
+        """
+        Get a person's workload: totals plus what they carry per project/team.
+        
+        Args:
+            name: Person name
+        
+        Returns:
+            Person workload dict or None if not found
+        """
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT id, name, total_assigned, project_count FROM people WHERE name = ?',
+                (name,)
+            )
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            cursor.execute('''
+                SELECT p.name AS project, p.status, w.team_name,
+                       CASE WHEN p.tracked_tasks > 0 THEN w.open_tasks ELSE w.assigned_tasks END AS assigned_tasks
+                FROM person_workload w
+                JOIN projects p ON p.id = w.project_id
+                WHERE w.person_id = ?
+                ORDER BY p.name, w.team_name
+            ''', (row['id'],))
+            
+            return {
+                'name': row['name'],
+                'total_assigned': row['total_assigned'],
+                'project_count': row['project_count'],
+                'assignments': [
+                    {
+                        'project': item['project'],
+                        'status': item['status'],
+                        'team': item['team_name'],
+                        'assigned_tasks': item['assigned_tasks']
+                    }
+                    for item in cursor.fetchall()
+                ]
+            }
+    
+    def get_overloaded_people(self, threshold: int, limit: int = 50) -> List[Dict]:
+        """
+        Get people carrying more than `threshold` tasks, most loaded first.
+        
+        Args:
+            threshold: Task count above which a person counts as overloaded
+            limit: Maximum number of people to return
+        
+        Returns:
+            List of person summaries
+        """
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT name, total_assigned, project_count FROM people '
+                'WHERE total_assigned > ? ORDER BY total_assigned DESC LIMIT ?',
+                (threshold, limit)
+            )
+            return [
+                {
+                    'name': row['name'],
+                    'total_assigned': row['total_assigned'],
+                    'project_count': row['project_count']
+                }
+                for row in cursor.fetchall()
+            ]
+    
+    def set_person_capacity(self, name: str, capacity: Optional[int]) -> bool:
+        """
+        Set a person's task capacity (None reverts to the default).
+        
+        Returns:
+            True if updated, False if the person was not found
+        """
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('UPDATE people SET capacity = ? WHERE name = ?', (capacity, name))
+            return cursor.rowcount > 0
+    
+    def rebalance_workload(
+        self,
+        default_capacity: int,
+        capacity_overrides: Optional[Dict[str, int]] = None,
+        cross_project_cost: int = 3,
+        dry_run: bool = True
+    ) -> Dict:
+        """
+        Rebalance tasks from overloaded people across the whole portfolio.
+        
+        The snapshot, plan and writes all happen inside one IMMEDIATE
+        transaction, so the plan is applied against exactly the state it
+        was computed from.
+        
+        Args:
+            default_capacity: Capacity for people without their own
+            capacity_overrides: Per-person capacities for this run only
+            cross_project_cost: Churn cost of moving work into a new project
+            dry_run: Compute and return the diff without writing it
+        
+        Returns:
+            Plan dict (see rebalancer.plan_rebalance) with person and
+            project names filled into each move
+        """
+        from rebalancer import plan_rebalance
+        
+        capacity_overrides = capacity_overrides or {}
+        with self._write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            
+            cursor.execute('SELECT id, name, total_assigned, capacity FROM people')
+            people = {
+                row['id']: {
+                    'name': row['name'],
+                    'load': row['total_assigned'],
+                    'capacity': capacity_overrides.get(row['name'], row['capacity'])
+                }
+                for row in cursor.fetchall()
+            }
+            
+            # Projects that track tasks carry load on task rows; those move by reassigning tasks
+            placeholders = ', '.join('?' for _ in FINISHED_STATUSES)
+            cursor.execute(f'''
+                SELECT w.person_id, w.project_id, w.team_name, w.assigned_tasks
+                FROM person_workload w
+                JOIN projects p ON p.id = w.project_id
+                WHERE p.status NOT IN ({placeholders}) AND p.tracked_tasks = 0
+            ''', FINISHED_STATUSES)
+            workload = [tuple(row) for row in cursor.fetchall()]
+            
+            plan = plan_rebalance(people, workload, default_capacity, cross_project_cost)
+            
+            project_ids = {move['project_id'] for move in plan['moves']}
+            project_names = {}
+            if project_ids:
+                id_list = ', '.join(str(int(pid)) for pid in project_ids)
+                cursor.execute(f'SELECT id, name FROM projects WHERE id IN ({id_list})')
+                project_names = {row['id']: row['name'] for row in cursor.fetchall()}
+            
+            for move in plan['moves']:
+                move['from'] = people[move['from_id']]['name']
+                move['to'] = people[move['to_id']]['name']
+                move['project'] = project_names.get(move['project_id'])
+            
+            if not dry_run and plan['moves']:
+                memberships = {(person_id, project_id) for person_id, project_id, _, _ in workload}
+                self._apply_rebalance(cursor, plan['moves'], memberships)
+                for project_id in sorted(project_ids):
+                    self._advance_version(cursor, project_id)
+            
+            plan['dry_run'] = dry_run
+            return plan
+    
+    def _apply_rebalance(self, cursor, moves: List[Dict], memberships: set):
+        """Write rebalance moves to person_workload, team_members and people."""
+        for move in moves:
+            tasks, project_id, team = move['tasks'], move['project_id'], move['team']
+            
+            cursor.execute('''
+                UPDATE person_workload SET assigned_tasks = assigned_tasks - ?
+                WHERE person_id = ? AND project_id = ? AND team_name = ?
+            ''', (tasks, move['from_id'], project_id, team))
+            cursor.execute('''
+                INSERT INTO person_workload (person_id, project_id, team_name, assigned_tasks)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (person_id, project_id, team_name)
+                DO UPDATE SET assigned_tasks = assigned_tasks + excluded.assigned_tasks
+            ''', (move['to_id'], project_id, team, tasks))
+            
+            joins_project = (move['to_id'], project_id) not in memberships
+            memberships.add((move['to_id'], project_id))
+            cursor.execute(
+                'UPDATE people SET total_assigned = total_assigned - ? WHERE id = ?',
+                (tasks, move['from_id'])
+            )
+            cursor.execute(
+                'UPDATE people SET total_assigned = total_assigned + ?, project_count = project_count + ? WHERE id = ?',
+                (tasks, 1 if joins_project else 0, move['to_id'])
+            )
+            
+            # Mirror the move on the team roster, spreading the decrement over
+            # every roster row the person holds in this project's team
+            cursor.execute('''
+                SELECT tm.id, tm.assigned_tasks FROM team_members tm
+                JOIN allocations a ON a.id = tm.allocation_id
+                WHERE a.project_id = ? AND a.team_name = ? AND tm.person_name = ? AND tm.assigned_tasks > 0
+                ORDER BY tm.assigned_tasks DESC, tm.id
+            ''', (project_id, team, move['from']))
+            remaining, decrements = tasks, []
+            for member in cursor.fetchall():
+                taken = min(remaining, member['assigned_tasks'])
+                decrements.append((taken, member['id']))
+                remaining -= taken
+                if not remaining:
+                    break
+            cursor.executemany(
+                'UPDATE team_members SET assigned_tasks = assigned_tasks - ? WHERE id = ?',
+                decrements
+            )
+            
+            cursor.execute(
+                'SELECT id FROM allocations WHERE project_id = ? AND team_name = ? ORDER BY id LIMIT 1',
+                (project_id, team)
+            )
+            allocation_id = cursor.fetchone()['id']
+            cursor.execute('''
+                UPDATE team_members SET assigned_tasks = assigned_tasks + ?
+                WHERE id = (
+                    SELECT id FROM team_members
+                    WHERE allocation_id = ? AND person_name = ?
+                    ORDER BY id LIMIT 1
+                )
+            ''', (tasks, allocation_id, move['to']))
+            if cursor.rowcount == 0:
+                cursor.execute('''
+                    INSERT INTO team_members (allocation_id, person_name, assigned_tasks)
+                    VALUES (?, ?, ?)
+                ''', (allocation_id, move['to'], tasks))
+    
+    def rebuild_workload_index(self):
+        """Recompute the people/person_workload tables from team_members."""
+        with self.db.get_connection() as conn:
+            self.db.rebuild_workload_index(conn.cursor())
+    
+    def _index_project_workload(self, cursor, project_id: int, member_load: Dict):
+        """Record a new project's per-person load and add it to people totals."""
+        cursor.executemany(
+            'INSERT OR IGNORE INTO people (name) VALUES (?)',
+            [(person,) for person in {person for person, _ in member_load}]
+        )
+        cursor.executemany('''
+            INSERT INTO person_workload (person_id, project_id, team_name, assigned_tasks)
+            SELECT id, ?, ?, ? FROM people WHERE name = ?
+        ''', [
+            (project_id, team, assigned, person)
+            for (person, team), assigned in member_load.items()
+        ])
+        self._adjust_people_totals(cursor, project_id, 1)
+    
+    def _adjust_people_totals(self, cursor, project_id: int, sign: int):
+        """
+        Add (sign=1) or remove (sign=-1) a project's load from people totals.
+        
+        Load comes from open task rows once the project tracks tasks, and
+        from the team allocations until then.
+        """
+        cursor.execute('SELECT tracked_tasks FROM projects WHERE id = ?', (project_id,))
+        load = 'open_tasks' if cursor.fetchone()['tracked_tasks'] > 0 else 'assigned_tasks'
+        cursor.execute(f'''
+            SELECT person_id, SUM({load}) AS assigned
+            FROM person_workload
+            WHERE project_id = ?
+            GROUP BY person_id
+        ''', (project_id,))
+        cursor.executemany('''
+            UPDATE people
+            SET total_assigned = total_assigned + ?, project_count = project_count + ?
+            WHERE id = ?
+        ''', [(sign * row['assigned'], sign, row['person_id']) for row in cursor.fetchall()])
+    
+    @contextmanager
+    def _reindexing_people(self, cursor, project_id: int):
+        """
+        Take an active project's load out of people totals while its
+        person_workload rows or task counters change, then add it back.
+        """
+        cursor.execute('SELECT status FROM projects WHERE id = ?', (project_id,))
+        active = cursor.fetchone()['status'] not in FINISHED_STATUSES
+        if active:
+            self._adjust_people_totals(cursor, project_id, -1)
+        yield
+        if active:
+            self._adjust_people_totals(cursor, project_id, 1)
+    
+    def _index_task_load(self, cursor, project_id: int, open_load: Dict, vacated: List = ()):
+        """
+        Apply changes in open tasks per (assignee, team) to person_workload.
+        
+        Call inside _reindexing_people so people totals follow.
+        
+        Args:
+            project_id: Project the tasks belong to
+            open_load: {(assignee, team): change in open tasks}; assignees
+                get a row (and a people entry) even when the change is 0
+            vacated: (assignee, team) pairs that may no longer hold any task;
+                their rows go once nothing else keeps them
+        """
+        open_load = {key: delta for key, delta in open_load.items() if key[0]}
+        cursor.executemany(
+            'INSERT OR IGNORE INTO people (name) VALUES (?)',
+            [(person,) for person in {person for person, _ in open_load}]
+        )
+        cursor.executemany('''
+            INSERT INTO person_workload (person_id, project_id, team_name, open_tasks)
+            SELECT id, ?, ?, ? FROM people WHERE name = ?
+            ON CONFLICT (person_id, project_id, team_name)
+            DO UPDATE SET open_tasks = open_tasks + excluded.open_tasks
+        ''', [
+            (project_id, team, delta, person)
+            for (person, team), delta in open_load.items()
+        ])
+        cursor.executemany('''
+            DELETE FROM person_workload
+            WHERE person_id = (SELECT id FROM people WHERE name = :person)
+              AND project_id = :project AND team_name = :team
+              AND assigned_tasks = 0 AND open_tasks = 0
+              AND NOT EXISTS (
+                  SELECT 1 FROM tasks
+                  WHERE assignee = :person AND project_id = :project
+                    AND COALESCE(team_name, 'unassigned') = :team
+              )
+              AND NOT EXISTS (
+                  SELECT 1 FROM team_members tm
+                  JOIN allocations a ON a.id = tm.allocation_id
+                  WHERE tm.person_name = :person AND a.project_id = :project AND a.team_name = :team
+              )
+        ''', [
+            {'person': person, 'project': project_id, 'team': team}
+            for person, team in vacated if person
+        ])
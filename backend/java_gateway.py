@@ -1,69 +1,173 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
 import requests
 from db_manager import DatabaseManager
 from config import config
+from risk_engine import compute_risk
+import metrics
 
 class JavaGateway:
     """
     Acts as a bridge to the Java backend. 
     Now using SQLite database for persistence.
+    When a backend URL is configured, project changes are queued in an
+    outbox and synced to it in the background.
     """
     def __init__(self, backend_url=None):
+        from java_outbox import OutboxDispatcher
         self.backend_url = backend_url or config.JAVA_BACKEND_URL
-        self.db = DatabaseManager(db_path=config.DATABASE_PATH)
+        self.db = DatabaseManager(
+            db_path=config.DATABASE_PATH,
+            outbox=bool(self.backend_url),
+            history_retention_days=config.HISTORY_RETENTION_DAYS
+        )
+        self.sync = OutboxDispatcher(self.db, self.backend_url).start() if self.backend_url else None
+        # Simulation results per project, reused until the project changes
+        self._simulation_cache = OrderedDict()
+        self._simulation_lock = threading.Lock()
 
     def get_project_status(self, project_name):
         """Get project status from database."""
         return self.db.get_project(project_name)
 
-    def analyze_project_risk(self, project_name):
+    def analyze_project_risk(self, project_name, include_forecast=False):
         """
         Calculates a deterministic risk score for a project.
         Returns: {
             "risk_score": int (0-100),
             "risk_level": "LOW" | "MEDIUM" | "HIGH",
-            "risk_factors": list[str]
+            "risk_factors": list[str],
+            "p80_completion_date": ISO date | None  (only with include_forecast)
         }
         """
         project = self.db.get_project(project_name)
         if not project:
             return None
 
-        score = 0
-        factors = []
-
-        # Factor 1: Delayed Tasks (High Impact)
-        delayed = project.get("delayed_tasks", 0)
-        if delayed > 0:
-            score += delayed * 10
-            factors.append(f"{delayed} delayed tasks")
-
-        # Factor 2: Low Completion (Medium Impact)
-        completion = project.get("completion", 0)
-        status = project.get("status", "")
-        if status == "In Progress" and completion < 20:
-             score += 20
-             factors.append("Low completion rate (<20%)")
-
-        # Cap score at 100
-        score = min(score, 100)
-
-        # Determine Level
-        if score >= 50:
-            level = "HIGH"
-        elif score >= 20:
-            level = "MEDIUM"
-        else:
-            level = "LOW"
+        risk = self._risk_for(project)
+        if include_forecast:
+            self._add_p80(project_name, risk)
+        return risk
+
+    def get_portfolio_revision(self):
+        """Portfolio-wide change counter (for list ETags)."""
+        return self.db.get_portfolio_revision()
 
+    def get_project_version(self, project_name):
+        """(id, version) of a project, or None (for per-project ETags)."""
+        return self.db.get_project_version(project_name)
+
+    def get_project_with_risk(self, project_name, include_forecast=False):
+        """
+        Get a project and its risk analysis from a single fetch.
+        Returns: {"project": dict, "risk_analysis": dict} or None
+        """
+        status = self.get_projects_with_risk([project_name]).get(project_name)
+        if status and include_forecast:
+            self._add_p80(project_name, status["risk_analysis"])
+        return status
+
+    def get_projects_with_risk(self, project_names):
+        """
+        Batch form of get_project_with_risk.
+        Returns: {name: {"project": dict, "risk_analysis": dict}} for found projects
+        """
+        projects = self.db.get_projects(project_names)
         return {
-            "risk_score": score,
-            "risk_level": level,
-            "risk_factors": factors
+            name: {"project": project, "risk_analysis": self._risk_for(project)}
+            for name, project in projects.items()
         }
 
+    def _risk_for(self, project):
+        """Compute risk from an already-loaded project record."""
+        return compute_risk(
+            project.get("status", ""),
+            project.get("completion", 0),
+            project.get("delayed_tasks", 0)
+        )
+
+    def get_top_risk_projects(self, limit=20):
+        """Get the highest-risk projects (single indexed query)."""
+        projects = self.db.get_top_risk_projects(limit)
+        for project in projects:
+            project["risk_factors"] = compute_risk(
+                project["status"], project["completion"], project["delayed_tasks"]
+            )["risk_factors"]
+        return projects
+
+    def get_project_history(self, project_name, limit=100):
+        """Get a project's recent progress history."""
+        return self.db.get_project_history(project_name, limit)
+
+    def forecast_project(self, project_name):
+        """Forecast one project's completion date from its history."""
+        from forecaster import forecast_completion
+        rows = self.db.get_completion_series(project_name, config.FORECAST_WINDOW_DAYS)
+        return forecast_completion(rows).get(project_name)
+
+    def forecast_portfolio(self):
+        """Forecast completion dates for every project in one batch."""
+        from forecaster import forecast_completion
+        rows = self.db.get_completion_series(None, config.FORECAST_WINDOW_DAYS)
+        return forecast_completion(rows)
+
+    def simulate_project(self, project_name):
+        """Monte Carlo delivery-date simulation for one project (P50/P80/P95)."""
+        return self.simulate_projects([project_name]).get(project_name)
+
+    def simulate_projects(self, project_names=None):
+        """
+        Monte Carlo simulations for several projects (all when names is None).
+        Cached results are reused until the project changes or the day rolls
+        over; the rest are simulated together, in parallel for large batches.
+        """
+        from simulator import simulate_portfolio
+
+        today = datetime.utcnow().date().isoformat()
+        markers = self.db.get_change_markers(project_names)
+        results, stale = {}, []
+        with self._simulation_lock:
+            for name, marker in markers.items():
+                cached = self._simulation_cache.get(name)
+                if cached and cached[0] == (marker, today):
+                    self._simulation_cache.move_to_end(name)
+                    results[name] = cached[1]
+                else:
+                    stale.append(name)
+
+        metrics.record_cache("simulation", True, len(results))
+        metrics.record_cache("simulation", False, len(stale))
+        if not stale:
+            return results
+
+        everything = project_names is None and len(stale) == len(markers)
+        inputs = self.db.get_simulation_inputs(None if everything else stale, config.FORECAST_WINDOW_DAYS)
+        simulated = simulate_portfolio({
+            name: (item["teams"], item["marker"]) for name, item in inputs.items()
+        })
+
+        with self._simulation_lock:
+            for name, result in simulated.items():
+                self._simulation_cache[name] = ((inputs[name]["marker"], today), result)
+                self._simulation_cache.move_to_end(name)
+            while len(self._simulation_cache) > config.SIMULATION_CACHE_SIZE:
+                self._simulation_cache.popitem(last=False)
+
+        results.update(simulated)
+        return results
+
+    def _add_p80(self, project_name, risk):
+        """Attach the simulated P80 delivery date to a risk analysis."""
+        simulation = self.simulate_project(project_name)
+        risk["p80_completion_date"] = simulation["p80"] if simulation else None
+        risk["schedule_status"] = simulation["status"] if simulation else None
+
     def create_project(self, project_name, total_tasks, allocations):
         """Create a new project in database."""
         result = self.db.create_project(project_name, total_tasks, allocations)
+        self._wake_sync()
         return {"success": True, "message": f"Project {project_name} created with detailed assignments."}
 
     def list_all_projects(self):
@@ -71,23 +175,129 @@ class JavaGateway:
         return self.db.get_all_projects_summary()
 
     def update_project_status(self, project_name, **kwargs):
-        """Update a project's status/completion/delayed_tasks."""
-        updated = self.db.update_project(project_name, **kwargs)
-        if updated:
+        """
+        Update a project's status/completion/delayed_tasks.
+
+        Projects that track tasks derive completion and delayed_tasks from
+        them; values sent for those fields are listed under "ignored_fields".
+        """
+        result = self.db.update_project(project_name, **kwargs)
+        self._wake_sync()
+        if result is None:
+            return {"success": False, "message": f"Project {project_name} not found."}
+        if not result["ignored"]:
             return {"success": True, "message": f"Project {project_name} updated."}
-        return {"success": False, "message": f"Project {project_name} not found."}
+
+        note = (f"{' and '.join(result['ignored'])} for {project_name} "
+                f"{'is' if len(result['ignored']) == 1 else 'are'} derived from its tasks; update the tasks instead.")
+        if not result["updated"]:
+            return {"success": False, "message": f"Not updated: {note}", "ignored_fields": result["ignored"]}
+        return {
+            "success": True,
+            "message": f"Project {project_name} updated, but {note}",
+            "ignored_fields": result["ignored"]
+        }
 
     def delete_project(self, project_name):
         """Delete a project by name."""
         deleted = self.db.delete_project(project_name)
+        self._wake_sync()
         if deleted:
             return {"success": True, "message": f"Project {project_name} deleted."}
         return {"success": False, "message": f"Project {project_name} not found."}
 
+    def add_tasks(self, project_name, task_descriptions, team=None, due_date=None):
+        """
+        Categorize task descriptions into teams, assign them round-robin to
+        team members, and bulk insert them as task rows.
+        """
+        from task_assigner import build_task_rows
+        project = self.db.get_project(project_name)
+        if not project:
+            return {"success": False, "message": f"Project {project_name} not found."}
+
+        rows = build_task_rows(task_descriptions, project.get("allocations"), team)
+        for row in rows:
+            row["due_date"] = due_date
+        added = self.db.add_tasks(project_name, rows)
+        self._wake_sync()
+        teams = sorted({row["team"] for row in rows})
+        return {
+            "success": True,
+            "message": f"Added {added} tasks to {project_name}.",
+            "added": added,
+            "teams": teams
+        }
+
+    def get_tasks(self, project_name, status=None, limit=100, offset=0):
+        """Get a page of a project's tasks."""
+        return self.db.get_tasks(project_name, status, limit, offset)
+
+    def update_task(self, task_id, **kwargs):
+        """Update a task's status/assignee/due date."""
+        updated = self.db.update_task(task_id, **kwargs)
+        self._wake_sync()
+        if updated:
+            return {"success": True, "message": f"Task {task_id} updated."}
+        return {"success": False, "message": f"Task {task_id} not found."}
+
+    def get_person_workloads(self, people=None):
+        """Get current cross-project task counts per person."""
+        return self.db.get_person_workloads(people)
+
+    def get_person(self, name):
+        """Get a person's workload across projects and teams."""
+        return self.db.get_person(name)
+
+    def get_overloaded_people(self, threshold=None, limit=50):
+        """Get people above the overload threshold, most loaded first."""
+        if threshold is None:
+            threshold = config.OVERLOAD_THRESHOLD
+        return self.db.get_overloaded_people(threshold, limit)
+
+    def set_person_capacity(self, name, capacity):
+        """Set (or clear) a person's task capacity."""
+        updated = self.db.set_person_capacity(name, capacity)
+        if updated:
+            return {"success": True, "message": f"Capacity for {name} updated."}
+        return {"success": False, "message": f"Person {name} not found."}
+
+    def rebalance_workload(self, capacities=None, dry_run=True):
+        """Compute (and optionally apply) a portfolio-wide workload rebalance."""
+        plan = self.db.rebalance_workload(
+            default_capacity=config.DEFAULT_PERSON_CAPACITY,
+            capacity_overrides=capacities,
+            cross_project_cost=config.REBALANCE_CROSS_PROJECT_COST,
+            dry_run=dry_run
+        )
+        if not dry_run:
+            self._wake_sync()
+        return plan
+
     def generate_java_payload(self, project_name, total_tasks, allocations, action="CREATE"):
         """Generate structured JSON for Java backend API."""
         from task_assigner import generate_java_payload
         return generate_java_payload(project_name, total_tasks, allocations, action)
 
+    def _wake_sync(self):
+        """Let the outbox dispatcher send a write's sync event right away."""
+        if self.sync:
+            self.sync.wake()
+
+    def sync_stats(self):
+        """Java sync delivery metrics, or {"enabled": False} without a backend URL."""
+        if not self.sync:
+            return {"enabled": False}
+        return {"enabled": True, **self.sync.stats()}
+
+    def query_stats(self):
+        """SQL statement audit (slowest statements, slow queries, table scans)."""
+        return self.db.get_query_report(top=5)
+
+    def close(self):
+        """Stop the outbox dispatcher (pending events stay queued for next start)."""
+        if self.sync:
+            self.sync.stop()
+
     def health_check(self):
         return {"status": "Java Gateway is active (SQLite Database: ON)"}
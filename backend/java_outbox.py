@@ -0,0 +1,197 @@
+"""
+Delivers queued Java backend sync events (the java_outbox table).
+
+Project writes queue an event in the same SQLite transaction as the change
+(see DatabaseManager._enqueue_sync), so an event exists exactly when its
+change committed. OutboxDispatcher drains them on a background thread:
+
+- each batch is one POST to JAVA_BACKEND_URL + JAVA_SYNC_PATH with body
+  {"events": [{"eventId": int, "action": str, "project": {...}}]}, sent over
+  one requests.Session so the connection is kept alive between batches
+- a project's events go out in commit order, and a failing event only holds
+  back later events for the same project
+- connection errors, timeouts, 5xx and 429 are retried with exponential
+  backoff. The schedule is stored in the table, so it survives restarts
+- any other 4xx marks the event as failed. A rejected batch is first split
+  so that only the offending events are parked
+- eventId is the outbox row id, so the backend can ignore redelivered events
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import config
+
+
+THROUGHPUT_WINDOW_SECONDS = 60   # Window for the delivered-per-second rate
+
+
+class OutboxDispatcher:
+    """Background sender for java_outbox events."""
+
+    def __init__(
+        self,
+        db,
+        backend_url: str,
+        batch_size: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        timeout: Optional[float] = None,
+        retry_initial: Optional[float] = None,
+        retry_max: Optional[float] = None
+    ):
+        self.db = db
+        self.url = backend_url.rstrip('/') + config.JAVA_SYNC_PATH
+        self.batch_size = batch_size or config.JAVA_OUTBOX_BATCH_SIZE
+        self.poll_interval = poll_interval or config.JAVA_OUTBOX_POLL_SECONDS
+        self.timeout = timeout or config.JAVA_API_TIMEOUT
+        self.retry_initial = retry_initial or config.JAVA_OUTBOX_RETRY_INITIAL_SECONDS
+        self.retry_max = retry_max or config.JAVA_OUTBOX_RETRY_MAX_SECONDS
+        # A claim must outlive one request, including the adapter's connect retries
+        self.lease_seconds = self.timeout * 3 + 5
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._recent = deque()   # (delivered_at, count) inside the throughput window
+        self.delivered = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        self.last_lag_seconds: Optional[float] = None
+        self.max_lag_seconds = 0.0
+
+    def start(self) -> "OutboxDispatcher":
+        """Start the background dispatch thread."""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="java-outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the dispatch thread and close pooled connections."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.session.close()
+
+    def wake(self):
+        """Dispatch now instead of at the next poll (called after writes)."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                if self.dispatch_once():
+                    continue
+            except Exception as e:
+                print(f"WARNING: Java outbox dispatch failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def dispatch_once(self) -> int:
+        """
+        Claim and send one batch.
+
+        Returns:
+            Number of events claimed (0 when nothing is due)
+        """
+        events = self.db.claim_outbox(self.batch_size, self.lease_seconds)
+        if events:
+            self._send(events)
+        return len(events)
+
+    def _send(self, events: List[Dict]) -> bool:
+        """Send events in one request. Returns False if they were scheduled for retry."""
+        body = {"events": [{"eventId": event["id"], **event["payload"]} for event in events]}
+        ids = [event["id"] for event in events]
+        try:
+            response = self.session.post(self.url, json=body, timeout=self.timeout)
+        except requests.RequestException as e:
+            self._retry(events, f"{type(e).__name__}: {e}")
+            return False
+
+        status = response.status_code
+        if status < 300:
+            self.db.complete_outbox(ids)
+            self._record_delivery(events)
+        elif status == 429 or status >= 500:
+            self._retry(events, f"HTTP {status}")
+            return False
+        elif len(events) > 1:
+            # Find the rejected events one by one. Once a project's event is
+            # retried, its later events go back to wait behind it
+            blocked, held = set(), []
+            for event in events:
+                if event["project_name"] in blocked:
+                    held.append(event["id"])
+                elif not self._send([event]):
+                    blocked.add(event["project_name"])
+            if held:
+                self.db.release_outbox(held)
+        else:
+            error = f"HTTP {status}: {response.text[:200]}"
+            self.db.fail_outbox(ids, error)
+            with self._lock:
+                self.failed += 1
+                self.last_error = error
+            print(f"WARNING: Java backend rejected {events[0]['action']} for {events[0]['project_name']}: {error}")
+        return True
+
+    def _retry(self, events: List[Dict], error: str):
+        attempts = max(event["attempts"] for event in events)
+        delay = min(self.retry_max, self.retry_initial * 2 ** attempts)
+        delay *= 0.5 + random.random() / 2   # Jitter so workers don't retry in lockstep
+        self.db.retry_outbox([event["id"] for event in events], error, delay)
+        with self._lock:
+            self.retries += len(events)
+            self.last_error = error
+        print(f"WARNING: Java sync of {len(events)} events failed ({error}), retrying in {delay:.1f}s")
+
+    def _record_delivery(self, events: List[Dict]):
+        now = time.time()
+        lag = max(now - event["created_at"] for event in events)
+        with self._lock:
+            self.delivered += len(events)
+            self.batches += 1
+            self.last_lag_seconds = lag
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+            self._recent.append((now, len(events)))
+            while self._recent and self._recent[0][0] < now - THROUGHPUT_WINDOW_SECONDS:
+                self._recent.popleft()
+
+    def stats(self) -> Dict:
+        """Delivery counters, throughput, lag and backlog."""
+        now = time.time()
+        with self._lock:
+            recent = sum(count for at, count in self._recent if at >= now - THROUGHPUT_WINDOW_SECONDS)
+            stats = {
+                "url": self.url,
+                "running": self._thread is not None,
+                "delivered": self.delivered,
+                "batches": self.batches,
+                "retries": self.retries,
+                "failed": self.failed,
+                "delivered_per_second": round(recent / THROUGHPUT_WINDOW_SECONDS, 3),
+                "last_lag_seconds": round(self.last_lag_seconds, 3) if self.last_lag_seconds is not None else None,
+                "max_lag_seconds": round(self.max_lag_seconds, 3),
+                "last_error": self.last_error
+            }
+        stats["backlog"] = self.db.get_outbox_stats()
+        return stats
@@ -0,0 +1,468 @@
+"""
+LLM token accounting and quota budgets.
+
+Every Gemini call first reserves an estimate of its tokens against the
+configured budgets:
+- per minute and per day, for both requests and tokens
+- per session, as a fair share (LLM_SESSION_SHARE) of the per-minute limits
+
+The reservation is settled with the real usage_metadata once the call
+returns. The counters live in Redis or SQLite (LLM_BUDGET_BACKEND), so the
+limits hold across every worker and not just within one. If the counter
+store is unreachable, this worker counts in memory until it can reach it
+again.
+
+As a budget runs low the app degrades gracefully, well before the real
+quota wall:
+- Optional calls (smart responses, summaries) switch to local templates
+  once less than LLM_BUDGET_LOW_WATERMARK of a budget is left.
+- Parsing switches to the local regex parser at LLM_BUDGET_HEADROOM.
+- After a 429 from Gemini, every call is answered locally for
+  LLM_RATE_LIMIT_COOLDOWN_SECONDS.
+
+A limit of 0 means unlimited. With every limit at 0 the counter store is
+not used at all: token usage still goes to the metrics, and the 429
+cooldown is kept per worker.
+
+The chat processor and the summary engine share one budget (get_budget).
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import redis
+
+import metrics
+from config import config
+from session_backends import get_connection_pool
+
+
+# Output tokens assumed per call until usage_metadata reports the real count
+EXPECTED_OUTPUT_TOKENS = {"parse": 250, "response": 150, "summary": 200}
+# Calls with a local template answer; they are the first to stop as budgets run low
+OPTIONAL_CALLS = {"response", "summary"}
+# Key prefix -> denial reason
+REASONS = {"m": "minute", "d": "day", "s": "session", "cooldown": "cooldown"}
+# After the counter store fails, count locally this long before trying it again
+STORE_RETRY_SECONDS = 30
+
+MINUTE_TTL = 120
+DAY_TTL = 2 * 86400
+
+
+class BudgetExhausted(Exception):
+    """Raised instead of calling Gemini when a budget denies the call."""
+
+    def __init__(self, call: str):
+        super().__init__(f"LLM budget exhausted for {call} calls")
+        self.call = call
+
+
+def is_rate_limit_error(exception) -> bool:
+    """Whether a Gemini error is a quota rejection (HTTP 429)."""
+    return "429" in str(exception) or "RESOURCE_EXHAUSTED" in str(exception)
+
+
+# ─── Counter stores ──────────────────────────────────────────────────────────
+
+class CounterStore:
+    """Expiring integer counters with an atomic check-and-add."""
+
+    name = "base"
+
+    def reserve(self, increments: Dict[str, int], limits: Dict[str, int], ttls: Dict[str, float]) -> Optional[str]:
+        """
+        Add increments unless that would take a counter past its limit.
+
+        Args:
+            increments: {key: amount to add}
+            limits: {key: maximum value}; keys may be absent from increments (checked only)
+            ttls: {key: seconds until the counter expires}, for incremented keys
+
+        Returns:
+            None when the increments were applied, else the first key over its limit
+        """
+        raise NotImplementedError
+
+    def add(self, increments: Dict[str, int], ttls: Dict[str, float]):
+        """Add (possibly negative) amounts unconditionally."""
+        raise NotImplementedError
+
+    def get(self, keys: List[str]) -> Dict[str, int]:
+        """Current values (0 for missing or expired counters)."""
+        raise NotImplementedError
+
+
+class MemoryCounterStore(CounterStore):
+    """Counters in this process only."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._counters: Dict[str, list] = {}   # key -> [value, expires_at]
+        self._lock = threading.Lock()
+
+    def _value(self, key: str, now: float) -> int:
+        entry = self._counters.get(key)
+        if entry is None or entry[1] <= now:
+            self._counters.pop(key, None)
+            return 0
+        return entry[0]
+
+    def _add(self, increments, ttls, now):
+        for key, amount in increments.items():
+            value = self._value(key, now)
+            entry = self._counters.get(key)
+            # Window counters keep their first expiry; each 429 restarts the cooldown
+            expires_at = entry[1] if entry is not None and key != "cooldown" else now + ttls[key]
+            self._counters[key] = [value + amount, expires_at]
+
+    def reserve(self, increments, limits, ttls):
+        now = time.time()
+        with self._lock:
+            for key, limit in limits.items():
+                if self._value(key, now) + increments.get(key, 0) > limit:
+                    return key
+            self._add(increments, ttls, now)
+        return None
+
+    def add(self, increments, ttls):
+        with self._lock:
+            self._add(increments, ttls, time.time())
+
+    def get(self, keys):
+        now = time.time()
+        with self._lock:
+            return {key: self._value(key, now) for key in keys}
+
+
+class RedisCounterStore(CounterStore):
+    """
+    Counters shared by every worker and host through Redis.
+
+    A reservation increments optimistically in one MULTI/EXEC and is rolled
+    back if a counter went over its limit. Racing callers can therefore be
+    denied together near a limit, but the limit is never overshot.
+    """
+
+    name = "redis"
+
+    def __init__(self, host=None, port=None, db=None, prefix: str = "llm:"):
+        self.client = redis.Redis(connection_pool=get_connection_pool(
+            host or config.REDIS_HOST,
+            port or config.REDIS_PORT,
+            db or config.REDIS_DB
+        ))
+        self.prefix = prefix
+
+    def _queue_add(self, pipe, increments, ttls):
+        for key, amount in increments.items():
+            pipe.incrby(self.prefix + key, amount)
+            pipe.expire(self.prefix + key, max(1, math.ceil(ttls[key])))
+
+    def reserve(self, increments, limits, ttls):
+        checked = [key for key in limits if key not in increments]
+        pipe = self.client.pipeline(transaction=True)
+        self._queue_add(pipe, increments, ttls)
+        if checked:
+            pipe.mget([self.prefix + key for key in checked])
+        results = pipe.execute()
+
+        values = dict(zip(increments, results[0:2 * len(increments):2]))
+        if checked:
+            values.update(zip(checked, (int(value or 0) for value in results[-1])))
+        exceeded = next((key for key, limit in limits.items() if values[key] > limit), None)
+        if exceeded is not None:
+            self.add({key: -amount for key, amount in increments.items() if amount}, ttls)
+        return exceeded
+
+    def add(self, increments, ttls):
+        if increments:
+            pipe = self.client.pipeline(transaction=True)
+            self._queue_add(pipe, increments, ttls)
+            pipe.execute()
+
+    def get(self, keys):
+        values = self.client.mget([self.prefix + key for key in keys])
+        return {key: int(value or 0) for key, value in zip(keys, values)}
+
+
+class SqliteCounterStore(CounterStore):
+    """Counters in a SQLite file shared by the workers of one node."""
+
+    name = "sqlite"
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or config.LLM_BUDGET_SQLITE_PATH
+        self._local = threading.local()
+        self._swept_minute = None
+        self._connection().execute('''
+            CREATE TABLE IF NOT EXISTS llm_counters (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not shared)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _values(self, conn, keys, now) -> Dict[str, int]:
+        placeholders = ",".join("?" * len(keys))
+        rows = conn.execute(
+            f'SELECT key, value FROM llm_counters WHERE key IN ({placeholders}) AND expires_at > ?',
+            (*keys, now)
+        ).fetchall()
+        return {key: 0 for key in keys} | dict(rows)
+
+    def _add(self, conn, increments, ttls, now):
+        conn.executemany('''
+            INSERT INTO llm_counters (key, value, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                value = CASE WHEN expires_at > ? THEN value + excluded.value ELSE excluded.value END,
+                expires_at = CASE WHEN expires_at > ? AND key != 'cooldown' THEN expires_at
+                                  ELSE excluded.expires_at END
+        ''', [(key, amount, now + ttls[key], now, now) for key, amount in increments.items()])
+        minute = int(now // 60)
+        if minute != self._swept_minute:
+            self._swept_minute = minute
+            conn.execute('DELETE FROM llm_counters WHERE expires_at <= ?', (now,))
+
+    def _transaction(self, work):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(conn, time.time())
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def reserve(self, increments, limits, ttls):
+        def work(conn, now):
+            values = self._values(conn, list(limits), now)
+            for key, limit in limits.items():
+                if values[key] + increments.get(key, 0) > limit:
+                    return key
+            self._add(conn, increments, ttls, now)
+            return None
+        return self._transaction(work)
+
+    def add(self, increments, ttls):
+        if increments:
+            self._transaction(lambda conn, now: self._add(conn, increments, ttls, now))
+
+    def get(self, keys):
+        return self._values(self._connection(), keys, time.time())
+
+
+# Shared by every budget in the process (memory backend and outage fallback)
+_memory_store = MemoryCounterStore()
+
+
+def create_store(kind: Optional[str] = None) -> CounterStore:
+    """Counter store for LLM_BUDGET_BACKEND (redis | sqlite | memory)."""
+    kind = (kind or config.LLM_BUDGET_BACKEND).lower()
+    if kind == "redis":
+        return RedisCounterStore()
+    if kind == "sqlite":
+        return SqliteCounterStore()
+    return _memory_store
+
+
+# ─── Budget ──────────────────────────────────────────────────────────────────
+
+class Reservation:
+    """Tokens and a request held for one Gemini call until it is settled."""
+
+    __slots__ = ("call", "session_id", "estimated_tokens", "keys", "started")
+
+    def __init__(self, call: str, session_id: Optional[str], estimated_tokens: int, keys: Dict[str, str]):
+        self.call = call
+        self.session_id = session_id
+        self.estimated_tokens = estimated_tokens
+        self.keys = keys
+        self.started = time.perf_counter()
+
+
+class LLMBudget:
+    """Accounts for Gemini usage and decides whether a call may go out."""
+
+    def __init__(self, store: Optional[CounterStore] = None, requests_per_minute=None, tokens_per_minute=None,
+                 requests_per_day=None, tokens_per_day=None, session_share=None, headroom=None,
+                 low_watermark=None, cooldown_seconds=None):
+        def setting(value, default):
+            return default if value is None else value
+
+        self.store = store or create_store()
+        self.limits = {
+            "minute": {"requests": setting(requests_per_minute, config.LLM_REQUESTS_PER_MINUTE),
+                       "tokens": setting(tokens_per_minute, config.LLM_TOKENS_PER_MINUTE)},
+            "day": {"requests": setting(requests_per_day, config.LLM_REQUESTS_PER_DAY),
+                    "tokens": setting(tokens_per_day, config.LLM_TOKENS_PER_DAY)},
+        }
+        self.session_share = setting(session_share, config.LLM_SESSION_SHARE)
+        self.headroom = setting(headroom, config.LLM_BUDGET_HEADROOM)
+        self.low_watermark = setting(low_watermark, config.LLM_BUDGET_LOW_WATERMARK)
+        self.cooldown_seconds = setting(cooldown_seconds, config.LLM_RATE_LIMIT_COOLDOWN_SECONDS)
+        self._store_down_until = 0.0
+        self._cooldown_until = 0.0   # Local cooldown while unlimited
+
+    @property
+    def unlimited(self) -> bool:
+        """No limit is set, so there is nothing to count in the store."""
+        return not any(limit > 0 for window in self.limits.values() for limit in window.values())
+
+    # Counters are keyed by window so they reset on their own
+    def _keys(self, session_id: Optional[str], now: float) -> Dict[str, str]:
+        minute, day = int(now // 60), time.strftime("%Y%m%d", time.gmtime(now))
+        keys = {
+            "minute_requests": f"m:{minute}:requests", "minute_tokens": f"m:{minute}:tokens",
+            "day_requests": f"d:{day}:requests", "day_tokens": f"d:{day}:tokens",
+        }
+        if session_id:
+            keys["session_requests"] = f"s:{session_id}:{minute}:requests"
+            keys["session_tokens"] = f"s:{session_id}:{minute}:tokens"
+        return keys
+
+    def _ttls(self, keys: Dict[str, str]) -> Dict[str, float]:
+        ttls = {key: DAY_TTL if name.startswith("day") else MINUTE_TTL for name, key in keys.items()}
+        ttls["cooldown"] = max(self.cooldown_seconds, 0.001)
+        return ttls
+
+    def _store(self) -> CounterStore:
+        return _memory_store if time.monotonic() < self._store_down_until else self.store
+
+    def _with_store(self, operation):
+        """Run operation(store), counting in memory for a while if the store fails."""
+        store = self._store()
+        try:
+            return operation(store)
+        except (redis.RedisError, sqlite3.Error, OSError) as e:
+            if store is _memory_store:
+                raise
+            print(f"WARNING: LLM budget store ({store.name}) unavailable, counting in memory: {e}")
+            self._store_down_until = time.monotonic() + STORE_RETRY_SECONDS
+            return operation(_memory_store)
+
+    def acquire(self, call: str, prompt: str, session_id: Optional[str] = None) -> Optional[Reservation]:
+        """
+        Reserve budget for a Gemini call.
+
+        Args:
+            call: "parse", "response" or "summary"
+            prompt: The prompt about to be sent (sizes the token estimate)
+            session_id: Chat session charged for its fair share, if any
+
+        Returns:
+            Reservation to settle after the call, or None to answer locally
+        """
+        estimate = len(prompt) // 4 + EXPECTED_OUTPUT_TOKENS.get(call, 200)
+        if self.unlimited:
+            if time.monotonic() < self._cooldown_until:
+                return self._deny(call, "cooldown")
+            return Reservation(call, session_id, estimate, {})
+
+        keys = self._keys(session_id, time.time())
+        increments = {key: (1 if name.endswith("requests") else estimate) for name, key in keys.items()}
+
+        # Optional calls stop at the low watermark, parsing only at the headroom
+        usable = 1 - (self.low_watermark if call in OPTIONAL_CALLS else self.headroom)
+        limits = {"cooldown": 0}
+        for window, window_limits in self.limits.items():
+            for kind, limit in window_limits.items():
+                if limit > 0:
+                    limits[keys[f"{window}_{kind}"]] = max(1, math.floor(limit * usable))
+                if window == "minute" and limit > 0 and session_id and self.session_share > 0:
+                    limits[keys[f"session_{kind}"]] = max(1, math.floor(limit * self.session_share))
+
+        exceeded = self._with_store(lambda store: store.reserve(increments, limits, self._ttls(keys)))
+        if exceeded is not None:
+            return self._deny(call, REASONS[exceeded.split(":")[0]])
+        return Reservation(call, session_id, estimate, keys)
+
+    def _deny(self, call: str, reason: str) -> None:
+        metrics.LLM_BUDGET_DENIALS.labels(call, reason).inc()
+        print(f"DEBUG: LLM budget denied {call} call ({reason} budget); answering locally")
+        return None
+
+    def settle(self, reservation: Reservation, usage=None, failed: bool = False, rate_limited: bool = False):
+        """
+        Replace a reservation's estimate with the call's real usage.
+
+        Args:
+            reservation: From acquire()
+            usage: The response's usage_metadata (prompt/candidates token counts)
+            failed: The call raised (no tokens are charged; the request still counts)
+            rate_limited: Gemini answered 429; start the cooldown
+        """
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        output_tokens = getattr(usage, "candidates_token_count", None)
+        if failed:
+            used = 0
+        elif isinstance(prompt_tokens, int):
+            output_tokens = output_tokens if isinstance(output_tokens, int) else 0
+            used = prompt_tokens + output_tokens
+            metrics.LLM_TOKENS.labels(reservation.call, "prompt").inc(prompt_tokens)
+            metrics.LLM_TOKENS.labels(reservation.call, "output").inc(output_tokens)
+            metrics.LLM_CALL_TOKENS.labels(reservation.call).observe(used)
+        else:
+            used = reservation.estimated_tokens   # No usage reported: keep the estimate
+
+        latency_ms = (time.perf_counter() - reservation.started) * 1000
+        print(f"DEBUG: Gemini {reservation.call} call: {used} tokens, {latency_ms:.0f} ms"
+              + (" (failed)" if failed else ""))
+
+        delta = used - reservation.estimated_tokens
+        increments = {key: delta for name, key in reservation.keys.items() if name.endswith("tokens") and delta}
+        ttls = self._ttls(reservation.keys)
+        if rate_limited and self.cooldown_seconds > 0:
+            if reservation.keys:
+                increments["cooldown"] = 1
+            else:
+                self._cooldown_until = time.monotonic() + self.cooldown_seconds
+            print(f"WARNING: Gemini rate limited; answering locally for {self.cooldown_seconds:.0f}s")
+        if increments:
+            self._with_store(lambda store: store.add(increments, ttls))
+
+    def stats(self) -> Dict:
+        """Current usage against the limits (for /health)."""
+        if self.unlimited:
+            return {"backend": None, "unlimited": True, "cooling_down": time.monotonic() < self._cooldown_until}
+        keys = self._keys(None, time.time())
+        try:
+            values = self._with_store(lambda store: store.get(list(keys.values()) + ["cooldown"]))
+        except Exception as e:
+            return {"backend": self.store.name, "error": str(e)}
+        return {
+            "backend": self._store().name,
+            "minute": {kind: {"used": values[keys[f"minute_{kind}"]], "limit": limit or None}
+                       for kind, limit in self.limits["minute"].items()},
+            "day": {kind: {"used": values[keys[f"day_{kind}"]], "limit": limit or None}
+                    for kind, limit in self.limits["day"].items()},
+            "cooling_down": values["cooldown"] > 0,
+        }
+
+
+_budget: Optional[LLMBudget] = None
+_budget_lock = threading.Lock()
+
+
+def get_budget() -> LLMBudget:
+    """Get (or create) the budget shared by every Gemini caller in the process."""
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = LLMBudget()
+        return _budget
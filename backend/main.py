@@ -1,14 +1,32 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, List
 from nlp_processor import NLPProcessor
 from java_gateway import JavaGateway
 from session_manager import SessionManager
-from task_assigner import auto_assign_tasks, suggest_allocation, generate_java_payload
+from change_feed import ChangeFeed
+from response_encoding import CompressionMiddleware, ORJSONRoute
+from request_profiler import ProfileStore, ProfilingMiddleware, profiling_route, token_matches
+import metrics
+from batch_parser import parse_batch
+from process_pools import shutdown_process_pools
+from task_assigner import (
+    auto_assign_tasks,
+    auto_assign_tasks_by_capacity,
+    suggest_allocation,
+    generate_java_payload,
+)
 from validators import (
     validate_project_creation,
     validate_project_update,
+    validate_tasks,
+    validate_task_update,
     check_duplicate_project,
 )
 from config import config
@@ -17,7 +35,14 @@ app = FastAPI(
     title="AI Project Manager",
     description="Intelligent chatbot for project management powered by Gemini AI",
     version="2.0.0",
+    default_response_class=ORJSONResponse,
 )
+# Plain dict results are serialized with orjson directly (see response_encoding)
+app.router.route_class = ORJSONRoute
+# Endpoints are only wrapped for profiling when it is enabled (zero cost otherwise)
+profile_store = ProfileStore() if config.PROFILING_ENABLED else None
+if profile_store is not None:
+    app.router.route_class = profiling_route(ORJSONRoute)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,12 +50,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+app.add_middleware(CompressionMiddleware)
+if profile_store is not None:
+    app.add_middleware(ProfilingMiddleware, store=profile_store)
+if config.METRICS_ENABLED:
+    app.add_middleware(metrics.HTTPMetricsMiddleware)
 
 # Initialize components
 nlp = NLPProcessor()
 gateway = JavaGateway()
 session_manager = SessionManager()
+change_feed = ChangeFeed()
+gateway.db.add_listener(change_feed.publish)
 
 HELP_TEXT = """🤖 **AI Project Manager** — Here's what I can do:
 
@@ -39,6 +72,7 @@ HELP_TEXT = """🤖 **AI Project Manager** — Here's what I can do:
 • **List projects**: "Show all projects"
 • **Update a project**: "Update Project Alpha to 50% completion"
 • **Delete a project**: "Delete Project Alpha"
+• **Rank by risk**: "Show the top 5 riskiest projects"
 • **Get help**: "Help" or "What can you do?"
 
 I also remember context — try "What's the status of it?" after mentioning a project!"""
@@ -54,6 +88,8 @@ class ProjectCreateRequest(BaseModel):
     name: str
     total_tasks: int = 0
     allocations: Optional[Dict] = None
+    assignment_mode: str = "even"
+    capacities: Optional[Dict[str, int]] = None
 
 class ProjectUpdateRequest(BaseModel):
     status: Optional[str] = None
@@ -64,30 +100,109 @@ class AutoAssignRequest(BaseModel):
     total_tasks: int
     allocations: Dict
     task_descriptions: Optional[List[str]] = None
+    mode: str = "even"
+    capacities: Optional[Dict[str, int]] = None
+
+class TaskCreateRequest(BaseModel):
+    descriptions: List[str]
+    team: Optional[str] = None
+    due_date: Optional[str] = None
+
+class TaskUpdateRequest(BaseModel):
+    status: Optional[str] = None
+    assignee: Optional[str] = None
+    due_date: Optional[str] = None
+    description: Optional[str] = None
+
+class ProjectLookupRequest(BaseModel):
+    names: List[str]
+
+class CapacityRequest(BaseModel):
+    capacity: Optional[int] = None
+
+class RebalanceRequest(BaseModel):
+    dry_run: bool = True
+    capacities: Optional[Dict[str, int]] = None
+
+class BatchParseRequest(BaseModel):
+    messages: List[str]
+
+
+ASSIGNMENT_MODES = {"even", "capacity"}
+DEFAULT_RISK_TOP_N = 20
+MAX_RISK_TOP_N = 500
+
+
+def assign_tasks(total_tasks: int, allocations: Dict, mode: str = "even",
+                 capacities: Optional[Dict[str, int]] = None,
+                 task_descriptions: Optional[List[str]] = None):
+    """
+    Assign tasks within teams.
+
+    "even" splits each team's tasks round-robin; "capacity" balances against
+    each person's current cross-project workload and optional capacity limits.
+
+    Returns:
+        (enhanced allocations, overflow warnings)
+    """
+    if mode == "capacity":
+        people = {
+            person
+            for team_data in allocations.values() if isinstance(team_data, dict)
+            for person in team_data.get("people", [])
+        }
+        workloads = gateway.get_person_workloads(sorted(people))
+        return auto_assign_tasks_by_capacity(total_tasks, allocations, workloads, capacities)
+    return auto_assign_tasks(total_tasks, allocations, task_descriptions), []
 
 
 # ─── Chat Endpoint (Primary) ─────────────────────────────────────────────────
 
 @app.post("/chat")
-def chat(req: ChatRequest):
-    # 0. Handle session
-    session_id = req.session_id or "default"
-    session_manager.add_message(session_id, "user", req.message)
+def chat(req: ChatRequest, fields: Optional[str] = None):
+    """
+    Handle one chat turn.
+    
+    ?fields=a,b keeps only those keys of the response's `data` object
+    (e.g. fields=project_data,risk); fields= drops it entirely.
+    """
+    # 0. Handle session: anonymous clients get their own ID (returned so they
+    #    can send it back); writes are buffered and flushed in one round trip
+    session_id = req.session_id or uuid.uuid4().hex
+    stages = metrics.StageTimer(metrics.CHAT_STAGE_SECONDS)
+    with session_manager.unit_of_work(session_id) as session:
+        response = handle_chat_turn(req, session, stages)
+        stages.start("session")   # Buffered session writes flush on exit
+    stages.finish()
+    response["session_id"] = session_id
+    
+    if fields is not None and isinstance(response.get("data"), dict):
+        wanted = {field.strip() for field in fields.split(",") if field.strip()}
+        response["data"] = {key: value for key, value in response["data"].items() if key in wanted}
+    return response
+
+
+def handle_chat_turn(req: ChatRequest, session, stages: metrics.StageTimer):
+    session.add_message("user", req.message)
 
     # 1. Parse Intent and Entities with AI
-    parsed_data = nlp.parse_input(req.message)
+    stages.start("parse")
+    parsed_data = nlp.parse_input(req.message, session.session_id)
 
     # 1.5. Handle pronoun references ("it", "that", etc.)
+    stages.start("context")
     if any(word in req.message.lower() for word in ["it", "that project", "the project"]) and not parsed_data.get("project_name"):
-        last_project = session_manager.get_last_project_reference(session_id)
+        last_project = session.get_last_project_reference()
         if last_project:
             parsed_data["project_name"] = last_project
 
     intent = parsed_data.get("intent", "UNKNOWN")
+    metrics.CHAT_INTENTS.labels(intent).inc()
+    stages.start("handle")
 
     # ── HELP ──
     if intent == "HELP":
-        session_manager.add_message(session_id, "assistant", HELP_TEXT)
+        session.add_message("assistant", HELP_TEXT)
         return {"intent": "HELP", "data": parsed_data, "response": HELP_TEXT}
 
     # ── UNKNOWN ──
@@ -106,21 +221,37 @@ def chat(req: ChatRequest):
                 status_emoji = {"Created": "🆕", "In Progress": "🔄", "Completed": "✅", "On Hold": "⏸️", "Cancelled": "❌"}.get(p["status"], "📁")
                 lines.append(f"  {status_emoji} **{p['name']}** — {p['status']} ({p['completion']}% complete, {p['total_tasks']} tasks)")
             msg = "\n".join(lines)
-        session_manager.add_message(session_id, "assistant", msg)
+        session.add_message("assistant", msg)
         return {"intent": "LIST_PROJECTS", "data": {"projects": projects}, "response": msg}
 
+    # ── RISK_PORTFOLIO ──
+    if intent == "RISK_PORTFOLIO":
+        top_n = min(parsed_data.get("top_n") or DEFAULT_RISK_TOP_N, MAX_RISK_TOP_N)
+        projects = gateway.get_top_risk_projects(top_n)
+        if not projects:
+            msg = "No projects found yet. Try creating one!"
+        else:
+            lines = [f"⚠️ **Top {len(projects)} project(s) by risk:**\n"]
+            for rank, p in enumerate(projects, 1):
+                level_emoji = {"HIGH": "🔴", "MEDIUM": "🟠", "LOW": "🟢"}.get(p["risk_level"], "⚪")
+                factors = f" — {', '.join(p['risk_factors'])}" if p["risk_factors"] else ""
+                lines.append(f"  {rank}. {level_emoji} **{p['name']}** — {p['risk_level']} ({p['risk_score']}/100){factors}")
+            msg = "\n".join(lines)
+        session.add_message("assistant", msg)
+        return {"intent": "RISK_PORTFOLIO", "data": {"projects": projects}, "response": msg}
+
     # ── GET_STATUS ──
     if intent == "GET_STATUS":
         project_name = parsed_data.get("project_name")
         if not project_name:
             return {"intent": "GET_STATUS", "data": parsed_data, "response": "Which project are you referring to?"}
 
-        project_info = gateway.get_project_status(project_name)
-        if not project_info:
+        status = gateway.get_project_with_risk(project_name)
+        if not status:
             return {"intent": "GET_STATUS", "data": parsed_data, "response": f"I couldn't find any data for {project_name}."}
 
-        parsed_data["project_data"] = project_info
-        parsed_data["risk_analysis"] = gateway.analyze_project_risk(project_name)
+        parsed_data["project_data"] = status["project"]
+        parsed_data["risk_analysis"] = status["risk_analysis"]
 
     # ── CREATE_PROJECT ──
     elif intent == "CREATE_PROJECT":
@@ -184,12 +315,16 @@ def chat(req: ChatRequest):
             return {"response": result.get("message", f"Could not delete {project_name}.")}
 
     # 3. Generate natural language response
-    final_response = nlp.generate_smart_response(parsed_data)
+    stages.start("respond")
+    final_response = nlp.generate_smart_response(parsed_data, session.session_id)
+    if parsed_data.get("backend_result", {}).get("ignored_fields"):
+        # The generated reply may not mention it, so say it directly
+        final_response = f"{final_response}\n\nNote: {parsed_data['backend_result']['message']}"
 
     # 4. Store assistant response and project reference
-    session_manager.add_message(session_id, "assistant", final_response)
+    session.add_message("assistant", final_response)
     if parsed_data.get("project_name"):
-        session_manager.set_last_project_reference(session_id, parsed_data["project_name"])
+        session.set_last_project_reference(parsed_data["project_name"])
 
     return {
         "intent": intent,
@@ -200,21 +335,133 @@ def chat(req: ChatRequest):
 
 # ─── REST Endpoints (Direct CRUD for Java Backend) ───────────────────────────
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def _not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Set ETag/Cache-Control on the response, or return a 304 when the
+    client's copy is current (checked before any payload is built).
+    """
+    headers = {"ETag": etag, "Cache-Control": config.PROJECT_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    current = _etag_matches(if_none_match, etag)
+    if if_none_match:
+        metrics.record_cache("etag", current)
+    if current:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
 @app.get("/projects")
-def list_projects():
-    """List all projects with summary data."""
+def list_projects(request: Request, response: Response):
+    """List all projects with summary data (conditional on the portfolio revision)."""
+    etag = f'"portfolio-{gateway.get_portfolio_revision()}"'
+    not_modified = _not_modified(request, response, etag)
+    if not_modified:
+        return not_modified
     projects = gateway.list_all_projects()
     return {"projects": projects, "total": len(projects)}
 
 
+@app.post("/projects/lookup")
+def lookup_projects(req: ProjectLookupRequest):
+    """Get several projects with risk analysis in one round of queries."""
+    if len(req.names) > config.MAX_LOOKUP_PROJECTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Cannot look up more than {config.MAX_LOOKUP_PROJECTS} projects at once."
+        )
+    found = gateway.get_projects_with_risk(req.names)
+    missing = [name for name in req.names if name not in found]
+    return {"projects": found, "missing": missing}
+
+
 @app.get("/projects/{name}")
-def get_project(name: str):
-    """Get a single project with risk analysis."""
-    project = gateway.get_project_status(name)
-    if not project:
+def get_project(name: str, request: Request, response: Response, include_forecast: bool = False):
+    """
+    Get a single project with risk analysis (optionally with the simulated P80 date).
+    Conditional on the project's version; forecasts also change with the date.
+    """
+    version = gateway.get_project_version(name)
+    if not version:
+        raise HTTPException(status_code=404, detail=f"Project '{name}' not found.")
+    etag = f'project-{version[0]}-{version[1]}'
+    if include_forecast:
+        etag += f'-{datetime.utcnow().date().isoformat()}'
+    not_modified = _not_modified(request, response, f'"{etag}"')
+    if not_modified:
+        return not_modified
+    
+    status = gateway.get_project_with_risk(name, include_forecast)
+    if not status:
         raise HTTPException(status_code=404, detail=f"Project '{name}' not found.")
-    risk = gateway.analyze_project_risk(name)
-    return {"project": project, "risk_analysis": risk}
+    return status
+
+
+@app.get("/risk/portfolio")
+def risk_portfolio(request: Request, response: Response, top: int = DEFAULT_RISK_TOP_N):
+    """Get the top-N projects ranked by stored risk score."""
+    if top < 1:
+        raise HTTPException(status_code=400, detail="top must be a positive integer.")
+    not_modified = _not_modified(request, response, f'"portfolio-{gateway.get_portfolio_revision()}-top{top}"')
+    if not_modified:
+        return not_modified
+    projects = gateway.get_top_risk_projects(min(top, MAX_RISK_TOP_N))
+    return {"projects": projects, "total": len(projects)}
+
+
+@app.get("/projects/{name}/history")
+def project_history(name: str, limit: int = 100):
+    """Get a project's progress history (newest first)."""
+    history = gateway.get_project_history(name, min(limit, 1000))
+    if history is None:
+        raise HTTPException(status_code=404, detail=f"Project '{name}' not found.")
+    return {"history": history, "count": len(history)}
+
+
+@app.get("/projects/{name}/forecast")
+def project_forecast(name: str):
+    """Get a project's completion velocity and estimated completion date."""
+    if not gateway.get_project_status(name):
+        raise HTTPException(status_code=404, detail=f"Project '{name}' not found.")
+    forecast = gateway.forecast_project(name) or {
+        "completion": None,
+        "velocity_per_day": None,
+        "estimated_completion_date": None,
+        "samples": 0,
+        "trend": "insufficient_history"
+    }
+    return {"project": name, "forecast": forecast}
+
+
+@app.get("/forecast/portfolio")
+def portfolio_forecast():
+    """Forecast completion dates for every project."""
+    forecasts = gateway.forecast_portfolio()
+    return {"forecasts": forecasts, "total": len(forecasts)}
+
+
+@app.get("/projects/{name}/simulation")
+def project_simulation(name: str):
+    """Monte Carlo P50/P80/P95 delivery dates for a project."""
+    simulation = gateway.simulate_project(name)
+    if simulation is None:
+        raise HTTPException(status_code=404, detail=f"Project '{name}' not found.")
+    return {"project": name, "simulation": simulation}
+
+
+@app.get("/simulation/portfolio")
+def portfolio_simulation():
+    """Monte Carlo delivery dates for every project."""
+    simulations = gateway.simulate_projects()
+    return {"simulations": simulations, "total": len(simulations)}
 
 
 @app.post("/projects", status_code=201)
@@ -226,15 +473,20 @@ def create_project(req: ProjectCreateRequest):
     valid, error = validate_project_creation(req.name, req.total_tasks, req.allocations)
     if not valid:
         raise HTTPException(status_code=400, detail=error)
+    if req.assignment_mode not in ASSIGNMENT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown assignment mode '{req.assignment_mode}'.")
 
     allocations = req.allocations or {}
+    warnings = []
     if allocations:
-        allocations = auto_assign_tasks(req.total_tasks, allocations)
+        allocations, warnings = assign_tasks(
+            req.total_tasks, allocations, req.assignment_mode, req.capacities
+        )
 
     result = gateway.create_project(req.name, req.total_tasks, allocations)
     java_payload = generate_java_payload(req.name, req.total_tasks, allocations)
 
-    return {"result": result, "java_payload": java_payload}
+    return {"result": result, "java_payload": java_payload, "warnings": warnings}
 
 
 @app.put("/projects/{name}")
@@ -249,6 +501,8 @@ def update_project(name: str, req: ProjectUpdateRequest):
         raise HTTPException(status_code=400, detail=error)
 
     result = gateway.update_project_status(name, **update_fields)
+    if result.get("ignored_fields") and not result.get("success"):
+        raise HTTPException(status_code=409, detail=result.get("message"))
     if not result.get("success"):
         raise HTTPException(status_code=404, detail=result.get("message"))
 
@@ -264,22 +518,238 @@ def delete_project(name: str):
     return result
 
 
+@app.post("/projects/{name}/tasks", status_code=201)
+def add_project_tasks(name: str, req: TaskCreateRequest):
+    """Categorize task descriptions into teams and add them as task rows."""
+    project = gateway.get_project_status(name)
+    if not project:
+        raise HTTPException(status_code=404, detail=f"Project '{name}' not found.")
+
+    tasks = [{"description": d, "due_date": req.due_date} for d in req.descriptions]
+    valid, error = validate_tasks(tasks, project["tracked_tasks"])
+    if not valid:
+        raise HTTPException(status_code=400, detail=error)
+
+    result = gateway.add_tasks(name, req.descriptions, req.team, req.due_date)
+    if not result.get("success"):
+        raise HTTPException(status_code=404, detail=result.get("message"))
+    return result
+
+
+@app.get("/projects/{name}/tasks")
+def list_project_tasks(name: str, status: Optional[str] = None, limit: int = 100, offset: int = 0):
+    """List a project's tasks, optionally filtered by status."""
+    tasks = gateway.get_tasks(name, status, min(limit, 1000), offset)
+    if tasks is None:
+        raise HTTPException(status_code=404, detail=f"Project '{name}' not found.")
+    return {"tasks": tasks, "count": len(tasks), "offset": offset}
+
+
+@app.put("/tasks/{task_id}")
+def update_task(task_id: int, req: TaskUpdateRequest):
+    """Update a task; the project's completion and delayed counts follow."""
+    update_fields = {k: v for k, v in req.dict().items() if v is not None}
+    if not update_fields:
+        raise HTTPException(status_code=400, detail="No fields to update.")
+
+    valid, error = validate_task_update(
+        update_fields.get("status"), update_fields.get("due_date"), update_fields.get("assignee")
+    )
+    if not valid:
+        raise HTTPException(status_code=400, detail=error)
+
+    result = gateway.update_task(task_id, **update_fields)
+    if not result.get("success"):
+        raise HTTPException(status_code=404, detail=result.get("message"))
+    return result
+
+
 @app.post("/tasks/auto-assign")
 def auto_assign(req: AutoAssignRequest):
-    """Run intelligent task auto-assignment."""
-    enhanced = auto_assign_tasks(
-        req.total_tasks, req.allocations, req.task_descriptions
+    """Run intelligent task auto-assignment (mode: "even" or "capacity")."""
+    if req.mode not in ASSIGNMENT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown assignment mode '{req.mode}'.")
+
+    enhanced, warnings = assign_tasks(
+        req.total_tasks, req.allocations, req.mode, req.capacities, req.task_descriptions
     )
     return {
         "allocations": enhanced,
         "total_tasks": req.total_tasks,
+        "warnings": warnings,
         "java_payload": generate_java_payload(
             "auto-assign", req.total_tasks, enhanced
         )
     }
 
 
+@app.get("/people/overloaded")
+def overloaded_people(threshold: Optional[int] = None, limit: int = 50):
+    """List people carrying more tasks than the threshold, most loaded first."""
+    threshold = config.OVERLOAD_THRESHOLD if threshold is None else threshold
+    people = gateway.get_overloaded_people(threshold, limit)
+    return {"people": people, "threshold": threshold, "total": len(people)}
+
+
+@app.get("/people/{name}")
+def get_person(name: str):
+    """Get what a person is working on and how loaded they are."""
+    person = gateway.get_person(name)
+    if not person:
+        raise HTTPException(status_code=404, detail=f"Person '{name}' not found.")
+    person["overloaded"] = person["total_assigned"] > config.OVERLOAD_THRESHOLD
+    return {"person": person}
+
+
+@app.put("/people/{name}/capacity")
+def set_person_capacity(name: str, req: CapacityRequest):
+    """Set a person's task capacity (null reverts to the default)."""
+    if req.capacity is not None and req.capacity < 0:
+        raise HTTPException(status_code=400, detail="Capacity must be a non-negative integer.")
+    result = gateway.set_person_capacity(name, req.capacity)
+    if not result.get("success"):
+        raise HTTPException(status_code=404, detail=result.get("message"))
+    return result
+
+
+@app.post("/workload/rebalance")
+def rebalance_workload(req: RebalanceRequest):
+    """
+    Move tasks from overloaded people to teammates with spare capacity,
+    with minimal churn. Defaults to a dry run that only returns the diff.
+    """
+    plan = gateway.rebalance_workload(req.capacities, req.dry_run)
+    return {
+        "dry_run": plan["dry_run"],
+        "moves": [
+            {k: move[k] for k in ("from", "to", "project", "team", "tasks")}
+            for move in plan["moves"]
+        ],
+        "moved_tasks": plan["moved_tasks"],
+        "churn_cost": plan["churn_cost"],
+        "overload_before": plan["overload_before"],
+        "overload_after": plan["overload_after"],
+        "solve_time_ms": plan["solve_time_ms"]
+    }
+
+
+@app.post("/parse/batch")
+def parse_messages_batch(req: BatchParseRequest):
+    """
+    Parse many messages locally (regex parser + spaCy) without touching
+    the database or the LLM. Results stream back as NDJSON, one line per
+    message, in completion order; each line carries its input `index`.
+    """
+    if not req.messages:
+        raise HTTPException(status_code=400, detail="No messages to parse.")
+    if len(req.messages) > config.PARSE_BATCH_MAX_MESSAGES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch cannot exceed {config.PARSE_BATCH_MAX_MESSAGES} messages."
+        )
+
+    def stream_results():
+        for chunk in parse_batch(req.messages):
+            for result in chunk:
+                yield json.dumps(result) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@app.websocket("/ws/projects")
+async def project_changes(websocket: WebSocket, projects: Optional[str] = None):
+    """
+    Live feed of project changes, replacing polling of GET /projects.
+    
+    Query: ?projects=A,B follows only those projects (default: every project).
+    Client messages: {"subscribe": [names] | "*"}, {"unsubscribe": [names] | "*"}
+    Server messages:
+        {"type": "subscribed", "projects": [names] | "*"}  (on connect and after each change)
+        {"type": "created" | "updated" | "deleted", "project", "version", "state"}
+        {"type": "resync"}  (the client fell behind; reload its projects)
+    """
+    await websocket.accept()
+    names = [name.strip() for name in projects.split(",") if name.strip()] if projects else None
+    subscription = change_feed.subscribe(names)
+    
+    def acknowledge():
+        following = "*" if subscription.projects is None else sorted(subscription.projects)
+        subscription.send({"type": "subscribed", "projects": following})
+    
+    async def send_events():
+        while True:
+            await websocket.send_json(await subscription.get())
+    
+    acknowledge()
+    sender = asyncio.create_task(send_events())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            for action in ("subscribe", "unsubscribe"):
+                if isinstance(message, dict) and action in message:
+                    target = message[action]
+                    if isinstance(target, str) and target != "*":
+                        target = [target]
+                    getattr(subscription, action)(None if target == "*" else target)
+                    acknowledge()
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        sender.cancel()
+        change_feed.unsubscribe(subscription)
+
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    shutdown_process_pools()
+    session_manager.close()
+    gateway.close()
+    change_feed.close()
+
+
 @app.get("/health")
 def health():
-    return gateway.health_check()
+    return {
+        **gateway.health_check(),
+        "sessions": session_manager.stats(),
+        "java_sync": gateway.sync_stats(),
+        "change_feed": change_feed.stats(),
+        "llm_budget": nlp.budget.stats(),
+        "db_queries": gateway.query_stats()
+    }
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Latency histograms and counters in the Prometheus text format."""
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def _require_profiling_token(request: Request):
+    if profile_store is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled.")
+    if not token_matches(request.headers.get("x-profile-token")):
+        raise HTTPException(status_code=403, detail="A valid X-Profile-Token header is required.")
+
+
+@app.get("/admin/profiles")
+def list_profiles(request: Request):
+    """Stored request profiles, newest first."""
+    _require_profiling_token(request)
+    profiles = profile_store.list()
+    return {"profiles": profiles, "total": len(profiles), "max_files": profile_store.max_files}
+
+
+@app.get("/admin/profiles/{profile_id}")
+def download_profile(profile_id: str, request: Request):
+    """Download one profile (.prof pstats data or .collapsed flame graph stacks)."""
+    _require_profiling_token(request)
+    found = profile_store.path_for(profile_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found.")
+    path, metadata = found
+    media_type = "text/plain" if metadata["mode"] == "sampling" else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=metadata["file"])
 #abc
\ No newline at end of file
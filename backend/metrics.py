@@ -0,0 +1,380 @@
+"""
+In-process latency histograms and counters, exposed at GET /metrics.
+
+Metrics are recorded in memory and rendered in the Prometheus text format
+(version 0.0.4). No client library or external service is needed. Recording
+one observation costs a perf_counter() call, a bisect and a short critical
+section, so recording stays on in production. Each uvicorn worker keeps its
+own registry. When scraping several workers, Prometheus sums them by
+instance.
+
+What is measured:
+    chat_stage_seconds{stage}              /chat pipeline: parse, context, handle, respond, session
+    gemini_request_seconds{call,outcome}   Gemini API calls (parse / response)
+    spacy_seconds                          spaCy entity extraction per message
+    db_query_seconds{method}               DatabaseManager public methods
+    session_operation_seconds{operation}   SessionManager reads and writes
+    http_request_duration_seconds{...}     Every HTTP request, by route template
+    chat_intents_total{intent}             Parsed /chat intents
+    llm_fallbacks_total{call}              Gemini failures answered locally
+    cache_requests_total{cache,result}     Simulation cache and ETag hits/misses
+"""
+
+import bisect
+import functools
+import inspect
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# Latency buckets (seconds): fine at the low end for SQLite and Redis,
+# up to 30s for slow Gemini calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric"):
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Zero every metric (tests)."""
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values, **kwargs):
+        """
+        The child for one combination of label values.
+
+        Args:
+            values / kwargs: Label values, positionally or by name
+        """
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+    def reset(self):
+        # Children are zeroed in place: timed_methods holds references to them
+        with self._lock:
+            children = list(self._children.values())
+        for child in children:
+            child.reset()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def reset(self):
+        with self._lock:
+            self.value = 0.0
+
+
+class Counter(_Metric):
+    """Monotonically increasing count (name should end in _total)."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        """Increment an unlabelled counter."""
+        self.labels().inc(amount)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_label_text(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in self._items()
+        ]
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # Last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> "_Timer":
+        """Context manager observing the time spent inside it."""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * len(self.counts)
+            self.sum = 0.0
+
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (latencies in seconds) in fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional[Registry] = REGISTRY):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        """Observe a value on an unlabelled histogram."""
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        """Time a block on an unlabelled histogram."""
+        return self.labels().time()
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, child in self._items():
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class StageTimer:
+    """
+    Times consecutive stages of one request into a histogram labelled by stage.
+
+    start(stage) ends the running stage and begins the next one; finish()
+    ends the last. Code that returns early therefore needs no extra timing:
+    its time is charged to whichever stage was running.
+    """
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.stage: Optional[str] = None
+        self.started = 0.0
+
+    def start(self, stage: Optional[str]):
+        now = time.perf_counter()
+        if self.stage is not None:
+            self.histogram.labels(self.stage).observe(now - self.started)
+        self.stage, self.started = stage, now
+
+    def finish(self):
+        self.start(None)
+
+
+def timed_methods(histogram: Histogram, names: Optional[Iterable[str]] = None):
+    """
+    Class decorator timing methods into a histogram labelled by method name.
+
+    Args:
+        histogram: Histogram with a single label
+        names: Methods to time (default: every public method except generators)
+    """
+    def decorate(cls):
+        targets = names if names is not None else [
+            name for name, member in vars(cls).items()
+            if not name.startswith("_") and inspect.isfunction(member)
+            and not inspect.isgeneratorfunction(member)
+        ]
+        for name in targets:
+            method = getattr(cls, name)
+            setattr(cls, name, _timed(method, histogram.labels(name)))
+        return cls
+    return decorate
+
+
+def _timed(method, child: _HistogramChild):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            child.observe(time.perf_counter() - started)
+    return wrapper
+
+
+class HTTPMetricsMiddleware:
+    """ASGI middleware timing HTTP requests by method, route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), status
+            ).observe(time.perf_counter() - started)
+
+
+# ─── Metric catalogue ────────────────────────────────────────────────────────
+
+CHAT_STAGE_SECONDS = Histogram(
+    "chat_stage_seconds", "Time spent in each /chat pipeline stage", ["stage"])
+GEMINI_REQUEST_SECONDS = Histogram(
+    "gemini_request_seconds", "Gemini API call latency", ["call", "outcome"])
+SPACY_SECONDS = Histogram(
+    "spacy_seconds", "spaCy entity extraction time per message")
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds", "DatabaseManager method latency", ["method"])
+SESSION_OPERATION_SECONDS = Histogram(
+    "session_operation_seconds", "SessionManager operation latency", ["operation"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"])
+LLM_CALL_TOKENS = Histogram(
+    "llm_call_tokens", "Tokens used per Gemini call (prompt + output)", ["call"],
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000))
+
+CHAT_INTENTS = Counter(
+    "chat_intents_total", "Parsed /chat intents", ["intent"])
+LLM_FALLBACKS = Counter(
+    "llm_fallbacks_total", "Gemini calls that failed and were answered locally", ["call"])
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"])
+DB_SLOW_QUERIES = Counter(
+    "db_slow_queries_total", "SQL statements slower than DB_SLOW_QUERY_MS")
+DB_TABLE_SCANS = Counter(
+    "db_table_scans_total", "Distinct SQL statements whose query plan scans a whole table")
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Gemini tokens used, by call and kind (prompt/output)", ["call", "kind"])
+LLM_BUDGET_DENIALS = Counter(
+    "llm_budget_denials_total", "Gemini calls answered locally by budget, by call and reason", ["call", "reason"])
+
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    """Count cache lookups."""
+    if count:
+        CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc(count)
+
+
+def render() -> str:
+    """The default registry in Prometheus text format."""
+    return REGISTRY.render()
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
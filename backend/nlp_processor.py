@@ -1,9 +1,12 @@
 from google import genai
 import os
 import json
+import time
 from dotenv import load_dotenv
-import spacy
-from spacy.language import Language
+from batch_parser import load_spacy_pipeline, extract_entities
+from config import config
+from llm_budget import BudgetExhausted, get_budget, is_rate_limit_error
+import metrics
 
 load_dotenv()
 
@@ -12,29 +15,51 @@ class NLPProcessor:
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY not found in .env")
-        self.client = genai.Client(api_key=api_key)
+        http_options = {"base_url": config.GEMINI_BASE_URL} if config.GEMINI_BASE_URL else None
+        self.client = genai.Client(api_key=api_key, http_options=http_options)
+        # Token accounting and quota budgets, shared with ai_engine and across workers
+        self.budget = get_budget()
         
         # Initialize spaCy with custom patterns
+        self.nlp = load_spacy_pipeline()
+
+    def _generate(self, call: str, prompt: str, session_id: str = None):
+        """
+        Call Gemini within the LLM budget, timing it under gemini_request_seconds{call, outcome}.
+
+        Raises:
+            BudgetExhausted: The budget wants this call answered locally
+        """
+        reservation = self.budget.acquire(call, prompt, session_id)
+        if reservation is None:
+            raise BudgetExhausted(call)
+
+        started = time.perf_counter()
+        outcome = "error"
         try:
-            self.nlp = spacy.load("en_core_web_sm")
-            # Add custom EntityRuler for better project name extraction
-            if "entity_ruler" not in self.nlp.pipe_names:
-                ruler = self.nlp.add_pipe("entity_ruler", before="ner")
-                patterns = [
-                    {"label": "PROJECT", "pattern": [{"LOWER": "project"}, {"IS_ALPHA": True}]},
-                    {"label": "PROJECT", "pattern": [{"LOWER": "project"}, {"IS_ALPHA": True}, {"IS_ALPHA": True}]},
-                    {"label": "TASK_COUNT", "pattern": [{"IS_DIGIT": True}, {"LOWER": {"IN": ["tasks", "task", "items"]}}]},
-                ]
-                ruler.add_patterns(patterns)
-            print("DEBUG: spaCy model loaded with custom entity patterns.")
-        except OSError:
-            print("WARNING: spaCy model 'en_core_web_sm' not found. Entity extraction will be limited.")
-            self.nlp = None
-
-    def parse_input(self, user_input: str) -> dict:
+            response = self.client.models.generate_content(
+                model="gemini-2.5-flash",
+                contents=prompt
+            )
+            outcome = "ok"
+        except Exception as e:
+            self.budget.settle(reservation, failed=True, rate_limited=is_rate_limit_error(e))
+            raise
+        finally:
+            metrics.GEMINI_REQUEST_SECONDS.labels(call, outcome).observe(time.perf_counter() - started)
+        self.budget.settle(reservation, getattr(response, "usage_metadata", None))
+        return response
+
+    def _entities(self, user_input: str) -> dict:
+        """spaCy entities for one message (timed under spacy_seconds)."""
+        with metrics.SPACY_SECONDS.time():
+            return extract_entities(self.nlp(user_input))
+
+    def parse_input(self, user_input: str, session_id: str = None) -> dict:
         """
         Uses Gemini to parse the user input into a structured JSON 
         containing intent, entities, and validation checks.
+        The local parser answers when Gemini fails or the budget runs low.
         """
         
         prompt = f"""
@@ -49,6 +74,7 @@ class NLPProcessor:
         - "LIST_PROJECTS": asking to list, show, or enumerate all projects.
         - "UPDATE_TASK": asking to update a project's status, completion, or other fields.
         - "DELETE_PROJECT": asking to delete or remove a project.
+        - "RISK_PORTFOLIO": asking which projects are riskiest / most at risk across the portfolio.
         - "HELP": asking what commands are available or how to use the system.
         - "UNKNOWN": if it doesn't fit any of the above.
 
@@ -64,10 +90,11 @@ class NLPProcessor:
            - "status": "In Progress" | "Completed" | "On Hold" | "Cancelled" | null
            - "completion": integer 0-100 | null
            - "delayed_tasks": integer | null
+        6. "top_n": For RISK_PORTFOLIO, how many projects were asked for (integer) or null.
 
         Output Format:
         {{
-            "intent": "GET_STATUS" | "CREATE_PROJECT" | "LIST_PROJECTS" | "UPDATE_TASK" | "DELETE_PROJECT" | "HELP" | "UNKNOWN",
+            "intent": "GET_STATUS" | "CREATE_PROJECT" | "LIST_PROJECTS" | "UPDATE_TASK" | "DELETE_PROJECT" | "RISK_PORTFOLIO" | "HELP" | "UNKNOWN",
             "project_name": "extracted name" or null,
             "total_tasks": 0 or null,
             "allocations": {{ 
@@ -76,15 +103,12 @@ class NLPProcessor:
                 ...
             }} or {{}},
             "validation_error": "error string" or null,
-            "update_fields": {{ "status": null, "completion": null, "delayed_tasks": null }}
+            "update_fields": {{ "status": null, "completion": null, "delayed_tasks": null }},
+            "top_n": null
         }}
         """
 
         from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
-        import time
-
-        def is_rate_limit_error(exception):
-            return "429" in str(exception) or "RESOURCE_EXHAUSTED" in str(exception)
 
         @retry(
             retry=retry_if_exception(is_rate_limit_error),
@@ -93,10 +117,7 @@ class NLPProcessor:
         )
         def call_gemini():
             print(f"DEBUG: Processing input: {user_input}")
-            return self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
-            )
+            return self._generate("parse", prompt, session_id)
 
         try:
             response = call_gemini()
@@ -113,36 +134,26 @@ class NLPProcessor:
             # Enrich with spaCy entities (if available)
             parsed_data = json.loads(raw_text)
             if self.nlp:
-                doc = self.nlp(user_input)
-                parsed_data["entities"] = {
-                    "people": [ent.text for ent in doc.ents if ent.label_ == "PERSON"],
-                    "dates": [ent.text for ent in doc.ents if ent.label_ == "DATE"],
-                    "orgs": [ent.text for ent in doc.ents if ent.label_ == "ORG"],
-                    "projects": [ent.text for ent in doc.ents if ent.label_ == "PROJECT"],
-                    "task_counts": [ent.text for ent in doc.ents if ent.label_ == "TASK_COUNT"]
-                }
+                parsed_data["entities"] = self._entities(user_input)
             return parsed_data
             
         except Exception as e:
             print(f"Error parsing input: {e}")
             # Fallback: Use Local Regex Parser if API fails
             print("DEBUG: Rate limit hit, using fallback mock data.")
+            metrics.LLM_FALLBACKS.labels("parse").inc()
             from parser import parse_command
             local_data = parse_command(user_input)
             
             # Enrich local data with spaCy too!
             if self.nlp:
-                doc = self.nlp(user_input)
-                local_data["entities"] = {
-                    "people": [ent.text for ent in doc.ents if ent.label_ == "PERSON"],
-                    "dates": [ent.text for ent in doc.ents if ent.label_ == "DATE"],
-                    "orgs": [ent.text for ent in doc.ents if ent.label_ == "ORG"]
-                }
+                local_data["entities"] = self._entities(user_input)
             return local_data
 
-    def generate_smart_response(self, data: dict) -> str:
+    def generate_smart_response(self, data: dict, session_id: str = None) -> str:
         """
         Generates a natural language response based on the project data.
+        A template answers when Gemini fails or the budget runs low.
         """
         intent = data.get("intent", "")
         prompt = f"""
@@ -163,13 +174,11 @@ class NLPProcessor:
         """
         
         try:
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
-            )
+            response = self._generate("response", prompt, session_id)
             return response.text.strip()
         except Exception as e:
             print(f"DEBUG: Smart response generation failed: {e}")
+            metrics.LLM_FALLBACKS.labels("response").inc()
             # Meaningful local fallback for each intent
             return self._generate_fallback_response(data)
     
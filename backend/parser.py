@@ -1,7 +1,7 @@
 """
 Local regex-based fallback parser.
 Used when the Gemini API is unavailable or rate-limited.
-Handles all 6 intents and extracts teams + people from parentheses.
+Handles all 7 intents and extracts teams + people from parentheses.
 """
 
 import re
@@ -20,8 +20,11 @@ def _extract_intent(text: str) -> str:
     lower = text.lower()
 
     # Check more specific intents FIRST to avoid keyword overlap
+    # Portfolio risk ranking ("top 5 riskiest projects") — before status queries
+    if any(w in lower for w in ["riskiest", "most at risk", "highest risk", "top risk", "risk ranking", "at-risk projects"]):
+        return "RISK_PORTFOLIO"
     # "update on" is a status query, not a task update — check first
-    if any(w in lower for w in ["update on", "status", "progress", "how is", "doing", "tell me about"]):
+    elif any(w in lower for w in ["update on", "status", "progress", "how is", "doing", "tell me about"]):
         return "GET_STATUS"
     elif any(w in lower for w in ["update", "change status", "mark as", "mark ", "set completion", "set status"]):
         return "UPDATE_TASK"
@@ -59,6 +62,14 @@ def _extract_total_tasks(text: str) -> Optional[int]:
     return int(match.group(1)) if match else None
 
 
+def _extract_top_n(text: str) -> Optional[int]:
+    """Extract N from phrases like "top 5" or "10 riskiest"."""
+    match = re.search(r'\btop\s+(\d+)\b|\b(\d+)\s+(?:riskiest|most at risk)', text, re.IGNORECASE)
+    if not match:
+        return None
+    return int(match.group(1) or match.group(2))
+
+
 def _extract_people_from_parens(text_segment: str) -> List[str]:
     """
     Extract people names from parentheses.
@@ -203,4 +214,8 @@ def parse_command(user_input: str) -> dict:
     if intent == "UPDATE_TASK":
         result["update_fields"] = _extract_status_update(user_input)
 
+    # Add ranking size for RISK_PORTFOLIO intent
+    if intent == "RISK_PORTFOLIO":
+        result["top_n"] = _extract_top_n(user_input)
+
     return result
@@ -0,0 +1,44 @@
+"""
+Process pools shared by the CPU-bound batch jobs (batch parsing and
+schedule simulation).
+
+There is one pool per (size, initializer), so a caller asking for a
+different worker count gets its own pool instead of reusing one sized for
+someone else. Pools start on first use and live until
+shutdown_process_pools() (application shutdown).
+"""
+
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+_pools: Dict[Tuple[int, Optional[Callable]], ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def get_process_pool(workers: int, initializer: Optional[Callable] = None) -> ProcessPoolExecutor:
+    """
+    Get (or start) the pool with this many workers and this initializer.
+
+    Args:
+        workers: Worker process count
+        initializer: Run once in each worker process as it starts
+
+    Returns:
+        The shared ProcessPoolExecutor
+    """
+    key = (workers, initializer)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ProcessPoolExecutor(max_workers=workers, initializer=initializer)
+        return pool
+
+
+def shutdown_process_pools():
+    """Stop every pool, cancelling queued work (called on application shutdown)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(cancel_futures=True)
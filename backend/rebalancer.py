@@ -0,0 +1,319 @@
+"""
+Portfolio-wide workload rebalancer.
+
+Moves tasks from people above their capacity to people with spare
+capacity, touching as few assignments as possible. The problem is solved
+as a min-cost max-flow:
+
+    source → overloaded person          (cap: tasks over capacity)
+    overloaded person → allocation      (cap: tasks they hold there)
+    allocation → team member            (cost: MOVE_COST)
+    allocation → team pool → person     (cost: cross-project cost, for people
+                                          on the same team in other projects)
+    person with spare capacity → sink   (cap: spare capacity)
+
+Maximum flow relieves as much overload as possible; minimum cost keeps
+the churn low and prefers moving work within the existing team.
+"""
+
+import heapq
+import time
+from typing import Dict, List, Tuple
+
+
+MOVE_COST = 1   # Cost per task moved to someone already on the allocation
+INF = float("inf")
+
+
+class MinCostFlow:
+    """
+    Min-cost max-flow solver (primal-dual).
+
+    Each phase runs Dijkstra with potentials to find shortest-path
+    distances, then pushes a blocking flow along all zero reduced-cost
+    edges at once. With small integer costs the number of phases stays
+    low, which keeps large portfolios fast in pure Python.
+    """
+
+    def __init__(self, node_count: int):
+        self.node_count = node_count
+        self.graph: List[List[int]] = [[] for _ in range(node_count)]
+        self.to: List[int] = []
+        self.cap: List[int] = []
+        self.cost: List[int] = []
+
+    def add_edge(self, u: int, v: int, cap: int, cost: int) -> int:
+        """Add a directed edge; returns its index (for reading flow later)."""
+        index = len(self.to)
+        self.graph[u].append(index)
+        self.to.append(v)
+        self.cap.append(cap)
+        self.cost.append(cost)
+        self.graph[v].append(index + 1)
+        self.to.append(u)
+        self.cap.append(0)
+        self.cost.append(-cost)
+        return index
+
+    def flow(self, edge: int) -> int:
+        """Flow currently on an edge (the residual capacity of its reverse)."""
+        return self.cap[edge ^ 1]
+
+    def solve(self, source: int, sink: int) -> Tuple[int, int]:
+        """
+        Push the maximum flow from source to sink at minimum cost.
+
+        Returns:
+            (total flow, total cost)
+        """
+        potential = [0] * self.node_count
+        total_flow = total_cost = 0
+
+        while True:
+            dist = self._shortest_paths(source, potential)
+            if dist[sink] == INF:
+                break
+            for v in range(self.node_count):
+                if dist[v] != INF:
+                    potential[v] += dist[v]
+
+            pushed = self._blocking_flow(source, sink, potential)
+            if not pushed:
+                break
+            total_flow += pushed
+            total_cost += pushed * (potential[sink] - potential[source])
+
+        return total_flow, total_cost
+
+    def _shortest_paths(self, source: int, potential: List[int]) -> List[float]:
+        to, cap, cost, graph = self.to, self.cap, self.cost, self.graph
+        dist = [INF] * self.node_count
+        dist[source] = 0
+        heap = [(0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            pu = potential[u]
+            for e in graph[u]:
+                if cap[e] > 0:
+                    v = to[e]
+                    nd = d + cost[e] + pu - potential[v]
+                    if nd < dist[v]:
+                        dist[v] = nd
+                        heapq.heappush(heap, (nd, v))
+        return dist
+
+    def _blocking_flow(self, source: int, sink: int, potential: List[int]) -> int:
+        """Dinic-style max flow restricted to zero reduced-cost edges."""
+        to, cap, cost, graph = self.to, self.cap, self.cost, self.graph
+
+        def admissible(u: int, e: int) -> bool:
+            return cap[e] > 0 and cost[e] + potential[u] - potential[to[e]] == 0
+
+        pushed_total = 0
+        while True:
+            # BFS levels over the admissible subgraph
+            level = [-1] * self.node_count
+            level[source] = 0
+            queue = [source]
+            for u in queue:
+                for e in graph[u]:
+                    v = to[e]
+                    if level[v] < 0 and admissible(u, e):
+                        level[v] = level[u] + 1
+                        queue.append(v)
+            if level[sink] < 0:
+                return pushed_total
+
+            pointer = [0] * self.node_count
+
+            def push() -> int:
+                """Send flow along one source-sink path of the level graph (iterative DFS)."""
+                path: List[int] = []   # Edges from source to u
+                u = source
+                while u != sink:
+                    edges = graph[u]
+                    while pointer[u] < len(edges):
+                        e = edges[pointer[u]]
+                        if level[to[e]] == level[u] + 1 and admissible(u, e):
+                            break
+                        pointer[u] += 1
+                    if pointer[u] < len(edges):
+                        path.append(e)
+                        u = to[e]
+                    elif u == source:
+                        return 0
+                    else:
+                        # Dead end: back up and skip the edge that led here
+                        u = to[path.pop() ^ 1]
+                        pointer[u] += 1
+                sent = min(cap[e] for e in path)
+                for e in path:
+                    cap[e] -= sent
+                    cap[e ^ 1] += sent
+                return sent
+
+            while True:
+                sent = push()
+                if not sent:
+                    break
+                pushed_total += sent
+
+
+def plan_rebalance(
+    people: Dict[int, Dict],
+    workload: List[Tuple[int, int, str, int]],
+    default_capacity: int,
+    cross_project_cost: int = 3
+) -> Dict:
+    """
+    Compute a minimal-churn reassignment of tasks.
+
+    Args:
+        people: {person_id: {"name": str, "load": int, "capacity": int | None}}
+        workload: (person_id, project_id, team_name, assigned_tasks) rows for
+            active projects
+        default_capacity: Capacity for people without their own
+        cross_project_cost: Cost per task moved to someone on the same team
+            name in a different project (0 disables cross-project moves)
+
+    Returns:
+        {
+            "moves": [{from_id, to_id, project_id, team, tasks}],
+            "moved_tasks": int,
+            "churn_cost": int,
+            "overload_before": int,
+            "overload_after": int,
+            "solve_time_ms": float
+        }
+    """
+    started = time.perf_counter()
+
+    capacity = {
+        pid: info["capacity"] if info.get("capacity") is not None else default_capacity
+        for pid, info in people.items()
+    }
+    excess = {pid: info["load"] - capacity[pid] for pid, info in people.items() if info["load"] > capacity[pid]}
+    spare = {pid: capacity[pid] - info["load"] for pid, info in people.items() if info["load"] < capacity[pid]}
+    overload_before = sum(excess.values())
+
+    # Node numbering: 0 = source, 1 = sink, then people, allocations, team pools
+    node_ids: Dict[Tuple, int] = {}
+
+    def node(key: Tuple) -> int:
+        if key not in node_ids:
+            node_ids[key] = len(node_ids) + 2
+        return node_ids[key]
+
+    members: Dict[Tuple[int, str], List[int]] = {}   # allocation -> member ids
+    team_people: Dict[str, set] = {}                  # team name -> member ids
+    held = []                                         # (giver, allocation, tasks)
+    for person_id, project_id, team, assigned in workload:
+        alloc = (project_id, team)
+        members.setdefault(alloc, []).append(person_id)
+        team_people.setdefault(team, set()).add(person_id)
+        if person_id in excess and assigned > 0:
+            held.append((person_id, alloc, assigned))
+
+    edges = []  # (u, v, cap, cost, meaning)
+    source, sink = 0, 1
+    for pid, amount in excess.items():
+        edges.append((source, node(("person", pid)), amount, 0, None))
+    for pid, amount in spare.items():
+        edges.append((node(("person", pid)), sink, amount, 0, None))
+
+    give_edges = []
+    for giver, alloc, assigned in held:
+        give_edges.append((node(("person", giver)), node(("alloc",) + alloc), assigned, 0, ("give", giver, alloc)))
+
+    take_edges = []
+    pools_used = set()
+    for alloc in {alloc for _, alloc, _ in held}:
+        alloc_node = node(("alloc",) + alloc)
+        for receiver in set(members[alloc]):
+            if receiver in spare:
+                take_edges.append((alloc_node, node(("person", receiver)), INF, MOVE_COST, ("take", alloc, receiver)))
+        if cross_project_cost:
+            team = alloc[1]
+            take_edges.append((alloc_node, node(("pool", team)), INF, 0, ("to_pool", alloc, team)))
+            pools_used.add(team)
+
+    for team in pools_used:
+        for receiver in team_people[team]:
+            if receiver in spare:
+                take_edges.append((node(("pool", team)), node(("person", receiver)), INF, cross_project_cost,
+                                   ("from_pool", team, receiver)))
+
+    solver = MinCostFlow(len(node_ids) + 2)
+    for u, v, cap, cost, _ in edges:
+        solver.add_edge(u, v, cap, cost)
+    labelled = []
+    for u, v, cap, cost, meaning in give_edges + take_edges:
+        cap = overload_before if cap == INF else cap
+        labelled.append((solver.add_edge(u, v, cap, cost), meaning))
+
+    moved, churn = solver.solve(source, sink) if overload_before else (0, 0)
+
+    # Decompose edge flows into concrete moves
+    given: Dict[Tuple, List[List]] = {}      # allocation -> [[giver, tasks]]
+    direct: Dict[Tuple, List[List]] = {}     # allocation -> [[receiver, tasks]]
+    to_pool: Dict[str, List[List]] = {}      # team -> [[allocation, tasks]]
+    from_pool: Dict[str, List[List]] = {}    # team -> [[receiver, tasks]]
+    for edge, meaning in labelled:
+        flow = solver.flow(edge)
+        if flow <= 0:
+            continue
+        kind = meaning[0]
+        if kind == "give":
+            given.setdefault(meaning[2], []).append([meaning[1], flow])
+        elif kind == "take":
+            direct.setdefault(meaning[1], []).append([meaning[2], flow])
+        elif kind == "to_pool":
+            to_pool.setdefault(meaning[2], []).append([meaning[1], flow])
+        else:
+            from_pool.setdefault(meaning[1], []).append([meaning[2], flow])
+
+    # Tasks each allocation sends through its team pool, matched to pool receivers
+    pool_receivers: Dict[Tuple, List[List]] = {}
+    for team, sources in to_pool.items():
+        for alloc, receiver, tasks in _pair(sources, from_pool.get(team, [])):
+            pool_receivers.setdefault(alloc, []).append([receiver, tasks])
+
+    moves = []
+    for alloc, givers in given.items():
+        receivers = direct.get(alloc, []) + pool_receivers.get(alloc, [])
+        for giver, receiver, tasks in _pair(givers, receivers):
+            moves.append({
+                "from_id": giver,
+                "to_id": receiver,
+                "project_id": alloc[0],
+                "team": alloc[1],
+                "tasks": tasks
+            })
+
+    return {
+        "moves": moves,
+        "moved_tasks": moved,
+        "churn_cost": churn,
+        "overload_before": overload_before,
+        "overload_after": overload_before - moved,
+        "solve_time_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def _pair(sources: List[List], targets: List[List]):
+    """Greedily match two lists of [key, amount], yielding (src, dst, amount)."""
+    sources = [list(s) for s in sources]
+    targets = [list(t) for t in targets]
+    i = j = 0
+    while i < len(sources) and j < len(targets):
+        amount = min(sources[i][1], targets[j][1])
+        if amount > 0:
+            yield sources[i][0], targets[j][0], amount
+        sources[i][1] -= amount
+        targets[j][1] -= amount
+        if sources[i][1] == 0:
+            i += 1
+        if targets[j][1] == 0:
+            j += 1
@@ -0,0 +1,314 @@
+"""
+On-demand request profiling (opt-in with PROFILING_ENABLED).
+
+A request is profiled when it carries `X-Profile-Token: <PROFILING_TOKEN>`,
+or when it is picked at random at PROFILING_SAMPLE_RATE. Its endpoint then
+runs under one of two profilers:
+
+    cprofile  deterministic, saved as a pstats file
+              (python -m pstats <file>, snakeviz, ...)
+    sampling  walks the endpoint thread's stack every
+              PROFILING_SAMPLE_INTERVAL_MS. Saved as collapsed stacks
+              ("a;b;c 12") for flamegraph.pl or speedscope. Much cheaper
+              on hot paths.
+
+The header `X-Profile-Mode: cprofile|sampling` picks the profiler for one
+request; sampled requests use PROFILING_MODE. Profiles go to a ring buffer
+in PROFILING_DIR, which keeps the newest PROFILING_MAX_FILES. The profiled
+response carries `X-Profile-Id`. Profiles are listed at GET /admin/profiles
+and downloaded from /admin/profiles/{id}; both need the token header.
+
+With profiling disabled, neither the middleware nor the endpoint wrapper
+is installed, so requests pay nothing.
+
+Sync endpoints run in a threadpool thread, and only that thread is
+profiled. The time spent in middleware is in the recorded duration but
+not in the profile. Async endpoints are profiled on the event loop, so
+other requests' work interleaved with them can appear in their profile.
+"""
+
+import contextvars
+import cProfile
+import functools
+import hmac
+import inspect
+import json
+import marshal
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import count
+from typing import Dict, List, Optional
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+
+from config import config
+
+
+MODES = ("cprofile", "sampling")
+FILE_SUFFIXES = {"cprofile": ".prof", "sampling": ".collapsed"}
+PROFILE_ID = re.compile(r"^\d+-\d+-\d+$")
+
+# The profile of the request being handled (None when it is not profiled)
+_current: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("request_profile", default=None)
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval."""
+
+    def __init__(self, thread_id: int, interval: float, stacks: Counter):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = stacks
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfile:
+    """Profiling data collected for one request."""
+
+    def __init__(self, mode: str, interval: float):
+        self.mode = mode
+        self.interval = interval
+        self.stats = pstats.Stats()
+        self.stacks: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def run(self, function, *args, **kwargs):
+        """Call a function under this request's profiler."""
+        if self.mode == "sampling":
+            sampler = _StackSampler(threading.get_ident(), self.interval, self.stacks)
+            sampler.start()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                sampler.stop()
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(function, *args, **kwargs)
+        finally:
+            with self._lock:
+                self.stats.add(profiler)
+
+    async def run_async(self, function, *args, **kwargs):
+        """Await a coroutine function under this request's profiler (event loop thread)."""
+        if self.mode == "sampling":
+            sampler = _StackSampler(threading.get_ident(), self.interval, self.stacks)
+            sampler.start()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                sampler.stop()
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            profiler.disable()
+            with self._lock:
+                self.stats.add(profiler)
+
+    def dump(self) -> bytes:
+        """The profile as pstats data or collapsed stacks."""
+        if self.mode == "sampling":
+            return "".join(f"{stack} {samples}\n" for stack, samples in self.stacks.most_common()).encode()
+        return marshal.dumps(self.stats.stats)
+
+
+def profiled(endpoint):
+    """Wrap an endpoint so it runs under the current request's profiler, if any."""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def run_async(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            return await profile.run_async(endpoint, *args, **kwargs)
+        return run_async
+
+    @functools.wraps(endpoint)
+    def run(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        return profile.run(endpoint, *args, **kwargs)
+    return run
+
+
+def profiling_route(base: type) -> type:
+    """
+    Subclass an APIRoute class so every endpoint can be profiled.
+
+    Args:
+        base: The app's route class (APIRoute or a subclass)
+
+    Returns:
+        Route class wrapping endpoints with profiled()
+    """
+    class ProfilingRoute(base):
+        def __init__(self, path, endpoint, **kwargs):
+            super().__init__(path, profiled(endpoint), **kwargs)
+
+    ProfilingRoute.__name__ = f"Profiling{base.__name__}"
+    return ProfilingRoute
+
+
+class ProfileStore:
+    """Bounded on-disk ring buffer of request profiles."""
+
+    def __init__(self, directory: Optional[str] = None, max_files: Optional[int] = None):
+        self.directory = directory or config.PROFILING_DIR
+        self.max_files = max_files or config.PROFILING_MAX_FILES
+        self._sequence = count()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def new_id(self) -> str:
+        """Unique, time-ordered profile ID (unique across worker processes)."""
+        return f"{int(time.time() * 1000)}-{os.getpid()}-{next(self._sequence)}"
+
+    def save(self, profile_id: str, data: bytes, metadata: Dict):
+        """Write a profile and its metadata, then drop the oldest beyond max_files."""
+        with self._lock:
+            suffix = FILE_SUFFIXES[metadata["mode"]]
+            with open(os.path.join(self.directory, profile_id + suffix), "wb") as f:
+                f.write(data)
+            metadata = {**metadata, "id": profile_id, "file": profile_id + suffix, "bytes": len(data)}
+            with open(os.path.join(self.directory, profile_id + ".json"), "w") as f:
+                json.dump(metadata, f)
+            self._prune()
+
+    def _prune(self):
+        ids = sorted(self._ids(), key=lambda profile_id: tuple(int(part) for part in profile_id.split("-")))
+        for profile_id in ids[:-self.max_files]:
+            for suffix in (".json",) + tuple(FILE_SUFFIXES.values()):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def _ids(self) -> List[str]:
+        return [
+            name[:-5] for name in os.listdir(self.directory)
+            if name.endswith(".json") and PROFILE_ID.match(name[:-5])
+        ]
+
+    def list(self) -> List[Dict]:
+        """Metadata of stored profiles, newest first."""
+        profiles = []
+        for profile_id in self._ids():
+            try:
+                with open(os.path.join(self.directory, profile_id + ".json")) as f:
+                    profiles.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue   # Pruned (or being written) by another worker
+        return sorted(profiles, key=lambda item: item["started_at"], reverse=True)
+
+    def path_for(self, profile_id: str) -> Optional[tuple]:
+        """
+        Locate a stored profile.
+
+        Returns:
+            (file path, metadata) or None
+        """
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, profile_id + ".json")) as f:
+                metadata = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        path = os.path.join(self.directory, metadata["file"])
+        return (path, metadata) if os.path.exists(path) else None
+
+
+def token_matches(supplied: Optional[str], token: Optional[str] = None) -> bool:
+    """Constant-time check of a supplied profiling token (never matches when none is configured)."""
+    token = config.PROFILING_TOKEN if token is None else token
+    return bool(token) and bool(supplied) and hmac.compare_digest(supplied, token)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware selecting requests to profile and storing their profiles."""
+
+    def __init__(self, app, store: Optional[ProfileStore] = None, token: Optional[str] = None,
+                 sample_rate: Optional[float] = None, mode: Optional[str] = None,
+                 interval_ms: Optional[float] = None, exclude_prefix: str = "/admin/profiles"):
+        self.app = app
+        self.store = store or ProfileStore()
+        self.token = config.PROFILING_TOKEN if token is None else token
+        self.sample_rate = config.PROFILING_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.mode = mode or config.PROFILING_MODE
+        self.interval = (interval_ms or config.PROFILING_SAMPLE_INTERVAL_MS) / 1000
+        self.exclude_prefix = exclude_prefix
+
+    def _select(self, scope) -> Optional[str]:
+        """The profiler mode for this request, or None to leave it alone."""
+        if scope["path"].startswith(self.exclude_prefix):
+            return None
+        headers = Headers(scope=scope)
+        if token_matches(headers.get("x-profile-token"), self.token):
+            mode = headers.get("x-profile-mode", self.mode).lower()
+            return mode if mode in MODES else self.mode
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.mode
+        return None
+
+    async def __call__(self, scope, receive, send):
+        mode = self._select(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(mode, self.interval)
+        profile_id = self.store.new_id()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(raw=message["headers"]).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        token = _current.set(profile)
+        started_at, started = time.time(), time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current.reset(token)
+            duration_ms = (time.perf_counter() - started) * 1000
+            route = scope.get("route")
+            self.store.save(profile_id, profile.dump(), {
+                "mode": mode,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status": status,
+                "duration_ms": round(duration_ms, 2),
+                "started_at": started_at,
+            })
+            print(f"DEBUG: Profiled {scope['method']} {scope['path']} ({mode}, {duration_ms:.1f} ms) as {profile_id}")
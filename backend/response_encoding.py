@@ -0,0 +1,183 @@
+"""
+Fast JSON rendering and compression for API responses.
+
+ORJSONRoute: FastAPI normally runs every returned dict through
+jsonable_encoder before serializing it, and for large payloads that walk
+costs about ten times more than the serialization itself. Routes using
+this class serialize plain results straight to an ORJSONResponse. They
+keep the route's status code and any headers the endpoint set on an
+injected Response. Results orjson cannot handle natively still go through
+jsonable_encoder first. Routes with a response_model or return annotation
+are left alone, because FastAPI validates those.
+
+CompressionMiddleware: compresses responses of at least
+COMPRESSION_MIN_BYTES with brotli (when the optional `brotli` package is
+installed) or gzip. The encoding is negotiated from Accept-Encoding, and
+q=0 is honoured. Streamed responses (NDJSON from /parse/batch) are flushed
+chunk by chunk, so clients still see results as they are produced. Strong
+ETags become weak on compressed responses, as they no longer identify
+the exact bytes sent.
+"""
+
+import functools
+import inspect
+import zlib
+from typing import Optional
+
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+from config import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class ORJSONRoute(APIRoute):
+    """APIRoute that renders plain results with orjson, skipping jsonable_encoder."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        response_model = kwargs.get("response_model")
+        unvalidated = (
+            (response_model is None or isinstance(response_model, DefaultPlaceholder))
+            and inspect.signature(endpoint).return_annotation is inspect.Signature.empty
+        )
+        if unvalidated:
+            endpoint = self._wrap(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def _wrap(self, endpoint):
+        if inspect.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def render_async(*args, **kwargs):
+                return self._render(await endpoint(*args, **kwargs), kwargs)
+            return render_async
+
+        @functools.wraps(endpoint)
+        def render(*args, **kwargs):
+            return self._render(endpoint(*args, **kwargs), kwargs)
+        return render
+
+    def _render(self, result, kwargs) -> Response:
+        if isinstance(result, Response):
+            return result
+        try:
+            response = ORJSONResponse(result, status_code=self.status_code or 200)
+        except TypeError:
+            response = ORJSONResponse(jsonable_encoder(result), status_code=self.status_code or 200)
+
+        # Carry over what the endpoint set on an injected Response (e.g. ETags)
+        for value in kwargs.values():
+            if isinstance(value, Response):
+                if value.status_code:
+                    response.status_code = value.status_code
+                response.headers.raw.extend(value.headers.raw)
+        return response
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the response encoding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding: Header value, e.g. "gzip, deflate, br;q=0.9"
+
+    Returns:
+        "br", "gzip" or None (send uncompressed)
+    """
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name] = quality
+
+    for encoding in (("br",) if brotli else ()) + ("gzip",):
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.brotli = encoding == "br"
+        if self.brotli:
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """Compress a chunk; non-final chunks are flushed so they can be sent now."""
+        if self.brotli:
+            output = self._compressor.process(data)
+            return output + (self._compressor.finish() if final else self._compressor.flush())
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing HTTP responses with brotli or gzip."""
+
+    def __init__(self, app, minimum_size: Optional[int] = None, gzip_level: Optional[int] = None,
+                 brotli_quality: Optional[int] = None):
+        self.app = app
+        self.minimum_size = config.COMPRESSION_MIN_BYTES if minimum_size is None else minimum_size
+        self.gzip_level = gzip_level or config.COMPRESSION_GZIP_LEVEL
+        self.brotli_quality = brotli_quality or config.COMPRESSION_BROTLI_QUALITY
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor: Optional[_Compressor] = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                start = message   # Held until the first body chunk shows the size
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                if "content-encoding" not in headers and (more_body or len(body) >= self.minimum_size):
+                    compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                    body = compressor.compress(body, final=not more_body)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    if more_body:
+                        del headers["Content-Length"]
+                    else:
+                        headers["Content-Length"] = str(len(body))
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["ETag"] = "W/" + etag
+                await send(start)
+                start = None
+            elif compressor is not None:
+                body = compressor.compress(body, final=not more_body)
+
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
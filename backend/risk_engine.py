@@ -0,0 +1,51 @@
+"""
+Deterministic project risk scoring.
+
+Shared by the database layer (which stores the score and level as
+indexed columns) and JavaGateway (which reports the factors).
+"""
+
+from typing import Dict
+
+
+def compute_risk(status: str, completion: int, delayed_tasks: int) -> Dict:
+    """
+    Calculate a deterministic risk score for a project.
+
+    Returns: {
+        "risk_score": int (0-100),
+        "risk_level": "LOW" | "MEDIUM" | "HIGH",
+        "risk_factors": list[str]
+    }
+    """
+    score = 0
+    factors = []
+
+    # Factor 1: Delayed Tasks (High Impact)
+    delayed = delayed_tasks or 0
+    if delayed > 0:
+        score += delayed * 10
+        factors.append(f"{delayed} delayed tasks")
+
+    # Factor 2: Low Completion (Medium Impact)
+    if status == "In Progress" and (completion or 0) < 20:
+        score += 20
+        factors.append("Low completion rate (<20%)")
+
+    # Cap score at 100
+    score = min(score, 100)
+
+    return {
+        "risk_score": score,
+        "risk_level": risk_level(score),
+        "risk_factors": factors
+    }
+
+
+def risk_level(score: int) -> str:
+    """Map a risk score to its level."""
+    if score >= 50:
+        return "HIGH"
+    elif score >= 20:
+        return "MEDIUM"
+    return "LOW"
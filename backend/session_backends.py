@@ -0,0 +1,377 @@
+"""
+Durable storage backends for SessionManager.
+
+SessionManager talks to one primary backend and falls back to the
+in-memory ShardedSessionStore while it is unreachable. Backends:
+
+- RedisSessionBackend: shared across hosts; pipelined writes, compact
+  binary entries, and compaction of long histories
+- SqliteSessionBackend: shared by the workers of a single node and
+  persistent across restarts with no extra service; WAL mode, batched
+  inserts, and a background TTL sweeper
+
+Selected with SESSION_BACKEND (redis | sqlite | memory).
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import redis
+
+from config import config
+from session_codec import encode_message, decode_message, summarize, SUMMARY_ROLE
+
+
+class SessionBackend:
+    """
+    Interface for durable session storage.
+
+    Every method may raise when the backend is unreachable; SessionManager
+    catches that and switches to its in-memory fallback.
+    """
+
+    name = "base"
+
+    def write(self, session_id: str, messages: List[Dict], project_name: Optional[str] = None):
+        """Append messages and optionally set the last project reference, atomically."""
+        raise NotImplementedError
+
+    def write_many(self, sessions: Dict[str, Dict]):
+        """Write several sessions at once: {session_id: {"messages": [...], "project": str | None}}."""
+        for session_id, session in sessions.items():
+            self.write(session_id, session["messages"], session["project"])
+
+    def get_messages(self, session_id: str, limit: int) -> List[Dict]:
+        """Get a session's last `limit` messages, oldest first."""
+        raise NotImplementedError
+
+    def get_project(self, session_id: str) -> Optional[str]:
+        """Get the session's last project reference."""
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        """Remove a session."""
+        raise NotImplementedError
+
+    def ping(self):
+        """Raise if the backend is unreachable."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        """Backend-specific usage numbers."""
+        return {}
+
+    def close(self):
+        """Release connections and stop background work."""
+
+
+# ─── Redis ───────────────────────────────────────────────────────────────────
+
+# One connection pool per Redis server, shared by every backend in the process
+_pools: Dict[Tuple, redis.ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(host: str, port: int, db: int) -> redis.ConnectionPool:
+    """Get (or create) the shared connection pool for a Redis server."""
+    key = (host, port, db)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = redis.ConnectionPool(
+                host=host,
+                port=port,
+                db=db,
+                decode_responses=False,   # Messages are stored in a binary encoding
+                max_connections=config.REDIS_MAX_CONNECTIONS,
+                socket_timeout=config.REDIS_SOCKET_TIMEOUT_SECONDS,
+                socket_connect_timeout=config.REDIS_SOCKET_TIMEOUT_SECONDS
+            )
+        return _pools[key]
+
+
+class RedisSessionBackend(SessionBackend):
+    """Sessions as Redis lists of compact entries plus a reference key."""
+
+    name = "redis"
+
+    def __init__(self, host=None, port=None, db=None, ttl_seconds=None, max_messages=None):
+        self.client = redis.Redis(connection_pool=get_connection_pool(
+            host or config.REDIS_HOST,
+            port or config.REDIS_PORT,
+            db or config.REDIS_DB
+        ))
+        self.ttl_seconds = int(ttl_seconds or config.REDIS_SESSION_TTL_HOURS * 3600)
+        self.max_messages = max_messages or config.SESSION_MAX_MESSAGES
+        self.compact_threshold = config.SESSION_COMPACT_THRESHOLD
+        self.compact_keep = config.SESSION_COMPACT_KEEP
+
+    def _get_session_key(self, session_id: str) -> str:
+        """Generate Redis key for a session."""
+        return f"session:{session_id}:messages"
+
+    def _get_project_ref_key(self, session_id: str) -> str:
+        """Generate Redis key for last project reference."""
+        return f"session:{session_id}:last_project"
+
+    def write(self, session_id: str, messages: List[Dict], project_name: Optional[str] = None):
+        """
+        One pipelined MULTI/EXEC: RPUSH, EXPIRE and LTRIM (keeping the newest
+        SESSION_MAX_MESSAGES) plus the reference SET. When the history grows
+        past SESSION_COMPACT_THRESHOLD, older turns are folded into a summary.
+        """
+        pipe = self.client.pipeline(transaction=True)
+        self._queue_write(pipe, session_id, messages, project_name)
+        results = pipe.execute()
+        if messages and results[0] > self.compact_threshold:
+            self.compact(session_id)
+
+    def write_many(self, sessions: Dict[str, Dict]):
+        """Write several sessions in a single pipeline."""
+        if not sessions:
+            return
+        pipe = self.client.pipeline(transaction=True)
+        for session_id, session in sessions.items():
+            self._queue_write(pipe, session_id, session["messages"], session["project"])
+        pipe.execute()
+
+    def _queue_write(self, pipe, session_id: str, messages: List[Dict], project_name: Optional[str]):
+        """Queue the commands for one session write on a pipeline."""
+        if messages:
+            key = self._get_session_key(session_id)
+            pipe.rpush(key, *[encode_message(message) for message in messages])
+            pipe.expire(key, self.ttl_seconds)
+            pipe.ltrim(key, -self.max_messages, -1)
+        if project_name is not None:
+            pipe.set(self._get_project_ref_key(session_id), project_name, ex=self.ttl_seconds)
+
+    def compact(self, session_id: str) -> bool:
+        """
+        Fold all but the newest SESSION_COMPACT_KEEP messages into one summary entry.
+
+        Runs as WATCH / LRANGE / MULTI (LTRIM + LPUSH) / EXEC, so a concurrent
+        append makes it back off instead of losing messages; the next write
+        retries.
+
+        Returns:
+            True if the history was compacted
+        """
+        key = self._get_session_key(session_id)
+        try:
+            with self.client.pipeline(transaction=True) as pipe:
+                pipe.watch(key)
+                fold = pipe.llen(key) - self.compact_keep
+                if fold <= 1:
+                    return False
+                old = [decode_message(entry) for entry in pipe.lrange(key, 0, fold - 1)]
+                previous = old.pop(0) if old[0].get("role") == SUMMARY_ROLE else None
+
+                pipe.multi()
+                pipe.ltrim(key, fold, -1)
+                pipe.lpush(key, encode_message(summarize(old, previous)))
+                pipe.execute()
+                return True
+        except redis.WatchError:
+            return False
+        except Exception as e:
+            print(f"WARNING: Session compaction failed: {e}")
+            return False
+
+    def get_messages(self, session_id: str, limit: int) -> List[Dict]:
+        if limit <= 0:
+            return []
+        entries = self.client.lrange(self._get_session_key(session_id), -limit, -1)
+        return [decode_message(entry) for entry in entries]
+
+    def get_project(self, session_id: str) -> Optional[str]:
+        value = self.client.get(self._get_project_ref_key(session_id))
+        return value.decode() if value is not None else None
+
+    def delete(self, session_id: str):
+        self.client.delete(self._get_session_key(session_id), self._get_project_ref_key(session_id))
+
+    def ping(self):
+        self.client.ping()
+
+
+# ─── SQLite ──────────────────────────────────────────────────────────────────
+
+class SqliteSessionBackend(SessionBackend):
+    """
+    Sessions in a local SQLite database shared by all worker processes.
+
+    Messages are rows keyed by (session_id, seq), with seq allocated from
+    the session row in the same transaction as the insert, so concurrent
+    workers never interleave within a write. A daemon thread deletes
+    expired sessions every SESSION_SQLITE_SWEEP_SECONDS.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path=None, ttl_seconds=None, max_messages=None, sweep_interval=None):
+        self.db_path = db_path or config.SESSION_SQLITE_PATH
+        self.ttl_seconds = ttl_seconds or config.REDIS_SESSION_TTL_HOURS * 3600
+        self.max_messages = max_messages or config.SESSION_MAX_MESSAGES
+        self.sweep_interval = sweep_interval or config.SESSION_SQLITE_SWEEP_SECONDS
+        self.swept_sessions = 0
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []   # Every thread's, for close()
+        self._connections_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._init_schema()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not shared)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only this thread uses it; close() may close it from another
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                last_project TEXT,
+                next_seq INTEGER NOT NULL DEFAULT 0,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_chat_sessions_expiry ON chat_sessions(expires_at);
+        ''')
+
+    def write(self, session_id: str, messages: List[Dict], project_name: Optional[str] = None):
+        self.write_many({session_id: {"messages": messages, "project": project_name}})
+
+    def write_many(self, sessions: Dict[str, Dict]):
+        """Write several sessions in one transaction with batched inserts."""
+        if not sessions:
+            return
+        conn = self._connection()
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for session_id, session in sessions.items():
+                messages = session["messages"]
+                # An expired session the sweeper has not reached yet starts over
+                expired = conn.execute(
+                    'DELETE FROM chat_sessions WHERE session_id = ? AND expires_at <= ?', (session_id, now)
+                ).rowcount
+                if expired:
+                    conn.execute('DELETE FROM chat_messages WHERE session_id = ?', (session_id,))
+                next_seq = conn.execute('''
+                    INSERT INTO chat_sessions (session_id, last_project, next_seq, expires_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(session_id) DO UPDATE SET
+                        last_project = COALESCE(excluded.last_project, last_project),
+                        next_seq = next_seq + excluded.next_seq,
+                        expires_at = excluded.expires_at
+                    RETURNING next_seq
+                ''', (session_id, session["project"], len(messages), expires_at)).fetchone()[0]
+
+                if messages:
+                    first = next_seq - len(messages)
+                    conn.executemany(
+                        'INSERT INTO chat_messages (session_id, seq, payload) VALUES (?, ?, ?)',
+                        [(session_id, first + i, encode_message(m)) for i, m in enumerate(messages)]
+                    )
+                    conn.execute(
+                        'DELETE FROM chat_messages WHERE session_id = ? AND seq < ?',
+                        (session_id, next_seq - self.max_messages)
+                    )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_messages(self, session_id: str, limit: int) -> List[Dict]:
+        if limit <= 0:
+            return []
+        rows = self._connection().execute('''
+            SELECT m.payload FROM chat_messages m
+            JOIN chat_sessions s ON s.session_id = m.session_id
+            WHERE m.session_id = ? AND s.expires_at > ?
+            ORDER BY m.seq DESC
+            LIMIT ?
+        ''', (session_id, time.time(), limit)).fetchall()
+        return [decode_message(row[0]) for row in reversed(rows)]
+
+    def get_project(self, session_id: str) -> Optional[str]:
+        row = self._connection().execute(
+            'SELECT last_project FROM chat_sessions WHERE session_id = ? AND expires_at > ?',
+            (session_id, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def delete(self, session_id: str):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute('DELETE FROM chat_messages WHERE session_id = ?', (session_id,))
+            conn.execute('DELETE FROM chat_sessions WHERE session_id = ?', (session_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def sweep(self) -> int:
+        """Delete expired sessions and their messages; returns sessions removed."""
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = [row[0] for row in conn.execute(
+                'SELECT session_id FROM chat_sessions WHERE expires_at <= ?', (now,)
+            )]
+            conn.executemany('DELETE FROM chat_messages WHERE session_id = ?', [(s,) for s in expired])
+            conn.execute('DELETE FROM chat_sessions WHERE expires_at <= ?', (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.swept_sessions += len(expired)
+        return len(expired)
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"WARNING: Session sweep failed: {e}")
+
+    def ping(self):
+        self._connection().execute("SELECT 1")
+
+    def stats(self) -> Dict:
+        conn = self._connection()
+        return {
+            "sessions": conn.execute('SELECT COUNT(*) FROM chat_sessions').fetchone()[0],
+            "messages": conn.execute('SELECT COUNT(*) FROM chat_messages').fetchone()[0],
+            "swept_sessions": self.swept_sessions
+        }
+
+    def close(self):
+        """Stop the sweeper and close the connections of every thread."""
+        self._stop.set()
+        if self._sweeper is not threading.current_thread():
+            self._sweeper.join(timeout=10)
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local.conn = None
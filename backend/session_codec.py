@@ -0,0 +1,84 @@
+"""
+Compact binary encoding for stored conversation messages.
+
+Each Redis list entry is a header byte followed by the message content:
+
+    header = role code (low 3 bits) | ZLIB_FLAG (0x08) if the content is compressed
+
+Content is UTF-8, zlib-compressed when it is long enough for that to pay
+off. Messages with roles outside ROLE_CODES, and entries written before
+this format existed, are plain JSON objects. Their first byte is always
+'{', which no header byte can be, so both formats decode transparently.
+
+Also builds the summary entry that compaction folds old turns into.
+"""
+
+import json
+import zlib
+from typing import Dict, List, Optional
+
+from config import config
+
+
+ROLE_CODES = {"user": 1, "assistant": 2, "system": 3, "summary": 4}
+CODE_ROLES = {code: role for role, code in ROLE_CODES.items()}
+ZLIB_FLAG = 0x08
+SUMMARY_ROLE = "summary"
+SUMMARY_LINE_CHARS = 80   # Characters kept from each folded message
+
+
+def encode_message(message: Dict) -> bytes:
+    """Encode a {"role", "content"} message for storage."""
+    code = ROLE_CODES.get(message.get("role"))
+    if code is None or set(message) != {"role", "content"}:
+        return json.dumps(message).encode()
+
+    content = message["content"].encode()
+    if len(content) >= config.SESSION_COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(content, 6)
+        if len(compressed) < len(content):
+            return bytes([code | ZLIB_FLAG]) + compressed
+    return bytes([code]) + content
+
+
+def decode_message(data) -> Dict:
+    """Decode a stored message (compact or legacy JSON)."""
+    if isinstance(data, str):
+        data = data.encode()
+    if data[:1] == b"{":
+        return json.loads(data)
+
+    header = data[0]
+    content = data[1:]
+    if header & ZLIB_FLAG:
+        content = zlib.decompress(content)
+    return {"role": CODE_ROLES[header & 0x07], "content": content.decode()}
+
+
+def summarize(messages: List[Dict], previous: Optional[Dict] = None) -> Dict:
+    """
+    Fold messages into a single summary entry.
+
+    Keeps the first line of each message (truncated), appended to any
+    previous summary, and bounds the result to SESSION_SUMMARY_MAX_CHARS,
+    dropping the oldest lines first.
+
+    Args:
+        messages: Messages being folded away, oldest first
+        previous: Existing summary entry at the head of the history, if any
+
+    Returns:
+        {"role": "summary", "content": str}
+    """
+    lines = previous["content"].split("\n") if previous else []
+    for message in messages:
+        text = (message.get("content") or "").strip().split("\n", 1)[0]
+        if len(text) > SUMMARY_LINE_CHARS:
+            text = text[:SUMMARY_LINE_CHARS - 1] + "…"
+        lines.append(f"{message.get('role')}: {text}")
+
+    content = "\n".join(lines)
+    limit = config.SESSION_SUMMARY_MAX_CHARS
+    while len(content) > limit and "\n" in content:
+        content = content.split("\n", 1)[1]
+    return {"role": SUMMARY_ROLE, "content": content[-limit:]}
@@ -1,46 +1,224 @@
-import redis
-import json
+import threading
+import time
+from collections import deque
 from typing import List, Dict, Optional
-from datetime import timedelta
+from datetime import datetime, timedelta
 from config import config
+from session_store import ShardedSessionStore
+from metrics import SESSION_OPERATION_SECONDS, timed_methods
+from session_backends import (
+    SessionBackend,
+    RedisSessionBackend,
+    SqliteSessionBackend,
+    get_connection_pool,
+)
 
+
+class SessionUnitOfWork:
+    """
+    Buffers one request's session writes and flushes them together.
+    
+    Messages and the project reference are sent to Redis in a single
+    pipelined round trip when the unit closes; the last project reference
+    is read at most once.
+    """
+    
+    _UNREAD = object()
+    
+    def __init__(self, manager: "SessionManager", session_id: str):
+        self.manager = manager
+        self.session_id = session_id
+        self.pending_messages: List[Dict] = []
+        self.pending_project: Optional[str] = None
+        self._last_project = self._UNREAD
+    
+    def __enter__(self) -> "SessionUnitOfWork":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+    
+    def add_message(self, role: str, content: str):
+        """Queue a message for the session history."""
+        self.pending_messages.append({"role": role, "content": content})
+    
+    def set_last_project_reference(self, project_name: str):
+        """Queue an update of the last project reference."""
+        self.pending_project = project_name
+        self._last_project = project_name
+    
+    def get_last_project_reference(self) -> Optional[str]:
+        """Get the last project reference (read from storage once per unit)."""
+        if self._last_project is self._UNREAD:
+            self._last_project = self.manager.get_last_project_reference(self.session_id)
+        return self._last_project
+    
+    def get_conversation_history(self, limit: int = 5) -> List[Dict]:
+        """Get the last N messages, including ones not flushed yet."""
+        stored = self.manager.get_conversation_history(self.session_id, limit) if limit else []
+        return (stored + self.pending_messages)[-limit:] if limit else []
+    
+    def flush(self):
+        """Write everything queued so far in one round trip."""
+        if self.pending_messages or self.pending_project is not None:
+            self.manager.write(self.session_id, self.pending_messages, self.pending_project)
+        self.pending_messages = []
+        self.pending_project = None
+
+
+@timed_methods(SESSION_OPERATION_SECONDS, [
+    "add_message", "write", "get_conversation_history",
+    "set_last_project_reference", "get_last_project_reference", "clear_session",
+])
 class SessionManager:
     """
-    Manages conversation sessions using Redis for persistence.
-    Falls back to in-memory storage if Redis is unavailable.
+    Manages conversation sessions using a durable backend (Redis or SQLite).
+    Falls back to in-memory storage if the backend is unavailable.
     Stores conversation history to enable context-aware responses.
+    
+    While the backend is down a background thread probes it with
+    exponential backoff. On reconnect, messages buffered in memory are
+    replayed into it before it is used again.
     """
     
-    def __init__(self, host=None, port=None, db=None):
-        """Initialize Redis connection using config defaults."""
-        self.use_redis = True
-        self.fallback_storage = {}  # In-memory fallback
-        self.fallback_projects = {}  # In-memory project refs
+    def __init__(self, host=None, port=None, db=None, probe_interval=None, probe_max_interval=None,
+                 backend: Optional[SessionBackend] = None):
+        """
+        Initialize the session backend using config defaults.
+        
+        Args:
+            host, port, db: Redis connection overrides
+            probe_interval, probe_max_interval: Recovery probe backoff bounds (seconds)
+            backend: Explicit backend instance (defaults to SESSION_BACKEND)
+        """
+        self.probe_interval = probe_interval or config.REDIS_PROBE_INITIAL_SECONDS
+        self.probe_max_interval = probe_max_interval or config.REDIS_PROBE_MAX_SECONDS
+        self.transitions = deque(maxlen=20)   # Recent connected/disconnected changes
+        self.replayed_messages = 0
+        self._state_lock = threading.RLock()
+        self._stop = threading.Event()
+        self._probe_thread: Optional[threading.Thread] = None
+        self._next_probe_at: Optional[float] = None
+        self.session_ttl = timedelta(hours=config.REDIS_SESSION_TTL_HOURS)
+        self.max_messages = config.SESSION_MAX_MESSAGES
+        # Bounded, lock-striped in-memory fallback (TTL + LRU eviction)
+        self.memory = ShardedSessionStore(
+            shards=config.SESSION_MEMORY_SHARDS,
+            max_sessions=config.SESSION_MEMORY_MAX_SESSIONS,
+            max_messages=self.max_messages,
+            max_bytes=config.SESSION_MEMORY_MAX_MB * 1024 * 1024,
+            ttl_seconds=self.session_ttl.total_seconds()
+        )
         
+        self.backend = backend or self._create_backend(host, port, db)
+        self.use_backend = self.backend is not None
+        if self.backend is None:
+            print("DEBUG: SessionManager using in-memory storage")
+            return
         try:
-            self.redis_client = redis.Redis(
-                host=host or config.REDIS_HOST,
-                port=port or config.REDIS_PORT,
-                db=db or config.REDIS_DB,
-                decode_responses=True
-            )
             # Test the connection
-            self.redis_client.ping()
-            print("DEBUG: SessionManager using Redis storage")
+            self.backend.ping()
+            self._record_transition("connected", "startup")
+            print(f"DEBUG: SessionManager using {self.backend.name} storage")
         except Exception as e:
-            print(f"WARNING: Redis unavailable, using in-memory storage: {e}")
-            self.use_redis = False
-            self.redis_client = None
-        
-        self.session_ttl = timedelta(hours=config.REDIS_SESSION_TTL_HOURS)
+            print(f"WARNING: {self.backend.name} unavailable, using in-memory storage: {e}")
+            self._mark_down(e)
+    
+    def _create_backend(self, host, port, db) -> Optional[SessionBackend]:
+        kind = config.SESSION_BACKEND
+        try:
+            if kind == "sqlite":
+                return SqliteSessionBackend(ttl_seconds=self.session_ttl.total_seconds(),
+                                            max_messages=self.max_messages)
+            if kind == "memory":
+                return None
+            if kind != "redis":
+                print(f"WARNING: Unknown SESSION_BACKEND '{kind}', using redis")
+            return RedisSessionBackend(host, port, db, self.session_ttl.total_seconds(), self.max_messages)
+        except Exception as e:
+            print(f"WARNING: Could not open {kind} session backend, using in-memory storage: {e}")
+            return None
+    
+    def _record_transition(self, state: str, reason: str):
+        self.transitions.append({
+            "state": state,
+            "reason": reason,
+            "at": datetime.utcnow().isoformat(timespec="seconds")
+        })
+    
+    def _mark_down(self, error: Exception):
+        """Switch to in-memory storage and start probing for recovery."""
+        with self._state_lock:
+            if self.use_backend or not self.transitions:
+                self._record_transition("disconnected", str(error) or type(error).__name__)
+            self.use_backend = False
+            if self._probe_thread is None and not self._stop.is_set():
+                self._probe_thread = threading.Thread(target=self._probe_loop, name="session-probe", daemon=True)
+                self._probe_thread.start()
+    
+    def _probe_loop(self):
+        """Ping the backend with exponential backoff until it answers, then reconcile."""
+        delay = self.probe_interval
+        while True:
+            self._next_probe_at = time.monotonic() + delay
+            if self._stop.wait(delay):
+                break
+            try:
+                self.backend.ping()
+                self._reconcile()
+                print(f"DEBUG: {self.backend.name} is reachable again, SessionManager back on it")
+                break
+            except Exception:
+                delay = min(delay * 2, self.probe_max_interval)
+        with self._state_lock:
+            self._probe_thread = None
+            self._next_probe_at = None
+    
+    def _reconcile(self):
+        """
+        Replay sessions buffered in memory into the backend, then switch back.
         
-    def _get_session_key(self, session_id: str) -> str:
-        """Generate Redis key for a session."""
-        return f"session:{session_id}:messages"
+        Runs under the state lock so no fallback write lands in memory
+        between draining it and re-enabling the backend. Buffered messages
+        are appended after whatever history it kept from before the outage.
+        """
+        with self._state_lock:
+            buffered = self.memory.drain()
+            try:
+                self.backend.write_many(buffered)
+            except Exception:
+                # Still unreachable: put everything back and keep probing
+                for session_id, session in buffered.items():
+                    if session["messages"]:
+                        self.memory.append(session_id, session["messages"])
+                    if session["project"] is not None:
+                        self.memory.set_project(session_id, session["project"])
+                raise
+            self.replayed_messages += sum(len(session["messages"]) for session in buffered.values())
+            self.use_backend = True
+            self._record_transition("connected", f"reconnected, replayed {len(buffered)} session(s)")
     
-    def _get_project_ref_key(self, session_id: str) -> str:
-        """Generate Redis key for last project reference."""
-        return f"session:{session_id}:last_project"
+    def close(self):
+        """Stop the recovery probe and the backend (called on application shutdown)."""
+        self._stop.set()
+        probe = self._probe_thread
+        if probe is not None:
+            probe.join(timeout=1)
+        if self.backend is not None:
+            self.backend.close()
+    
+    def unit_of_work(self, session_id: str) -> SessionUnitOfWork:
+        """
+        Start a per-request unit of work for a session.
+        
+        Usage:
+            with session_manager.unit_of_work(session_id) as session:
+                session.add_message("user", text)
+                ...
+            # all writes flushed here in one round trip
+        """
+        return SessionUnitOfWork(self, session_id)
     
     def add_message(self, session_id: str, role: str, content: str):
         """
@@ -51,25 +229,37 @@ class SessionManager:
             role: Either 'user' or 'assistant'
             content: The message content
         """
-        message = {
-            "role": role,
-            "content": content
-        }
+        self.write(session_id, [{"role": role, "content": content}])
+    
+    def write(self, session_id: str, messages: List[Dict], project_name: Optional[str] = None):
+        """
+        Append messages and optionally set the last project reference.
+        
+        Each backend applies the whole write atomically in one round trip
+        (a Redis MULTI/EXEC pipeline, a single SQLite transaction).
         
-        if self.use_redis:
+        Args:
+            session_id: Unique identifier for the conversation session
+            messages: List of {"role", "content"} dicts
+            project_name: Optional project reference to store
+        """
+        if self.use_backend:
             try:
-                key = self._get_session_key(session_id)
-                self.redis_client.rpush(key, json.dumps(message))
-                self.redis_client.expire(key, self.session_ttl)
+                self.backend.write(session_id, messages, project_name)
+                return
             except Exception as e:
-                print(f"WARNING: Redis error, falling back: {e}")
-                self.use_redis = False
+                print(f"WARNING: Session backend error, falling back: {e}")
+                self._mark_down(e)
                 # Fall through to in-memory storage
         
-        if not self.use_redis:
-            if session_id not in self.fallback_storage:
-                self.fallback_storage[session_id] = []
-            self.fallback_storage[session_id].append(message)
+        with self._state_lock:
+            if self.use_backend:
+                # Recovered while this write was failing over
+                return self.write(session_id, messages, project_name)
+            if messages:
+                self.memory.append(session_id, messages)
+            if project_name is not None:
+                self.memory.set_project(session_id, project_name)
     
     def get_conversation_history(self, session_id: str, limit: int = 5) -> List[Dict]:
         """
@@ -82,18 +272,15 @@ class SessionManager:
         Returns:
             List of message dictionaries with 'role' and 'content'
         """
-        if self.use_redis:
+        if self.use_backend:
             try:
-                key = self._get_session_key(session_id)
-                messages = self.redis_client.lrange(key, -limit, -1)
-                return [json.loads(msg) for msg in messages]
+                return self.backend.get_messages(session_id, limit)
             except Exception as e:
-                print(f"WARNING: Redis error: {e}")
-                self.use_redis = False
+                print(f"WARNING: Session backend error: {e}")
+                self._mark_down(e)
         
         # Fallback
-        messages = self.fallback_storage.get(session_id, [])
-        return messages[-limit:] if messages else []
+        return self.memory.get_messages(session_id, limit)
     
     def set_last_project_reference(self, session_id: str, project_name: str):
         """
@@ -103,17 +290,7 @@ class SessionManager:
             session_id: Unique identifier for the conversation session
             project_name: Name of the project
         """
-        if self.use_redis:
-            try:
-                key = self._get_project_ref_key(session_id)
-                self.redis_client.set(key, project_name, ex=self.session_ttl)
-                return
-            except Exception as e:
-                print(f"WARNING: Redis error: {e}")
-                self.use_redis = False
-        
-        # Fallback
-        self.fallback_projects[session_id] = project_name
+        self.write(session_id, [], project_name)
     
     def get_last_project_reference(self, session_id: str) -> Optional[str]:
         """
@@ -125,16 +302,15 @@ class SessionManager:
         Returns:
             Project name if found, None otherwise
         """
-        if self.use_redis:
+        if self.use_backend:
             try:
-                key = self._get_project_ref_key(session_id)
-                return self.redis_client.get(key)
+                return self.backend.get_project(session_id)
             except Exception as e:
-                print(f"WARNING: Redis error: {e}")
-                self.use_redis = False
+                print(f"WARNING: Session backend error: {e}")
+                self._mark_down(e)
         
         # Fallback
-        return self.fallback_projects.get(session_id)
+        return self.memory.get_project(session_id)
     
     def clear_session(self, session_id: str):
         """
@@ -143,13 +319,38 @@ class SessionManager:
         Args:
             session_id: Unique identifier for the conversation session
         """
-        msg_key = self._get_session_key(session_id)
-        proj_key = self._get_project_ref_key(session_id)
-        self.redis_client.delete(msg_key, proj_key)
+        self.memory.delete(session_id)
+        if self.use_backend:
+            self.backend.delete(session_id)
+    
+    def stats(self) -> Dict:
+        """Storage in use, backend recovery state, and in-memory store usage."""
+        next_probe = self._next_probe_at
+        backend = None
+        if self.backend is not None:
+            backend = {
+                "name": self.backend.name,
+                "state": "connected" if self.use_backend else "disconnected",
+                "next_probe_in_seconds": round(max(0.0, next_probe - time.monotonic()), 2) if next_probe else None,
+                "replayed_messages": self.replayed_messages,
+                "transitions": list(self.transitions)
+            }
+            if self.use_backend:
+                try:
+                    backend.update(self.backend.stats())
+                except Exception:
+                    pass
+        return {
+            "backend": self.backend.name if self.use_backend else "memory",
+            "max_messages_per_session": self.max_messages,
+            "durable": backend,
+            "memory": self.memory.stats()
+        }
     
     def health_check(self) -> bool:
-        """Check if Redis connection is healthy."""
+        """Check if the session backend is healthy."""
         try:
-            return self.redis_client.ping()
-        except:
+            self.backend.ping()
+            return True
+        except Exception:
             return False
@@ -0,0 +1,249 @@
+"""
+Bounded, thread-safe in-memory session store.
+
+Used by SessionManager when Redis is unavailable. Unlike plain dicts it
+cannot grow without limit:
+
+- each session keeps at most `max_messages` messages (oldest dropped)
+- sessions expire `ttl_seconds` after they were last used
+- when the store holds more than `max_sessions` sessions or roughly
+  `max_bytes` of message text, the least recently used sessions go first
+
+Sessions live in an OrderedDict in least-recently-used order. Every access
+also renews the session's TTL, so that order is also expiry order. Expired
+sessions are therefore always at the front and cost O(1) each to sweep.
+
+ShardedSessionStore spreads sessions over several such stores by hashing
+the session ID, so concurrent requests for different sessions rarely
+contend for the same lock. All operations on one session go through one
+shard lock, and a batch of messages is appended under it in one step, so
+a session's messages are never lost or interleaved. LRU eviction and the
+size bounds apply per shard (each gets an equal slice).
+"""
+
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional
+
+
+MESSAGE_OVERHEAD_BYTES = 120   # Rough per-message cost of the dict, deque slot and strings
+
+
+class _Session:
+    __slots__ = ("messages", "project", "expires_at", "size")
+
+    def __init__(self, max_messages: int):
+        self.messages = deque(maxlen=max_messages)
+        self.project: Optional[str] = None
+        self.expires_at = 0.0
+        self.size = 0
+
+
+def _message_size(message: Dict) -> int:
+    return len(message.get("role", "")) + len(message.get("content", "")) + MESSAGE_OVERHEAD_BYTES
+
+
+class MemorySessionStore:
+    """Thread-safe, size-bounded session store with TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        max_sessions: int,
+        max_messages: int,
+        max_bytes: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._messages = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def append(self, session_id: str, messages: List[Dict]):
+        """Append messages to a session, dropping its oldest beyond the cap."""
+        with self._lock:
+            session = self._touch(session_id, create=True)
+            for message in messages:
+                if len(session.messages) == session.messages.maxlen:
+                    dropped = _message_size(session.messages[0])
+                    session.size -= dropped
+                    self._bytes -= dropped
+                    self._messages -= 1
+                session.messages.append(message)
+                added = _message_size(message)
+                session.size += added
+                self._bytes += added
+                self._messages += 1
+            self._evict(keep=session_id)
+
+    def get_messages(self, session_id: str, limit: int) -> List[Dict]:
+        """Get a session's last `limit` messages."""
+        with self._lock:
+            session = self._touch(session_id)
+            if session is None or limit <= 0:
+                return []
+            return list(session.messages)[-limit:]
+
+    def set_project(self, session_id: str, project_name: str):
+        """Store the session's last project reference."""
+        with self._lock:
+            self._touch(session_id, create=True).project = project_name
+            self._evict(keep=session_id)
+
+    def get_project(self, session_id: str) -> Optional[str]:
+        """Get the session's last project reference."""
+        with self._lock:
+            session = self._touch(session_id)
+            return session.project if session else None
+
+    def delete(self, session_id: str):
+        """Remove a session."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._forget(session)
+
+    def drain(self) -> Dict[str, Dict]:
+        """
+        Remove and return every live session, least recently used first.
+        
+        Returns:
+            {session_id: {"messages": [...], "project": str | None}}
+        """
+        with self._lock:
+            self._expire()
+            drained = {
+                session_id: {"messages": list(session.messages), "project": session.project}
+                for session_id, session in self._sessions.items()
+            }
+            self._sessions.clear()
+            self._bytes = 0
+            self._messages = 0
+            return drained
+    
+    def stats(self) -> Dict:
+        """Memory usage and eviction counters."""
+        with self._lock:
+            self._expire()
+            return {
+                "sessions": len(self._sessions),
+                "messages": self._messages,
+                "approx_bytes": self._bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "max_messages_per_session": self.max_messages,
+                "evictions": self._evictions,
+                "expirations": self._expirations
+            }
+
+    def _touch(self, session_id: str, create: bool = False) -> Optional[_Session]:
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is None:
+            if not create:
+                return None
+            session = self._sessions[session_id] = _Session(self.max_messages)
+        else:
+            self._sessions.move_to_end(session_id)
+        session.expires_at = self._clock() + self.ttl_seconds
+        return session
+
+    def _expire(self):
+        now = self._clock()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.expires_at > now:
+                break
+            del self._sessions[session_id]
+            self._forget(session)
+            self._expirations += 1
+
+    def _evict(self, keep: str):
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes
+        ):
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                break
+            self._forget(self._sessions.pop(session_id))
+            self._evictions += 1
+
+    def _forget(self, session: _Session):
+        self._bytes -= session.size
+        self._messages -= len(session.messages)
+
+
+class ShardedSessionStore:
+    """MemorySessionStore split into independently locked shards."""
+
+    def __init__(
+        self,
+        shards: int,
+        max_sessions: int,
+        max_messages: int,
+        max_bytes: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        shards = max(1, shards)
+        self.max_messages = max_messages
+        self._shards = [
+            MemorySessionStore(
+                max_sessions=max(1, max_sessions // shards),
+                max_messages=max_messages,
+                max_bytes=max(1, max_bytes // shards),
+                ttl_seconds=ttl_seconds,
+                clock=clock
+            )
+            for _ in range(shards)
+        ]
+
+    def _shard(self, session_id: str) -> MemorySessionStore:
+        return self._shards[zlib.crc32(session_id.encode()) % len(self._shards)]
+
+    def append(self, session_id: str, messages: List[Dict]):
+        """Append messages to a session, dropping its oldest beyond the cap."""
+        self._shard(session_id).append(session_id, messages)
+
+    def get_messages(self, session_id: str, limit: int) -> List[Dict]:
+        """Get a session's last `limit` messages."""
+        return self._shard(session_id).get_messages(session_id, limit)
+
+    def set_project(self, session_id: str, project_name: str):
+        """Store the session's last project reference."""
+        self._shard(session_id).set_project(session_id, project_name)
+
+    def get_project(self, session_id: str) -> Optional[str]:
+        """Get the session's last project reference."""
+        return self._shard(session_id).get_project(session_id)
+
+    def delete(self, session_id: str):
+        """Remove a session."""
+        self._shard(session_id).delete(session_id)
+
+    def drain(self) -> Dict[str, Dict]:
+        """Remove and return every live session from every shard."""
+        drained = {}
+        for shard in self._shards:
+            drained.update(shard.drain())
+        return drained
+
+    def stats(self) -> Dict:
+        """Memory usage and eviction counters summed over shards."""
+        totals: Dict = {"shards": len(self._shards)}
+        for shard in self._shards:
+            for key, value in shard.stats().items():
+                if key == "max_messages_per_session":
+                    totals[key] = value
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
@@ -0,0 +1,199 @@
+"""
+Monte Carlo schedule simulation for delivery-date confidence.
+
+Each team's recent daily throughput (tasks finished per day) is treated as
+an empirical distribution. A trial draws one day at a time from it until the
+team's remaining work is done; a project finishes when its slowest team
+does. Thousands of trials run as NumPy array operations, and the spread of
+finish days gives P50/P80/P95 delivery dates.
+
+Portfolio runs split projects into chunks and fan them out over a process
+pool, the same way batch_parser does for message parsing.
+"""
+
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import config
+from forecaster import MAX_HORIZON_DAYS
+from process_pools import get_process_pool
+
+
+PERCENTILES = (50, 80, 95)
+MAX_BLOCK_DAYS = 256     # Upper bound on days drawn per vectorized step
+PROJECTS_PER_TASK = 16   # Projects per pool task in portfolio runs
+
+
+def simulate_finish_days(
+    remaining: int,
+    daily_throughput: Sequence[int],
+    trials: int,
+    rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Simulate how many days a team needs to finish its remaining work.
+
+    Args:
+        remaining: Work units left
+        daily_throughput: Observed units finished per day (one value per day)
+        trials: Number of trials
+        rng: Random generator
+
+    Returns:
+        Float array of finish days per trial (inf when not finished within
+        MAX_HORIZON_DAYS)
+    """
+    finish = np.full(trials, np.inf)
+    if remaining <= 0:
+        finish[:] = 0
+        return finish
+
+    samples = np.asarray(daily_throughput, dtype=np.int64)
+    if samples.size == 0 or samples.max() <= 0:
+        return finish
+
+    # Size blocks around the expected finish day so most trials end in the first one
+    block = int(np.clip(remaining / samples.mean() * 1.25 + 4, 8, MAX_BLOCK_DAYS))
+    done = np.zeros(trials, dtype=np.int64)
+    active = np.arange(trials)
+    for offset in range(0, MAX_HORIZON_DAYS, block):
+        draws = samples[rng.integers(0, samples.size, size=(active.size, block))]
+        cumulative = done[active, None] + np.cumsum(draws, axis=1)
+        reached = cumulative >= remaining
+        hit = reached.any(axis=1)
+
+        finish[active[hit]] = offset + reached[hit].argmax(axis=1) + 1
+        done[active] = cumulative[:, -1]
+        active = active[~hit]
+        if active.size == 0:
+            break
+    return finish
+
+
+def _finish_percentiles(finish: np.ndarray, percentiles: Sequence[int]) -> List[Optional[float]]:
+    """
+    Percentiles of simulated finish days.
+
+    Trials that never finish are inf. Interpolating between them and finite
+    trials is undefined, so each percentile is taken as the nearest trial at
+    or above it: a percentile that lands on an unfinished trial is None.
+
+    Args:
+        finish: Finish day per trial (inf for trials that never finish)
+        percentiles: Percentiles to compute (0-100)
+
+    Returns:
+        Day count per percentile, or None if it is never reached
+    """
+    days = np.percentile(finish, percentiles, method="higher")
+    return [float(d) if np.isfinite(d) else None for d in days]
+
+
+def simulate_project(
+    name: str,
+    teams: Dict[str, Tuple[int, List[int]]],
+    trials: int,
+    seed: int = 0,
+    today: Optional[datetime] = None
+) -> Dict:
+    """
+    Run the Monte Carlo simulation for one project.
+
+    Args:
+        name: Project name (mixed into the seed so runs are reproducible)
+        teams: {team: (remaining units, daily throughput samples)}
+        trials: Number of trials
+        seed: Extra seed material (e.g. the project's change marker)
+        today: Start date for the projected dates (defaults to now, UTC)
+
+    Returns:
+        {
+            "status": "completed" | "simulated" | "stalled" | "insufficient_history",
+            "p50": ISO date | None, "p80": ..., "p95": ...,
+            "remaining": int,
+            "trials": int,
+            "teams": {team: {"remaining": int, "p80_days": float | None}}
+        }
+    """
+    today = (today or datetime.utcnow()).date()
+    remaining_total = sum(remaining for remaining, _ in teams.values())
+    result = {
+        "status": "completed",
+        "p50": None,
+        "p80": None,
+        "p95": None,
+        "remaining": remaining_total,
+        "trials": trials,
+        "teams": {}
+    }
+    if remaining_total <= 0:
+        result["p50"] = result["p80"] = result["p95"] = today.isoformat()
+        return result
+
+    if not any(any(samples) for remaining, samples in teams.values() if remaining > 0):
+        result["status"] = "insufficient_history"
+        result["teams"] = {
+            team: {"remaining": remaining, "p80_days": None} for team, (remaining, _) in teams.items()
+        }
+        return result
+
+    rng = np.random.default_rng([zlib.crc32(name.encode()), seed & 0xFFFFFFFF])
+    project_finish = np.zeros(trials)
+    for team, (remaining, samples) in sorted(teams.items()):
+        finish = simulate_finish_days(remaining, samples, trials, rng)
+        project_finish = np.maximum(project_finish, finish)
+        p80_days, = _finish_percentiles(finish, (80,))
+        result["teams"][team] = {"remaining": remaining, "p80_days": p80_days}
+
+    result["status"] = "simulated"
+    for p, days in zip(PERCENTILES, _finish_percentiles(project_finish, PERCENTILES)):
+        if days is None:
+            result["status"] = "stalled"
+        else:
+            result[f"p{p}"] = (today + timedelta(days=int(np.ceil(days)))).isoformat()
+    return result
+
+
+def _simulate_chunk(chunk: List[Tuple[str, Dict, int]], trials: int) -> Dict[str, Dict]:
+    """Pool task: simulate a chunk of (name, teams, seed) projects."""
+    return {name: simulate_project(name, teams, trials, seed) for name, teams, seed in chunk}
+
+
+def simulate_portfolio(
+    projects: Dict[str, Tuple[Dict, int]],
+    trials: Optional[int] = None,
+    workers: Optional[int] = None
+) -> Dict[str, Dict]:
+    """
+    Simulate many projects, in parallel when there is enough work.
+
+    Args:
+        projects: {name: (teams, seed)} as accepted by simulate_project
+        trials: Trials per project (defaults to SIMULATION_TRIALS)
+        workers: Pool size (defaults to SIMULATION_WORKERS or one per core)
+
+    Returns:
+        {name: simulation result}
+    """
+    trials = trials or config.SIMULATION_TRIALS
+    workers = workers or config.SIMULATION_WORKERS or os.cpu_count() or 1
+
+    items = [(name, teams, seed) for name, (teams, seed) in projects.items()]
+    chunks = [items[i:i + PROJECTS_PER_TASK] for i in range(0, len(items), PROJECTS_PER_TASK)]
+
+    if workers <= 1 or len(chunks) <= 1:
+        results = {}
+        for chunk in chunks:
+            results.update(_simulate_chunk(chunk, trials))
+        return results
+
+    executor = get_process_pool(workers)
+    results = {}
+    for partial in executor.map(_simulate_chunk, chunks, [trials] * len(chunks)):
+        results.update(partial)
+    return results
+
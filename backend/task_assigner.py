@@ -4,10 +4,14 @@ Intelligent task auto-assignment engine.
 Provides:
 - Keyword-based task categorization (maps keywords → teams)
 - Workload balancing (round-robin within teams)
+- Capacity-aware balancing against cross-project workload (min-heap greedy)
+- Task row generation (categorized, round-robin assignees) for the tasks table
 - Auto-distribution when no explicit allocations given
+- Java backend payloads (full, or UPDATE deltas against the last one sent)
 """
 
 from typing import Dict, List, Optional, Tuple
+import heapq
 import math
 
 
@@ -115,6 +119,70 @@ def distribute_tasks_round_robin(
     return distribution
 
 
+def distribute_tasks_by_capacity(
+    total_tasks: int,
+    people: List[str],
+    current_load: Optional[Dict[str, int]] = None,
+    capacities: Optional[Dict[str, int]] = None
+) -> Tuple[Dict[str, int], List[str]]:
+    """
+    Distribute tasks so the least-loaded person always gets the next task.
+    
+    Uses a min-heap keyed on each person's total workload (existing load
+    from other projects plus tasks assigned here). People who reach their
+    capacity leave the heap; if everyone is full, remaining tasks go to
+    the least-overloaded person and an overflow warning is returned.
+    
+    Args:
+        total_tasks: Number of tasks to distribute
+        people: List of people names
+        current_load: Tasks each person already carries elsewhere
+        capacities: Optional max total tasks per person (missing = unlimited)
+    
+    Returns:
+        (distribution, warnings) where distribution maps person to new task count
+    """
+    people = list(dict.fromkeys(people))  # Drop duplicates, keep order
+    if not people:
+        return {}, []
+    
+    current_load = current_load or {}
+    capacities = capacities or {}
+    
+    distribution = {person: 0 for person in people}
+    available = [(current_load.get(p, 0), i, p) for i, p in enumerate(people)]
+    heapq.heapify(available)
+    full = []  # People at or over capacity, still ordered by load
+    overflow = 0
+    
+    for _ in range(total_tasks):
+        # Move anyone who has hit their capacity out of the available heap
+        while available:
+            load, order, person = available[0]
+            cap = capacities.get(person)
+            if cap is None or load < cap:
+                break
+            heapq.heappush(full, heapq.heappop(available))
+        
+        heap = available if available else full
+        if heap is full:
+            overflow += 1
+        load, order, person = heapq.heappop(heap)
+        distribution[person] += 1
+        heapq.heappush(heap, (load + 1, order, person))
+    
+    warnings = []
+    if overflow:
+        warnings.append(f"{overflow} task(s) exceed the team's remaining capacity.")
+    for person in people:
+        cap = capacities.get(person)
+        total = current_load.get(person, 0) + distribution[person]
+        if cap is not None and total > cap and distribution[person] > 0:
+            warnings.append(f"{person} is over capacity ({total}/{cap} tasks).")
+    
+    return distribution, warnings
+
+
 def auto_assign_tasks(
     total_tasks: int,
     allocations: Dict,
@@ -164,6 +232,96 @@ def auto_assign_tasks(
     return result
 
 
+def auto_assign_tasks_by_capacity(
+    total_tasks: int,
+    allocations: Dict,
+    workloads: Dict[str, int],
+    capacities: Optional[Dict[str, int]] = None
+) -> Tuple[Dict, List[str]]:
+    """
+    Distribute tasks within team allocations, accounting for what each
+    person already carries across other projects.
+    
+    Args:
+        total_tasks: Total number of tasks
+        allocations: Dict of {team_name: {count: int, people: [str]}}
+        workloads: Current per-person task counts (see DatabaseManager.get_person_workloads)
+        capacities: Optional max total tasks per person
+    
+    Returns:
+        (enhanced allocations, overflow warnings) — allocations have the
+        same shape as auto_assign_tasks output
+    """
+    result = {}
+    warnings = []
+    running_load = dict(workloads)
+    
+    for team_name, team_data in allocations.items():
+        if isinstance(team_data, dict):
+            count = team_data.get("count", 0)
+            people = team_data.get("people", [])
+        else:
+            count = int(team_data)
+            people = []
+        
+        assignments = {}
+        if people:
+            assignments, team_warnings = distribute_tasks_by_capacity(
+                count, people, running_load, capacities
+            )
+            warnings.extend(f"{team_name}: {w}" for w in team_warnings)
+            # People on several teams carry their new load into the next team
+            for person, assigned in assignments.items():
+                running_load[person] = running_load.get(person, 0) + assigned
+        
+        result[team_name] = {
+            "count": count,
+            "people": people,
+            "assignments": assignments
+        }
+    
+    return result, warnings
+
+
+def build_task_rows(
+    task_descriptions: List[str],
+    allocations: Optional[Dict] = None,
+    team: Optional[str] = None
+) -> List[Dict]:
+    """
+    Turn task descriptions into rows for the tasks table.
+    
+    Descriptions are categorized into teams (unless `team` is given) and
+    handed out round-robin to the people on that team in `allocations`.
+    
+    Args:
+        task_descriptions: List of task descriptions
+        allocations: Project allocations ({team_name: {count, people}})
+        team: Optional team to put every task in, skipping categorization
+    
+    Returns:
+        List of {description, team, assignee} dicts
+    """
+    allocations = allocations or {}
+    if team:
+        categorized = {team: list(task_descriptions)}
+    else:
+        categorized = categorize_tasks_batch(task_descriptions)
+    
+    rows = []
+    for team_name, descriptions in categorized.items():
+        team_data = allocations.get(team_name)
+        people = team_data.get("people", []) if isinstance(team_data, dict) else []
+        for i, description in enumerate(descriptions):
+            rows.append({
+                "description": description,
+                "team": team_name,
+                "assignee": people[i % len(people)] if people else None
+            })
+    
+    return rows
+
+
 def suggest_allocation(
     total_tasks: int,
     teams: Optional[List[str]] = None
@@ -200,7 +358,10 @@ def generate_java_payload(
     project_name: str,
     total_tasks: int,
     allocations: Dict,
-    action: str = "CREATE"
+    action: str = "CREATE",
+    previous: Optional[Dict] = None,
+    version: Optional[int] = None,
+    fields: Optional[Dict] = None
 ) -> Dict:
     """
     Generate a structured JSON payload for Java backend consumption.
@@ -210,6 +371,10 @@ def generate_java_payload(
         total_tasks: Total number of tasks
         allocations: Enhanced allocations dict
         action: Action type (CREATE, UPDATE, DELETE)
+        previous: Full payload last sent for this project; an UPDATE then
+            carries only what changed (see diff_java_payload)
+        version: Project version, sent so the consumer can detect gaps
+        fields: Extra project fields (e.g. status, completion)
     
     Returns:
         Structured JSON dict ready for Java API
@@ -239,11 +404,77 @@ def generate_java_payload(
                 "members": []
             })
     
-    return {
+    payload = {
         "action": action,
         "project": {
             "name": project_name,
             "totalTasks": total_tasks,
+            **(fields or {}),
             "teams": teams
         }
     }
+    if version is not None:
+        payload["version"] = version
+    if action == "UPDATE" and previous:
+        return diff_java_payload(previous, payload)
+    return payload
+
+
+def diff_java_payload(previous: Dict, current: Dict) -> Dict:
+    """
+    Reduce a full UPDATE payload to what changed since the previous one.
+    
+    The delta keeps the project name and any changed project fields. Teams
+    appear only when they changed: new teams in full, existing ones with
+    their changed taskCount, upserted members and removedMembers names.
+    Dropped teams are listed in removedTeams. With versions, baseVersion
+    names the state the delta applies to, so a consumer that has not seen
+    that version knows it missed an update and needs a full resync.
+    
+    Args:
+        previous: Full payload the consumer last received
+        current: Full payload for the new state
+    
+    Returns:
+        {"action": "UPDATE", "delta": True, "project": {...},
+         "version": int, "baseVersion": int}  (versions when present)
+    """
+    old_project, new_project = previous["project"], current["project"]
+    project = {"name": new_project["name"]}
+    for key, value in new_project.items():
+        if key not in ("name", "teams") and old_project.get(key) != value:
+            project[key] = value
+    
+    old_teams = {team["teamName"]: team for team in old_project.get("teams", [])}
+    teams = []
+    for team in new_project["teams"]:
+        old_team = old_teams.pop(team["teamName"], None)
+        if old_team is None:
+            teams.append(team)
+            continue
+        
+        changed = {"teamName": team["teamName"]}
+        if old_team["taskCount"] != team["taskCount"]:
+            changed["taskCount"] = team["taskCount"]
+        old_members = {member["name"]: member["assignedTasks"] for member in old_team["members"]}
+        members = [
+            member for member in team["members"]
+            if old_members.pop(member["name"], None) != member["assignedTasks"]
+        ]
+        if members:
+            changed["members"] = members
+        if old_members:
+            changed["removedMembers"] = list(old_members)
+        if len(changed) > 1:
+            teams.append(changed)
+    
+    if teams:
+        project["teams"] = teams
+    if old_teams:
+        project["removedTeams"] = list(old_teams)
+    
+    delta = {"action": "UPDATE", "delta": True, "project": project}
+    if "version" in current:
+        delta["version"] = current["version"]
+        delta["baseVersion"] = previous.get("version")
+    return delta
@@ -4,6 +4,11 @@ Ensures data integrity before any database writes.
 """
 
 from typing import Dict, List, Optional, Tuple
+from datetime import date
+from config import config
+
+
+TASK_STATUSES = {"Todo", "In Progress", "Done", "Delayed"}
 
 
 class ValidationError(Exception):
@@ -39,8 +44,8 @@ def validate_project_creation(
     if not isinstance(total_tasks, int) or total_tasks < 0:
         return False, "Total tasks must be a non-negative integer."
     
-    if total_tasks > 1000:
-        return False, "Total tasks cannot exceed 1000 per project."
+    if total_tasks > config.MAX_TASKS_PER_PROJECT:
+        return False, f"Total tasks cannot exceed {config.MAX_TASKS_PER_PROJECT} per project."
     
     # Allocation validation
     if allocations:
@@ -146,3 +151,61 @@ def validate_project_update(
             return False, "Delayed tasks must be a non-negative integer."
     
     return True, None
+
+
+def validate_tasks(tasks: List[Dict], existing: int = 0) -> Tuple[bool, Optional[str]]:
+    """
+    Validate task rows before a bulk insert.
+    
+    Each task needs a non-empty description; status and due_date are optional.
+    The project's task rows after the insert (existing + new) must stay within
+    MAX_TASKS_PER_PROJECT.
+    
+    Args:
+        tasks: Task rows to insert
+        existing: Task rows the project already has (its tracked_tasks)
+    """
+    if not tasks:
+        return False, "No tasks provided."
+    
+    if existing + len(tasks) > config.MAX_TASKS_PER_PROJECT:
+        return False, (
+            f"Project cannot have more than {config.MAX_TASKS_PER_PROJECT} tasks "
+            f"({existing} existing + {len(tasks)} new)."
+        )
+    
+    for i, task in enumerate(tasks):
+        description = task.get("description")
+        if not isinstance(description, str) or not description.strip():
+            return False, f"Task {i + 1} needs a description."
+        
+        valid, error = validate_task_update(
+            status=task.get("status"), due_date=task.get("due_date")
+        )
+        if not valid:
+            return False, f"Task {i + 1}: {error}"
+    
+    return True, None
+
+
+def validate_task_update(
+    status: Optional[str] = None,
+    due_date: Optional[str] = None,
+    assignee: Optional[str] = None
+) -> Tuple[bool, Optional[str]]:
+    """
+    Validate task update fields.
+    """
+    if status is not None and status not in TASK_STATUSES:
+        return False, f"Invalid task status '{status}'. Must be one of: {', '.join(sorted(TASK_STATUSES))}"
+    
+    if due_date is not None:
+        try:
+            date.fromisoformat(due_date)
+        except (TypeError, ValueError):
+            return False, "Due date must be an ISO date (YYYY-MM-DD)."
+    
+    if assignee is not None and (not isinstance(assignee, str) or not assignee.strip()):
+        return False, "Assignee cannot be empty."
+    
+    return True, None
@@ -1,6 +1,6 @@
 import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
-import { Observable } from 'rxjs';
+import { Observable, tap } from 'rxjs';
 import { environment } from '../../environments/environment';
 
 @Injectable({
@@ -8,10 +8,19 @@ import { environment } from '../../environments/environment';
 })
 export class ChatService {
   private apiUrl = `${environment.apiUrl}/chat`;
+  // Assigned by the backend on the first reply, then sent with every message
+  private sessionId: string | null = null;
 
   constructor(private http: HttpClient) { }
 
   sendMessage(message: string): Observable<any> {
-    return this.http.post<any>(this.apiUrl, { message });
+    const body = this.sessionId ? { message, session_id: this.sessionId } : { message };
+    return this.http.post<any>(this.apiUrl, body).pipe(
+      tap(response => {
+        if (response?.session_id) {
+          this.sessionId = response.session_id;
+        }
+      })
+    );
   }
 }
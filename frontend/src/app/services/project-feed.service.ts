@@ -0,0 +1,32 @@
+import { Injectable } from '@angular/core';
+import { Observable } from 'rxjs';
+import { webSocket } from 'rxjs/webSocket';
+import { environment } from '../../environments/environment';
+
+export interface ProjectChange {
+  type: 'created' | 'updated' | 'deleted' | 'subscribed' | 'resync';
+  project?: string;
+  version?: number;
+  state?: {
+    status: string;
+    completion: number;
+    delayed_tasks: number;
+    total_tasks: number;
+    risk_score: number;
+    risk_level: string;
+  } | null;
+}
+
+@Injectable({
+  providedIn: 'root'
+})
+export class ProjectFeedService {
+  private feedUrl = `${environment.apiUrl.replace(/^http/, 'ws')}/ws/projects`;
+
+  // Live project changes instead of re-polling GET /projects.
+  // Pass project names to follow only those; on 'resync', reload the list.
+  changes(projects?: string[]): Observable<ProjectChange> {
+    const query = projects?.length ? `?projects=${encodeURIComponent(projects.join(','))}` : '';
+    return webSocket<ProjectChange>(`${this.feedUrl}${query}`);
+  }
+}
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Shared setup for tests that run requests through the FastAPI app.
+
+backend/main.py builds its gateway, session manager and middleware from
+config when it is imported, so environment variables set by one test
+module are lost once another module has imported main. AppTestCase gives
+each test class its own copy of the app instead: it re-reads config with
+the class's app_env applied, reloads main, and undoes both afterwards.
+"""
+
+import sys
+import os
+import importlib
+import importlib.util
+import shutil
+import tempfile
+import unittest
+from contextlib import ExitStack
+from typing import Callable, Dict, Tuple
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+try:
+    from google import genai  # noqa: F401
+except ImportError:
+    # Tests never call Gemini; the SDK only has to import
+    sys.modules["google"] = MagicMock()
+    sys.modules["google.genai"] = MagicMock()
+
+from fastapi.testclient import TestClient
+
+import config as config_module
+import llm_budget
+
+
+def _config_values(env: Dict[str, str]) -> Dict:
+    """Evaluate config.py's Config under env, without touching the loaded module."""
+    with patch.dict(os.environ, env):
+        spec = importlib.util.spec_from_file_location("_app_harness_config", config_module.__file__)
+        fresh = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(fresh)
+    return {name: value for name, value in vars(fresh.Config).items() if name.isupper()}
+
+
+def load_app(env: Dict[str, str] = None) -> Tuple[object, Callable[[], None]]:
+    """
+    Load a fresh copy of main with env applied on top of os.environ.
+
+    Every app gets its own database file and in-memory sessions unless env
+    says otherwise, and a mock Gemini client.
+
+    Args:
+        env: Environment variables for this app
+
+    Returns:
+        (main module, cleanup callable that shuts the app down and restores
+        config and the environment)
+    """
+    workdir = tempfile.mkdtemp()
+    env = {
+        "DATABASE_PATH": os.path.join(workdir, "projects.db"),
+        "SESSION_BACKEND": "memory",
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "test-key"),
+        **(env or {}),
+    }
+
+    stack = ExitStack()
+    stack.enter_context(patch.dict(os.environ, env))
+    Config = type(config_module.config)
+    for name, value in _config_values(env).items():
+        stack.enter_context(patch.object(Config, name, value))
+    stack.enter_context(patch.object(llm_budget, "_budget", None))   # Built from this config
+
+    if "main" in sys.modules:
+        main = importlib.reload(sys.modules["main"])
+    else:
+        main = importlib.import_module("main")
+    main.nlp.client = MagicMock()
+
+    def cleanup():
+        main.shutdown_workers()
+        stack.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return main, cleanup
+
+
+class AppTestCase(unittest.TestCase):
+    """Base class providing cls.main (a fresh app built from app_env) and cls.client."""
+
+    app_env: Dict[str, str] = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.main, cls._unload_app = load_app(cls.app_env)
+        cls.client = TestClient(cls.main.app)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._unload_app()
+        super().tearDownClass()
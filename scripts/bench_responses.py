@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON serialization and compression of API responses.
+
+Compares FastAPI's default path (jsonable_encoder + json.dumps) with the
+orjson path used by ORJSONRoute, and the bytes on the wire with no
+compression, gzip and (when installed) brotli. Also times GET /projects
+end to end through the app, before and after.
+
+Usage:
+    python scripts/bench_responses.py [--projects 5000] [--repeat 20]
+"""
+
+import sys
+import os
+import argparse
+import gzip
+import tempfile
+import time
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+fd, DB_PATH = tempfile.mkstemp(suffix=".db")
+os.close(fd)
+os.environ["DATABASE_PATH"] = DB_PATH
+os.environ["SESSION_BACKEND"] = "memory"
+sys.modules["google"] = MagicMock()
+sys.modules["google.genai"] = MagicMock()
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.testclient import TestClient
+
+from task_assigner import auto_assign_tasks, generate_java_payload
+from response_encoding import brotli
+
+
+def chat_payload():
+    """A CREATE_PROJECT chat reply with a large team roster."""
+    people = [f"Person {i}" for i in range(60)]
+    allocations = auto_assign_tasks(800, {
+        team: {"count": 200, "people": people} for team in ("frontend", "backend", "testing", "devops")
+    })
+    return {
+        "response": "✅ Project created. " * 20,
+        "intent": "CREATE_PROJECT",
+        "data": {
+            "intent": "CREATE_PROJECT",
+            "project_name": "Project Bench",
+            "total_tasks": 800,
+            "allocations": allocations,
+            "entities": {"persons": people, "numbers": [800, 200]},
+            "java_payload": generate_java_payload("Project Bench", 800, allocations),
+        },
+        "session_id": "0" * 32
+    }
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def bench_serialization(name, payload, repeat):
+    before_ms, before = timed(lambda: JSONResponse(jsonable_encoder(payload)).body, repeat)
+    after_ms, after = timed(lambda: ORJSONResponse(payload).body, repeat)
+    gzipped = gzip.compress(after, 6)
+    row = f"{name:<10} {before_ms:>9.2f} {after_ms:>9.2f} {before_ms / after_ms:>7.1f}x {len(before):>10,} {len(gzipped):>9,}"
+    if brotli:
+        row += f" {len(brotli.compress(after, quality=5)):>9,}"
+    print(row)
+
+
+def bench_endpoint(projects, repeat):
+    import main
+
+    for i in range(projects):
+        main.gateway.db.create_project(f"Project {i:05d}", 10)
+
+    # Same endpoint mounted on a stock FastAPI app for the "before" numbers
+    stock = FastAPI()
+    stock.get("/projects")(lambda: {"projects": main.gateway.list_all_projects(), "total": projects})
+    clients = {
+        "before (default, identity)": (TestClient(stock), "identity"),
+        "after (orjson, identity)": (TestClient(main.app), "identity"),
+        "after (orjson, gzip)": (TestClient(main.app), "gzip"),
+    }
+    if brotli:
+        clients["after (orjson, br)"] = (TestClient(main.app), "br")
+
+    print(f"\nGET /projects with {projects:,} projects (mean of {repeat}):")
+    for label, (client, encoding) in clients.items():
+        client.get("/projects")
+        ms, response = timed(lambda: client.get("/projects", headers={"Accept-Encoding": encoding}), repeat)
+        wire = int(response.headers.get("content-length") or len(response.content))
+        print(f"  {label:<28} {ms:>8.2f} ms  {wire:>10,} bytes")
+    main.session_manager.close()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--projects", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    header = f"{'payload':<10} {'before ms':>9} {'after ms':>9} {'speedup':>8} {'raw bytes':>10} {'gzip':>9}"
+    print(header + (f" {'brotli':>9}" if brotli else "  (brotli not installed)"))
+    bench_serialization("chat", chat_payload(), args.repeat)
+    bench_serialization("projects", {
+        "projects": [
+            {"name": f"Project {i:05d}", "status": "In Progress", "completion": i % 100,
+             "total_tasks": 40, "delayed_tasks": i % 3, "created_at": "2025-01-01 09:00:00"}
+            for i in range(args.projects)
+        ],
+        "total": args.projects
+    }, args.repeat)
+
+    bench_endpoint(args.projects, args.repeat)
+    os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    main_cli()
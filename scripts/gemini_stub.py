@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini API, for load tests.
+
+Answers generateContent requests the way the real API does, with
+candidates[].content.parts[].text and usageMetadata. The google-genai
+client used by NLPProcessor therefore works against it unchanged: point
+GEMINI_BASE_URL at stub.url. Parse prompts are answered with the local
+regex parser's JSON, so /chat takes the same code paths as with the real
+model. Other prompts get a short canned reply.
+
+Latency, 5xx errors and 429 RESOURCE_EXHAUSTED responses are injected
+at configurable rates from a seeded RNG, so runs are reproducible.
+
+Usage:
+    stub = GeminiStub(latency_ms=300, jitter_ms=100, rate_limit_rate=0.05).start()
+    ...  # GEMINI_BASE_URL=stub.url
+    stub.stop()
+
+Or standalone:
+    python scripts/gemini_stub.py --port 8089 --latency-ms 300
+"""
+
+import sys
+import os
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from parser import parse_command
+
+
+USER_INPUT = re.compile(r'User Input: "(.*)"\s*\n')
+SMART_REPLY = "Done. The project data looks consistent; keep an eye on delayed tasks this week."
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        stub: "GeminiStub" = self.server.stub
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self.path.split("?")[0].endswith(":generateContent"):
+            self._reply(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+            return
+
+        status, payload, delay = stub.plan(json.loads(body or b"{}"))
+        time.sleep(delay)
+        self._reply(status, payload)
+
+    def _reply(self, status: int, payload: Dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def _prompt_text(request: Dict) -> str:
+    """Concatenated text parts of a generateContent request body."""
+    contents = request.get("contents") or []
+    if isinstance(contents, dict):
+        contents = [contents]
+    return "".join(
+        part.get("text", "")
+        for content in contents if isinstance(content, dict)
+        for part in content.get("parts", [])
+    )
+
+
+class GeminiStub:
+    """A fake Gemini generateContent endpoint on a background thread."""
+
+    def __init__(self, port: int = 0, latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: int = 0):
+        """
+        Args:
+            port: Port to listen on (0 = any free port)
+            latency_ms: Base response delay
+            jitter_ms: Extra delay drawn uniformly from [0, jitter_ms]
+            error_rate: Fraction of requests answered with 500 INTERNAL
+            rate_limit_rate: Fraction answered with 429 RESOURCE_EXHAUSTED
+            seed: RNG seed for delays and injected failures
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.counts = {"ok": 0, "rate_limited": 0, "error": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._port = port
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._port}"
+
+    def start(self) -> "GeminiStub":
+        self._server = ThreadingHTTPServer(("127.0.0.1", self._port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def plan(self, request: Dict):
+        """
+        Decide the reply to one request.
+
+        Returns:
+            (HTTP status, JSON payload, delay in seconds)
+        """
+        with self._lock:
+            delay = (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+            roll = self._random.random()
+            if roll < self.rate_limit_rate:
+                outcome = "rate_limited"
+            elif roll < self.rate_limit_rate + self.error_rate:
+                outcome = "error"
+            else:
+                outcome = "ok"
+            self.counts[outcome] += 1
+
+        if outcome == "rate_limited":
+            return 429, {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).",
+                                   "status": "RESOURCE_EXHAUSTED"}}, delay / 10
+        if outcome == "error":
+            return 500, {"error": {"code": 500, "message": "Internal error encountered.",
+                                   "status": "INTERNAL"}}, delay
+
+        prompt = _prompt_text(request)
+        match = USER_INPUT.search(prompt)
+        text = json.dumps(parse_command(match.group(1))) if match else SMART_REPLY
+        prompt_tokens, output_tokens = len(prompt) // 4 + 1, len(text) // 4 + 1
+        return 200, {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0
+            }],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": output_tokens,
+                "totalTokenCount": prompt_tokens + output_tokens
+            },
+            "modelVersion": "gemini-2.5-flash"
+        }, delay
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.counts)
+
+    def reset_counters(self):
+        with self._lock:
+            self.counts = {"ok": 0, "rate_limited": 0, "error": 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Gemini API stand-in")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stub = GeminiStub(args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+                      args.rate_limit_rate, args.seed).start()
+    print(f"Gemini stub listening on {stub.url} (GEMINI_BASE_URL={stub.url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Reproducible load test for the backend, runnable offline on one machine.
+
+Starts the Gemini stand-in (scripts/gemini_stub.py) and the RESP stand-in
+(scripts/redis_stub.py) in this process. Launches the app under uvicorn
+against them, with a fresh SQLite database in a temporary directory, and
+seeds it with projects. A fixed number of client threads (closed loop:
+each sends its next request when the previous one returns) then drive a
+weighted mix of /chat and REST calls. The report gives throughput,
+errors and p50/p95/p99/max latency per endpoint, plus how many Gemini
+calls were rate limited or failed and how many the app answered with
+its local fallback.
+
+Usage:
+    python scripts/load_test.py --concurrency 16 --duration 30
+    python scripts/load_test.py --gemini-latency-ms 800 --gemini-429-rate 0.2 --json run.json
+    python scripts/load_test.py --url http://127.0.0.1:8000   # existing server, no stubs
+
+Mix weights are set with --mix, e.g. --mix chat=5,list=2,get=2,create=1,update=1,tasks=1,risk=1
+"""
+
+import sys
+import os
+import argparse
+import itertools
+import json
+import math
+import random
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from gemini_stub import GeminiStub
+from redis_stub import RedisStub
+
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+TEAMS = ("frontend", "backend", "testing", "devops")
+PEOPLE = ("Ann", "Bob", "Cid", "Dee", "Eve", "Fay", "Gus", "Hal", "Ivy", "Jon", "Kim", "Lea")
+DEFAULT_MIX = "chat=5,list=2,get=2,create=1,update=1,tasks=1,risk=1"
+
+
+class Workload:
+    """Shared state of a run: known projects and unique-name generation."""
+
+    def __init__(self, base_url: str, project_names: List[str]):
+        self.base_url = base_url.rstrip("/")
+        self.projects = list(project_names)
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    def pick_project(self, rng: random.Random) -> str:
+        with self._lock:
+            return rng.choice(self.projects)
+
+    def new_project_name(self) -> str:
+        return f"Project Load {next(self._sequence):06d}"
+
+    def add_project(self, name: str):
+        with self._lock:
+            self.projects.append(name)
+
+
+def _allocations(rng: random.Random, total: int) -> Dict:
+    teams = rng.sample(TEAMS, 2)
+    first = total // 2
+    return {
+        team: {"count": count, "people": rng.sample(PEOPLE, 2)}
+        for team, count in zip(teams, (first, total - first))
+    }
+
+
+def op_chat(http: requests.Session, work: Workload, rng: random.Random, session_id: str):
+    project = work.pick_project(rng)
+    message = rng.choice([
+        f"What's the status of {project}?",
+        "Show all projects",
+        f"Update {project} to {rng.randint(1, 99)}% completion",
+        f"Create {work.new_project_name()} with 6 tasks, assign 3 to frontend (Ann, Bob), 3 to backend (Cid)",
+        "Show the top 5 riskiest projects",
+        "What's the status of it?",
+        "help",
+    ])
+    return "POST /chat", http.post(f"{work.base_url}/chat", json={"message": message, "session_id": session_id})
+
+
+def op_list(http, work, rng, session_id):
+    return "GET /projects", http.get(f"{work.base_url}/projects")
+
+
+def op_get(http, work, rng, session_id):
+    return "GET /projects/{name}", http.get(f"{work.base_url}/projects/{work.pick_project(rng)}")
+
+
+def op_create(http, work, rng, session_id):
+    name = work.new_project_name()
+    response = http.post(f"{work.base_url}/projects", json={
+        "name": name, "total_tasks": 8, "allocations": _allocations(rng, 8)
+    })
+    if response.status_code == 201:
+        work.add_project(name)
+    return "POST /projects", response
+
+
+def op_update(http, work, rng, session_id):
+    return "PUT /projects/{name}", http.put(
+        f"{work.base_url}/projects/{work.pick_project(rng)}", json={"completion": rng.randint(0, 100)}
+    )
+
+
+def op_tasks(http, work, rng, session_id):
+    return "POST /projects/{name}/tasks", http.post(
+        f"{work.base_url}/projects/{work.pick_project(rng)}/tasks",
+        json={"descriptions": [f"Load task {rng.randint(0, 10**6)}" for _ in range(3)]}
+    )
+
+
+def op_risk(http, work, rng, session_id):
+    return "GET /risk/portfolio", http.get(f"{work.base_url}/risk/portfolio", params={"top": 10})
+
+
+OPERATIONS: Dict[str, Callable] = {
+    "chat": op_chat,
+    "list": op_list,
+    "get": op_get,
+    "create": op_create,
+    "update": op_update,
+    "tasks": op_tasks,
+    "risk": op_risk,
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse "chat=5,list=2" into operation weights."""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}' (choose from {', '.join(OPERATIONS)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples: List[Tuple[str, int, float]], elapsed: float) -> Dict[str, Dict]:
+    """
+    Per-endpoint statistics.
+
+    Args:
+        samples: (endpoint, HTTP status or 0 for a transport error, latency seconds)
+        elapsed: Measured wall time in seconds
+
+    Returns:
+        {endpoint: {requests, errors, rps, p50_ms, p95_ms, p99_ms, max_ms}}, plus "TOTAL"
+    """
+    grouped = defaultdict(list)
+    for endpoint, status, latency in samples:
+        grouped[endpoint].append((status, latency))
+    grouped["TOTAL"] = [(status, latency) for _, status, latency in samples]
+
+    report = {}
+    for endpoint, results in grouped.items():
+        latencies = sorted(latency * 1000 for _, latency in results)
+        report[endpoint] = {
+            "requests": len(results),
+            "errors": sum(1 for status, _ in results if not 200 <= status < 400),
+            "rps": round(len(results) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        }
+    return report
+
+
+def run_workload(work: Workload, weights: Dict[str, float], concurrency: int, duration: float,
+                 warmup: float = 0.0, seed: int = 0) -> Tuple[List[Tuple[str, int, float]], float]:
+    """
+    Drive the mix from `concurrency` threads for warmup + duration seconds.
+
+    Returns:
+        (samples recorded after the warm-up, measured seconds)
+    """
+    names, cumulative = list(weights), list(itertools.accumulate(weights.values()))
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+    samples, lock = [], threading.Lock()
+
+    def worker(index: int):
+        rng = random.Random(seed * 1000 + index)
+        session_id = f"load-{seed}-{index}"
+        local = []
+        with requests.Session() as http:
+            while True:
+                began = time.perf_counter()
+                if began >= deadline:
+                    break
+                operation = OPERATIONS[rng.choices(names, cum_weights=cumulative)[0]]
+                try:
+                    endpoint, response = operation(http, work, rng, session_id)
+                    status = response.status_code
+                except requests.RequestException:
+                    endpoint, status = operation.__name__.replace("op_", ""), 0
+                finished = time.perf_counter()
+                if began >= measure_from:
+                    local.append((endpoint, status, finished - began))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, max(time.perf_counter() - measure_from, 1e-9)
+
+
+def seed_projects(base_url: str, count: int, seed: int) -> List[str]:
+    """Create `count` projects with tasks and team members."""
+    rng = random.Random(seed)
+    names = []
+    with requests.Session() as http:
+        for i in range(count):
+            name = f"Project Seed {i:05d}"
+            response = http.post(f"{base_url}/projects", json={
+                "name": name, "total_tasks": 12, "allocations": _allocations(rng, 12)
+            })
+            if response.status_code in (201, 409):
+                names.append(name)
+            http.put(f"{base_url}/projects/{name}", json={"completion": rng.randint(0, 100)})
+    return names
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, env: Dict[str, str], log_path: str, timeout: float = 120) -> Tuple[subprocess.Popen, str]:
+    """Launch the app under uvicorn and wait until /health answers."""
+    port = _free_port()
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            if requests.get(f"{base_url}/health", timeout=2).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+
+    stop_server(process)
+    with open(log_path) as f:
+        print(f.read()[-4000:])
+    raise RuntimeError("The app did not become healthy; its log is above.")
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def fallback_counts(base_url: str) -> Optional[Dict[str, float]]:
+    """llm_fallbacks_total from GET /metrics (summed over what one worker reports)."""
+    try:
+        response = requests.get(f"{base_url}/metrics", timeout=5)
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    counts = {}
+    for line in response.text.splitlines():
+        if line.startswith("llm_fallbacks_total{"):
+            labels, _, value = line.rpartition(" ")
+            counts[labels[len("llm_fallbacks_total{call=\""):-2]] = float(value)
+    return counts
+
+
+def print_report(report: Dict[str, Dict], gemini: Optional[Dict], fallbacks: Optional[Dict]):
+    header = f"{'endpoint':<28} {'requests':>8} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    print("\n" + header)
+    print("-" * len(header))
+    for endpoint in sorted(report, key=lambda name: (name == "TOTAL", name)):
+        row = report[endpoint]
+        print(f"{endpoint:<28} {row['requests']:>8} {row['errors']:>7} {row['rps']:>8.1f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+    if gemini is not None:
+        print(f"\nGemini stub: {gemini['ok']} ok, {gemini['rate_limited']} rate limited (429), {gemini['error']} errors (500)")
+    if fallbacks:
+        print("App fallbacks (one worker): " + ", ".join(f"{call}={int(n)}" for call, n in sorted(fallbacks.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test with Gemini and Redis stand-ins")
+    parser.add_argument("--concurrency", type=int, default=16, help="Client threads")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds of traffic excluded from the report")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights")
+    parser.add_argument("--seed-projects", type=int, default=200, help="Projects created before the run")
+    parser.add_argument("--seed", type=int, default=1, help="RNG seed (workload and stub)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--session-backend", default="redis", choices=["redis", "sqlite", "memory"])
+    parser.add_argument("--gemini-latency-ms", type=float, default=300)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=100)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-429-rate", type=float, default=0.0)
+    parser.add_argument("--url", help="Test an already running server instead (no stubs are started)")
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary directory (database, server log)")
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    gemini = redis_stub = process = None
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            gemini = GeminiStub(latency_ms=args.gemini_latency_ms, jitter_ms=args.gemini_jitter_ms,
+                                error_rate=args.gemini_error_rate, rate_limit_rate=args.gemini_429_rate,
+                                seed=args.seed).start()
+            redis_stub = RedisStub().start()
+            env = {k: v for k, v in os.environ.items() if k != "JAVA_BACKEND_URL"}
+            env.update({
+                "GEMINI_API_KEY": "load-test",
+                "GEMINI_BASE_URL": gemini.url,
+                "REDIS_HOST": "127.0.0.1",
+                "REDIS_PORT": str(redis_stub.port),
+                "SESSION_BACKEND": args.session_backend,
+                "DATABASE_PATH": os.path.join(workdir, "projects.db"),
+                "SESSION_SQLITE_PATH": os.path.join(workdir, "sessions.db"),
+            })
+            print(f"Starting app ({args.workers} worker(s)); Gemini stub at {gemini.url}, Redis stub on port {redis_stub.port}")
+            process, base_url = start_server(args.workers, env, os.path.join(workdir, "server.log"))
+
+        print(f"Seeding {args.seed_projects} projects...")
+        work = Workload(base_url, seed_projects(base_url, args.seed_projects, args.seed))
+        if not work.projects:
+            work.add_project(work.new_project_name())
+        for stub in (gemini, redis_stub):
+            if stub is not None:
+                stub.reset_counters()
+
+        print(f"Running {args.concurrency} clients for {args.warmup:g}s warm-up + {args.duration:g}s "
+              f"(mix: {', '.join(f'{k}={v:g}' for k, v in weights.items())})")
+        samples, elapsed = run_workload(work, weights, args.concurrency, args.duration, args.warmup, args.seed)
+        report = summarize(samples, elapsed)
+        gemini_stats = gemini.stats() if gemini is not None else None
+        fallbacks = fallback_counts(base_url)
+        print_report(report, gemini_stats, fallbacks)
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"config": vars(args), "elapsed_seconds": round(elapsed, 2), "endpoints": report,
+                           "gemini": gemini_stats, "fallbacks": fallbacks}, f, indent=2)
+            print(f"\nReport written to {args.json}")
+    finally:
+        if process is not None:
+            stop_server(process)
+        for stub in (gemini, redis_stub):
+            if stub is not None:
+                stub.stop()
+        if args.keep:
+            print(f"Kept {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
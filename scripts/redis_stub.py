@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Minimal in-process Redis stand-in for tests.
+
+Speaks enough RESP2 for SessionManager (strings, lists, expiry, MULTI/EXEC;
+WATCH is accepted but never aborts), the change feed (PUBLISH/SUBSCRIBE)
+and LLM budget counters (INCRBY/MGET) over a real socket, so redis-py
+connection pools and pipelines are exercised end to end. Counts round trips (socket reads that carried
+commands) and can be taken down and brought back to simulate outages.
+
+Usage:
+    stub = RedisStub().start()
+    client = redis.Redis(port=stub.port)
+    ...
+    stub.stop()
+"""
+
+import socket
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        stub: "RedisStub" = self.server.stub
+        stub.clients.add(self.request)
+        buffer = b""
+        queued: Optional[List] = None
+        while True:
+            try:
+                data = self.request.recv(65536)
+            except OSError:
+                return
+            if not data or not stub.up:
+                stub.clients.discard(self.request)
+                stub.unsubscribe(self.request)
+                return
+            buffer += data
+            commands, buffer = _parse_commands(buffer)
+            if not commands:
+                continue
+            stub.round_trips += 1
+
+            replies = []
+            for command in commands:
+                name = command[0].upper()
+                stub.commands.append([name] + command[1:])
+                if name == b"MULTI":
+                    queued = []
+                    replies.append(b"+OK\r\n")
+                elif name == b"EXEC":
+                    results = [stub.execute(queued_command) for queued_command in queued or []]
+                    replies.append(b"*%d\r\n" % len(results) + b"".join(results))
+                    queued = None
+                elif queued is not None:
+                    queued.append(command)
+                    replies.append(b"+QUEUED\r\n")
+                elif name in (b"SUBSCRIBE", b"UNSUBSCRIBE"):
+                    replies.append(stub.subscribe(self.request, name, command[1:]))
+                else:
+                    replies.append(stub.execute(command))
+            self.request.sendall(b"".join(replies))
+
+
+def _parse_commands(buffer: bytes):
+    """Split complete RESP arrays off the front of the buffer."""
+    commands = []
+    while buffer.startswith(b"*"):
+        end = buffer.find(b"\r\n")
+        if end < 0:
+            break
+        count = int(buffer[1:end])
+        pos = end + 2
+        args = []
+        for _ in range(count):
+            line_end = buffer.find(b"\r\n", pos)
+            if line_end < 0:
+                return commands, buffer
+            length = int(buffer[pos + 1:line_end])
+            start = line_end + 2
+            if len(buffer) < start + length + 2:
+                return commands, buffer
+            args.append(buffer[start:start + length])
+            pos = start + length + 2
+        commands.append(args)
+        buffer = buffer[pos:]
+    return commands, buffer
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class RedisStub:
+    """A tiny Redis server running on a background thread."""
+
+    def __init__(self, port: int = 0):
+        self.data: Dict[bytes, object] = {}
+        self.expires: Dict[bytes, float] = {}
+        self.commands: List[List[bytes]] = []
+        self.round_trips = 0
+        self.up = True
+        self.clients = set()
+        self.channels: Dict[bytes, set] = {}
+        self._port = port
+        self._server: Optional[_Server] = None
+        self._lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self._port
+
+    def start(self) -> "RedisStub":
+        """Start (or restart) serving on the same port."""
+        self.up = True
+        self._server = _Server(("127.0.0.1", self._port), _Handler)
+        self._server.stub = self
+        self._port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop serving and drop open connections (simulates an outage)."""
+        self.up = False
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        # Drop pooled client connections, like a restarted server would
+        for client in list(self.clients):
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.clients.clear()
+
+    def subscribe(self, client, name: bytes, channels: List[bytes]) -> bytes:
+        """Handle SUBSCRIBE/UNSUBSCRIBE for a client connection."""
+        kind = name.lower()
+        replies = []
+        with self._lock:
+            for channel in channels:
+                subscribers = self.channels.setdefault(channel, set())
+                if name == b"SUBSCRIBE":
+                    subscribers.add(client)
+                else:
+                    subscribers.discard(client)
+                count = sum(client in members for members in self.channels.values())
+                replies.append(b"*3\r\n" + _bulk(kind) + _bulk(channel) + b":%d\r\n" % count)
+        return b"".join(replies)
+
+    def unsubscribe(self, client):
+        with self._lock:
+            for subscribers in self.channels.values():
+                subscribers.discard(client)
+
+    def reset_counters(self):
+        self.commands = []
+        self.round_trips = 0
+
+    def _live(self, key: bytes):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def execute(self, command: List[bytes]) -> bytes:
+        name, args = command[0].upper(), command[1:]
+        with self._lock:
+            if name == b"PING":
+                return b"+PONG\r\n"
+            if name in (b"CLIENT", b"SELECT", b"WATCH", b"UNWATCH"):
+                return b"+OK\r\n"
+            if name == b"SET":
+                key, value = args[0], args[1]
+                self.data[key] = value
+                self.expires.pop(key, None)
+                options = [a.upper() for a in args[2:]]
+                if b"EX" in options:
+                    self.expires[key] = time.time() + int(args[2 + options.index(b"EX") + 1])
+                return b"+OK\r\n"
+            if name == b"GET":
+                value = self._live(args[0])
+                return _bulk(value if isinstance(value, bytes) else None)
+            if name == b"DEL":
+                removed = 0
+                for key in args:
+                    if self._live(key) is not None:
+                        removed += 1
+                    self.data.pop(key, None)
+                    self.expires.pop(key, None)
+                return b":%d\r\n" % removed
+            if name == b"RPUSH":
+                values = self._live(args[0])
+                if values is None:
+                    values = self.data[args[0]] = []
+                values.extend(args[1:])
+                return b":%d\r\n" % len(values)
+            if name == b"LPUSH":
+                values = self._live(args[0])
+                if values is None:
+                    values = self.data[args[0]] = []
+                values[:0] = reversed(args[1:])
+                return b":%d\r\n" % len(values)
+            if name == b"LLEN":
+                return b":%d\r\n" % len(self._live(args[0]) or [])
+            if name in (b"LRANGE", b"LTRIM"):
+                values = self._live(args[0]) or []
+                start, stop = int(args[1]), int(args[2])
+                start = max(0, start + len(values) if start < 0 else start)
+                stop = stop + len(values) if stop < 0 else stop
+                selected = values[start:stop + 1]
+                if name == b"LRANGE":
+                    return b"*%d\r\n" % len(selected) + b"".join(_bulk(v) for v in selected)
+                if args[0] in self.data:
+                    self.data[args[0]] = selected
+                return b"+OK\r\n"
+            if name == b"PUBLISH":
+                message = b"*3\r\n" + _bulk(b"message") + _bulk(args[0]) + _bulk(args[1])
+                delivered = 0
+                for client in list(self.channels.get(args[0], ())):
+                    try:
+                        client.sendall(message)
+                        delivered += 1
+                    except OSError:
+                        self.channels[args[0]].discard(client)
+                return b":%d\r\n" % delivered
+            if name in (b"INCR", b"INCRBY"):
+                current = self._live(args[0])
+                value = int(current or 0) + (int(args[1]) if name == b"INCRBY" else 1)
+                self.data[args[0]] = str(value).encode()
+                return b":%d\r\n" % value
+            if name == b"MGET":
+                values = [self._live(key) for key in args]
+                return b"*%d\r\n" % len(values) + b"".join(
+                    _bulk(value if isinstance(value, bytes) else None) for value in values
+                )
+            if name == b"EXPIRE":
+                if self._live(args[0]) is None:
+                    return b":0\r\n"
+                self.expires[args[0]] = time.time() + int(args[1])
+                return b":1\r\n"
+            if name == b"TTL":
+                if self._live(args[0]) is None:
+                    return b":-2\r\n"
+                expires = self.expires.get(args[0])
+                return b":%d\r\n" % (int(expires - time.time()) if expires else -1)
+            return b"-ERR unknown command '%s'\r\n" % name
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the batch parsing pipeline.
+Covers in-process parsing, pooled parsing, and result indexing.
+"""
+
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import batch_parser
+from batch_parser import parse_batch
+import process_pools
+from process_pools import shutdown_process_pools
+
+
+MESSAGES = [
+    "Create Project Alpha with 10 tasks, assign 6 to frontend (John, Sarah), 4 to backend (Mike)",
+    "What is the status of Project Alpha?",
+    "Show all projects",
+    "Delete Project Beta",
+    "Help",
+]
+
+
+def _collect(chunks):
+    results = [item for chunk in chunks for item in chunk]
+    return sorted(results, key=lambda r: r["index"])
+
+
+class TestBatchParser(unittest.TestCase):
+    """Test batch parsing without DB or LLM access."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdown_process_pools()
+
+    def test_inline_parsing(self):
+        results = _collect(parse_batch(MESSAGES, workers=1))
+        self.assertEqual([r["index"] for r in results], list(range(len(MESSAGES))))
+        self.assertEqual(
+            [r["intent"] for r in results],
+            ["CREATE_PROJECT", "GET_STATUS", "LIST_PROJECTS", "DELETE_PROJECT", "HELP"]
+        )
+        self.assertEqual(results[0]["allocations"]["frontend"]["people"], ["John", "Sarah"])
+        self.assertEqual(results[1]["message"], MESSAGES[1])
+
+    def test_pooled_parsing_matches_inline(self):
+        inline = _collect(parse_batch(MESSAGES, workers=1))
+        pooled = _collect(parse_batch(MESSAGES, workers=2, chunk_size=2))
+        self.assertEqual(pooled, inline)
+
+    def test_pool_follows_requested_workers(self):
+        _collect(parse_batch(MESSAGES, workers=2, chunk_size=2))
+        _collect(parse_batch(MESSAGES, workers=3, chunk_size=2))
+        pools = {w: e._max_workers for (w, init), e in process_pools._pools.items() if init is batch_parser._init_worker}
+        self.assertEqual(pools, {2: 2, 3: 3})
+
+    def test_empty_batch(self):
+        self.assertEqual(list(parse_batch([])), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Tests for the project change feed: DatabaseManager change listeners, the
+ChangeFeed broadcaster (with Redis fan-out via the RESP stub) and the
+/ws/projects WebSocket.
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app_harness import AppTestCase
+from change_feed import ChangeFeed
+from db_manager import DatabaseManager
+from redis_stub import RedisStub
+
+
+def collect(feed, projects=None, expected=1, publish=None, timeout=3.0):
+    """Subscribe, run publish() on another thread, and return the events received."""
+    async def run():
+        subscription = feed.subscribe(projects)
+        if publish:
+            threading.Thread(target=publish).start()
+        events = []
+        try:
+            while len(events) < expected:
+                events.append(await asyncio.wait_for(subscription.get(), timeout))
+        except asyncio.TimeoutError:
+            pass
+        feed.unsubscribe(subscription)
+        return events
+    return asyncio.run(run())
+
+
+class TestChangeListeners(unittest.TestCase):
+    """Test change events from DatabaseManager writes."""
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.db = DatabaseManager(db_path=self.db_path)
+        self.events = []
+        self.db.add_listener(self.events.append)
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def test_events_for_each_write(self):
+        self.db.create_project("Project A", 2)
+        self.db.update_project("Project A", completion=50)
+        self.db.add_tasks("Project A", [{"description": "x", "status": "Done"}])
+        self.db.delete_project("Project A")
+
+        self.assertEqual(
+            [(batch[0]["type"], batch[0]["version"]) for batch in self.events],
+            [("created", 1), ("updated", 2), ("updated", 3), ("deleted", 4)]
+        )
+        self.assertEqual(self.events[1][0]["state"]["completion"], 50)
+        self.assertEqual(self.events[2][0]["state"]["completion"], 100)
+        self.assertIsNone(self.events[3][0]["state"])
+
+    def test_no_events_without_commit(self):
+        self.db.create_project("Project A", 1)
+        with self.assertRaises(Exception):
+            self.db.create_project("Project A", 1)
+        self.assertFalse(self.db.update_project("Missing", completion=5))
+        self.assertEqual(len(self.events), 1)
+
+
+class TestChangeFeed(unittest.TestCase):
+    """Test in-process fan-out and filtering."""
+
+    def test_filtered_subscription(self):
+        feed = ChangeFeed(redis_enabled=False)
+        events = collect(feed, ["Project B"], publish=lambda: feed.publish([
+            {"type": "updated", "project": "Project A", "version": 2, "state": {}},
+            {"type": "updated", "project": "Project B", "version": 5, "state": {}},
+        ]))
+        self.assertEqual([(e["project"], e["version"]) for e in events], [("Project B", 5)])
+
+    def test_subscribe_and_unsubscribe(self):
+        feed = ChangeFeed(redis_enabled=False)
+
+        async def run():
+            subscription = feed.subscribe(["Project A"])
+            subscription.subscribe(["Project B"])
+            subscription.unsubscribe(["Project A"])
+            self.assertEqual(subscription.projects, {"Project B"})
+            subscription.unsubscribe()
+            self.assertFalse(subscription.wants("Project B"))
+            subscription.subscribe()
+            self.assertTrue(subscription.wants("anything"))
+            feed.unsubscribe(subscription)
+            self.assertEqual(feed.stats()["subscribers"], 0)
+        asyncio.run(run())
+
+    def test_slow_subscriber_gets_resync(self):
+        feed = ChangeFeed(redis_enabled=False, queue_size=4)
+
+        async def run():
+            subscription = feed.subscribe()
+            feed.publish([{"type": "updated", "project": f"P{i}", "version": 1, "state": {}} for i in range(10)])
+            await asyncio.sleep(0.05)
+            events = []
+            while not subscription.queue.empty():
+                events.append(subscription.queue.get_nowait())
+            return events, feed.stats()["overflows"]
+
+        events, overflows = asyncio.run(run())
+        self.assertIn({"type": "resync"}, events)
+        self.assertLessEqual(len(events), 4)
+        self.assertGreaterEqual(overflows, 1)
+
+
+class TestRedisFanOut(unittest.TestCase):
+    """Test cross-worker delivery through Redis pub/sub."""
+
+    def setUp(self):
+        self.stub = RedisStub().start()
+        self.feeds = [ChangeFeed(redis_enabled=True, port=self.stub.port) for _ in range(2)]
+        deadline = time.monotonic() + 5
+        while not all(feed.redis_connected for feed in self.feeds) and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+    def tearDown(self):
+        for feed in self.feeds:
+            feed.close()
+        self.stub.stop()
+
+    def test_events_reach_other_workers_once(self):
+        event = {"type": "created", "project": "Project A", "version": 1, "state": {}}
+        publisher, other = self.feeds
+        self.assertEqual(collect(other, publish=lambda: publisher.publish([event])), [event])
+        self.assertEqual(collect(publisher, expected=2, publish=lambda: publisher.publish([event]), timeout=0.5), [event])
+        self.assertEqual(other.stats()["relayed"], 2)
+
+    def test_local_delivery_survives_redis_outage(self):
+        self.stub.stop()
+        feed = self.feeds[0]
+        event = {"type": "updated", "project": "Project A", "version": 2, "state": {}}
+        self.assertEqual(collect(feed, publish=lambda: feed.publish([event])), [event])
+
+
+class TestWebSocketFeed(AppTestCase):
+    """Test /ws/projects end to end."""
+
+    def test_feed_follows_requested_projects(self):
+        with self.client.websocket_connect("/ws/projects?projects=WS Alpha") as ws:
+            self.assertEqual(ws.receive_json(), {"type": "subscribed", "projects": ["WS Alpha"]})
+            self.client.post("/projects", json={"name": "WS Beta", "total_tasks": 1})
+            self.client.post("/projects", json={"name": "WS Alpha", "total_tasks": 1})
+            event = ws.receive_json()
+            self.assertEqual((event["type"], event["project"], event["version"]), ("created", "WS Alpha", 1))
+
+            ws.send_json({"subscribe": ["WS Beta"]})
+            self.assertEqual(ws.receive_json()["projects"], ["WS Alpha", "WS Beta"])
+            self.client.put("/projects/WS Beta", json={"completion": 40})
+            event = ws.receive_json()
+            self.assertEqual((event["project"], event["state"]["completion"]), ("WS Beta", 40))
+
+            ws.send_json({"unsubscribe": "*"})
+            self.assertEqual(ws.receive_json()["projects"], [])
+            ws.send_json({"subscribe": "*"})
+            self.assertEqual(ws.receive_json()["projects"], "*")
+            self.client.delete("/projects/WS Alpha")
+            self.assertEqual(ws.receive_json()["type"], "deleted")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for ETag / If-None-Match handling on project read endpoints.
+"""
+
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app_harness import AppTestCase
+
+
+class TestConditionalGet(AppTestCase):
+    """Test ETags, 304s and Cache-Control."""
+
+    def setUp(self):
+        for project in self.main.gateway.list_all_projects():
+            self.main.gateway.delete_project(project["name"])
+        self.client.post("/projects", json={"name": "Project A", "total_tasks": 4})
+
+    def test_project_not_modified(self):
+        first = self.client.get("/projects/Project A")
+        etag = first.headers["etag"]
+        self.assertEqual(first.headers["cache-control"], "no-cache")
+
+        with patch.object(self.main.gateway, "get_project_with_risk") as fetch:
+            second = self.client.get("/projects/Project A", headers={"If-None-Match": etag})
+            fetch.assert_not_called()
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b"")
+        self.assertEqual(second.headers["etag"], etag)
+
+        self.client.put("/projects/Project A", json={"completion": 50})
+        third = self.client.get("/projects/Project A", headers={"If-None-Match": etag})
+        self.assertEqual(third.status_code, 200)
+        self.assertNotEqual(third.headers["etag"], etag)
+        self.assertEqual(third.json()["project"]["completion"], 50)
+
+    def test_recreated_project_gets_new_etag(self):
+        etag = self.client.get("/projects/Project A").headers["etag"]
+        self.client.delete("/projects/Project A")
+        self.client.post("/projects", json={"name": "Project A", "total_tasks": 4})
+        response = self.client.get("/projects/Project A", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_forecast_etag_differs(self):
+        plain = self.client.get("/projects/Project A").headers["etag"]
+        forecast = self.client.get("/projects/Project A?include_forecast=true").headers["etag"]
+        self.assertNotEqual(plain, forecast)
+
+    def test_list_tracks_portfolio_revision(self):
+        etag = self.client.get("/projects").headers["etag"]
+        with patch.object(self.main.gateway, "list_all_projects") as fetch:
+            response = self.client.get("/projects", headers={"If-None-Match": f'W/{etag}, "other"'})
+            fetch.assert_not_called()
+        self.assertEqual(response.status_code, 304)
+
+        self.main.gateway.add_tasks("Project A", ["Build login page"])
+        response = self.client.get("/projects", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get("/risk/portfolio", headers={"If-None-Match": "*"}).status_code, 304)
+
+    def test_missing_project(self):
+        response = self.client.get("/projects/Nope", headers={"If-None-Match": "*"})
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite database manager.
+Uses a throwaway database file per test.
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from db_manager import DatabaseManager
+from task_assigner import auto_assign_tasks
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Base class providing a fresh DatabaseManager."""
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.db = DatabaseManager(db_path=self.db_path)
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def create(self, name, allocations, status=None):
+        total = sum(team["count"] for team in allocations.values())
+        self.db.create_project(name, total, auto_assign_tasks(total, allocations))
+        if status:
+            self.db.update_project(name, status=status)
+
+
+class TestPersonWorkloads(DatabaseTestCase):
+    """Test cross-project workload aggregation."""
+
+    def test_workloads_across_projects(self):
+        self.create("Project A", {"frontend": {"count": 6, "people": ["John", "Sarah"]}})
+        self.create("Project B", {"backend": {"count": 5, "people": ["John"]}})
+
+        self.assertEqual(self.db.get_person_workloads(), {"John": 8, "Sarah": 3})
+        self.assertEqual(self.db.get_person_workloads(["Sarah", "Nobody"]), {"Sarah": 3, "Nobody": 0})
+
+    def test_finished_projects_ignored(self):
+        self.create("Project A", {"frontend": {"count": 4, "people": ["John"]}}, status="Completed")
+        self.assertEqual(self.db.get_person_workloads(["John"]), {"John": 0})
+
+    def test_deleted_projects_ignored(self):
+        self.create("Project A", {"frontend": {"count": 4, "people": ["John"]}})
+        self.db.delete_project("Project A")
+        self.assertEqual(self.db.get_person_workloads(), {})
+
+
+class TestWorkloadIndex(DatabaseTestCase):
+    """Test the maintained people / person_workload tables."""
+
+    def test_person_lookup(self):
+        self.create("Project A", {
+            "frontend": {"count": 6, "people": ["Sarah", "John"]},
+            "testing": {"count": 2, "people": ["Sarah"]},
+        })
+        person = self.db.get_person("Sarah")
+        self.assertEqual(person["total_assigned"], 5)
+        self.assertEqual(person["project_count"], 1)
+        self.assertEqual(
+            [(a["project"], a["team"], a["assigned_tasks"]) for a in person["assignments"]],
+            [("Project A", "frontend", 3), ("Project A", "testing", 2)]
+        )
+        self.assertIsNone(self.db.get_person("Nobody"))
+
+    def test_totals_follow_status_and_delete(self):
+        self.create("Project A", {"frontend": {"count": 4, "people": ["John"]}})
+        self.create("Project B", {"backend": {"count": 3, "people": ["John"]}})
+        self.assertEqual(self.db.get_person("John")["total_assigned"], 7)
+
+        self.db.update_project("Project A", status="Completed")
+        self.assertEqual(self.db.get_person("John")["total_assigned"], 3)
+        self.db.update_project("Project A", status="In Progress")
+        self.assertEqual(self.db.get_person("John")["total_assigned"], 7)
+
+        self.db.delete_project("Project B")
+        person = self.db.get_person("John")
+        self.assertEqual((person["total_assigned"], person["project_count"]), (4, 1))
+
+    def test_overloaded_people(self):
+        self.create("Project A", {"frontend": {"count": 30, "people": ["John", "Sarah"]}})
+        self.create("Project B", {"backend": {"count": 10, "people": ["John"]}})
+        overloaded = self.db.get_overloaded_people(threshold=20)
+        self.assertEqual([p["name"] for p in overloaded], ["John"])
+        self.assertEqual(overloaded[0]["total_assigned"], 25)
+
+    def test_duplicate_team_members_counted_once(self):
+        allocations = auto_assign_tasks(4, {"frontend": {"count": 4, "people": ["Ann", "Ann"]}})
+        self.db.create_project("Project A", 4, allocations)
+        person = self.db.get_person("Ann")
+        self.assertEqual(person["total_assigned"], allocations["frontend"]["assignments"]["Ann"])
+        self.assertEqual(self.db.get_project("Project A")["allocations"]["frontend"]["people"], ["Ann"])
+        self.db.rebuild_workload_index()
+        self.assertEqual(self.db.get_person("Ann"), person)
+
+    def test_rebuild_matches_maintained(self):
+        self.create("Project A", {"frontend": {"count": 5, "people": ["John", "Sarah"]}})
+        self.create("Project B", {"backend": {"count": 4, "people": ["John"]}}, status="Cancelled")
+        before = {n: self.db.get_person(n) for n in ("John", "Sarah")}
+        self.db.rebuild_workload_index()
+        self.assertEqual({n: self.db.get_person(n) for n in ("John", "Sarah")}, before)
+
+    def test_task_assignees_indexed(self):
+        self.create("Project A", {"frontend": {"count": 4, "people": ["Ann"]}})
+        self.db.add_tasks("Project A", [
+            {"description": "a", "team": "frontend", "assignee": "Bob"},
+            {"description": "b", "team": "frontend", "assignee": "Bob"},
+            {"description": "c", "assignee": "Ann", "status": "Done"},
+        ])
+        # Load now comes from open task rows, not the allocation
+        self.assertEqual(self.db.get_person_workloads(["Ann", "Bob"]), {"Ann": 0, "Bob": 2})
+        bob = self.db.get_person("Bob")
+        self.assertEqual((bob["project_count"], bob["assignments"][0]["assigned_tasks"]), (1, 2))
+
+        first, second, _ = self.db.get_tasks("Project A")
+        self.db.update_task(first["id"], status="Done")
+        self.db.update_task(second["id"], assignee="Cy")
+        self.assertEqual(self.db.get_person_workloads(["Ann", "Bob", "Cy"]), {"Ann": 0, "Bob": 0, "Cy": 1})
+        self.assertEqual(self.db.get_person("Bob")["project_count"], 1)   # Still holds a (done) task
+
+        self.db.update_project("Project A", status="Completed")
+        self.assertEqual(self.db.get_person_workloads(), {})
+        self.db.update_project("Project A", status="In Progress")
+        people = ("Ann", "Bob", "Cy")
+        before = {n: self.db.get_person(n) for n in people}
+        self.db.rebuild_workload_index()
+        self.assertEqual({n: self.db.get_person(n) for n in people}, before)
+
+    def test_reassigned_person_leaves_project(self):
+        self.db.create_project("Project A", 1)
+        self.db.add_tasks("Project A", [{"description": "a", "assignee": "Bob"}])
+        task = self.db.get_tasks("Project A")[0]
+        self.db.update_task(task["id"], assignee="Cy")
+        bob = self.db.get_person("Bob")
+        self.assertEqual((bob["total_assigned"], bob["project_count"], bob["assignments"]), (0, 0, []))
+        self.assertEqual(self.db.get_person("Cy")["project_count"], 1)
+
+
+class TestTasks(DatabaseTestCase):
+    """Test task rows and the project counters derived from them."""
+
+    def test_bulk_insert_and_counters(self):
+        self.db.create_project("Project A", 10)
+        added = self.db.add_tasks("Project A", [
+            {"description": f"Task {i}", "team": "backend", "status": "Done" if i < 3 else "Todo"}
+            for i in range(10)
+        ])
+        self.assertEqual(added, 10)
+        project = self.db.get_project("Project A")
+        self.assertEqual((project["tracked_tasks"], project["done_tasks"], project["completion"]), (10, 3, 30))
+        self.assertIsNone(self.db.add_tasks("Missing", [{"description": "x"}]))
+
+    def test_incremental_status_changes(self):
+        self.db.create_project("Project A", 4)
+        self.db.update_project("Project A", delayed_tasks=7)
+        self.db.add_tasks("Project A", [{"description": f"Task {i}"} for i in range(4)])
+        self.assertEqual(self.db.get_project("Project A")["delayed_tasks"], 0)
+
+        tasks = self.db.get_tasks("Project A")
+        self.db.update_task(tasks[0]["id"], status="Done")
+        self.db.update_task(tasks[1]["id"], status="Delayed")
+        self.db.update_task(tasks[1]["id"], status="Done")
+        self.db.update_task(tasks[2]["id"], status="Delayed")
+
+        project = self.db.get_project("Project A")
+        self.assertEqual((project["completion"], project["delayed_tasks"]), (50, 1))
+        self.assertEqual(len(self.db.get_tasks("Project A", status="Done")), 2)
+        self.assertFalse(self.db.update_task(99999, status="Done"))
+
+    def test_manual_fields_ignored_once_tracked(self):
+        self.db.create_project("Project A", 2)
+        self.db.add_tasks("Project A", [{"description": "a"}, {"description": "b", "status": "Done"}])
+        result = self.db.update_project("Project A", completion=90, status="In Progress")
+        self.assertEqual(result, {"updated": ["status"], "ignored": ["completion"]})
+        project = self.db.get_project("Project A")
+        self.assertEqual((project["completion"], project["status"]), (50, "In Progress"))
+        self.assertEqual(self.db.update_project("Project A", delayed_tasks=3),
+                         {"updated": [], "ignored": ["delayed_tasks"]})
+
+    def test_large_project(self):
+        self.db.create_project("Project Big", 100000)
+        self.db.add_tasks("Project Big", [{"description": f"Task {i}"} for i in range(100000)])
+        project = self.db.get_project("Project Big")
+        self.assertEqual(project["tracked_tasks"], 100000)
+        self.db.delete_project("Project Big")
+        self.assertIsNone(self.db.get_tasks("Project Big"))
+
+
+class TestRebalance(DatabaseTestCase):
+    """Test applying a rebalance plan in one transaction."""
+
+    def setUp(self):
+        super().setUp()
+        self.create("Project A", {"frontend": {"count": 14, "people": ["John", "Sarah"]}})
+        self.db.create_project("Project B", 12, {
+            "frontend": {"count": 12, "people": ["John", "Lisa"], "assignments": {"John": 12, "Lisa": 0}}
+        })
+
+    def test_dry_run_leaves_data(self):
+        plan = self.db.rebalance_workload(default_capacity=10, dry_run=True)
+        self.assertEqual(plan["overload_before"], 9)
+        self.assertEqual(plan["overload_after"], 0)
+        self.assertEqual(self.db.get_person("John")["total_assigned"], 19)
+
+    def test_apply(self):
+        plan = self.db.rebalance_workload(default_capacity=10, dry_run=False)
+        self.assertFalse(plan["dry_run"])
+        self.assertEqual(self.db.get_person("John")["total_assigned"], 10)
+        self.assertEqual(self.db.get_person_workloads(["Sarah", "Lisa"]), {"Sarah": 10, "Lisa": 6})
+        # Rosters agree with the maintained index
+        before = {n: self.db.get_person(n) for n in ("John", "Sarah", "Lisa")}
+        self.db.rebuild_workload_index()
+        self.assertEqual({n: self.db.get_person(n) for n in ("John", "Sarah", "Lisa")}, before)
+
+    def test_apply_spreads_over_duplicate_roster_rows(self):
+        # Legacy data: John listed twice on Project B's roster, 6 tasks each
+        with self.db.db.get_connection() as conn:
+            conn.execute("UPDATE team_members SET assigned_tasks = 6 WHERE person_name = 'John' AND assigned_tasks = 12")
+            conn.execute('''
+                INSERT INTO team_members (allocation_id, person_name, assigned_tasks)
+                SELECT allocation_id, 'John', 6 FROM team_members
+                WHERE person_name = 'John' AND assigned_tasks = 6
+            ''')
+        self.db.update_project("Project A", status="Completed")
+        self.db.rebuild_workload_index()
+        self.assertEqual(self.db.get_person("John")["total_assigned"], 12)
+
+        plan = self.db.rebalance_workload(default_capacity=10, capacity_overrides={"John": 3}, dry_run=False)
+        self.assertEqual(plan["moved_tasks"], 9)   # More than either roster row holds
+        with self.db.db.get_connection() as conn:
+            lowest = conn.execute("SELECT MIN(assigned_tasks) FROM team_members").fetchone()[0]
+        self.assertGreaterEqual(lowest, 0)
+        before = self.db.get_person("John")
+        self.db.rebuild_workload_index()
+        self.assertEqual(self.db.get_person("John"), before)
+
+    def test_capacity_override(self):
+        self.assertTrue(self.db.set_person_capacity("John", 19))
+        plan = self.db.rebalance_workload(default_capacity=10, dry_run=True)
+        self.assertEqual(plan["moves"], [])
+
+
+class TestStoredRisk(DatabaseTestCase):
+    """Test the maintained risk columns and top-N ranking."""
+
+    def test_top_risk_ranking(self):
+        for name in ("Project A", "Project B", "Project C"):
+            self.db.create_project(name, 10)
+        self.db.update_project("Project A", delayed_tasks=2)
+        self.db.update_project("Project B", delayed_tasks=7)
+        self.db.update_project("Project C", status="In Progress", completion=10)
+
+        top = self.db.get_top_risk_projects(2)
+        self.assertEqual([(p["name"], p["risk_score"], p["risk_level"]) for p in top],
+                         [("Project B", 70, "HIGH"), ("Project A", 20, "MEDIUM")])
+
+        self.db.update_project("Project B", delayed_tasks=0)
+        self.assertEqual(self.db.get_top_risk_projects(1)[0]["name"], "Project A")
+
+    def test_risk_follows_task_rows(self):
+        self.db.create_project("Project A", 3)
+        self.db.add_tasks("Project A", [{"description": "a", "status": "Delayed"}] * 3)
+        self.assertEqual(self.db.get_top_risk_projects(1)[0]["risk_score"], 30)
+
+
+class TestProjectHistory(DatabaseTestCase):
+    """Test the append-only history written on each project write."""
+
+    def test_history_appended(self):
+        self.db.create_project("Project A", 10)
+        self.db.update_project("Project A", status="In Progress", completion=20)
+        self.db.update_project("Project A", completion=45)
+
+        history = self.db.get_project_history("Project A")
+        self.assertEqual([h["completion"] for h in history], [45, 20, 0])
+        self.assertIsNone(self.db.get_project_history("Missing"))
+
+    def test_completion_series(self):
+        self.db.create_project("Project A", 10)
+        self.db.create_project("Project B", 10)
+        self.db.update_project("Project A", completion=30)
+
+        series = self.db.get_completion_series()
+        self.assertEqual([(name, completion) for name, _, completion in series],
+                         [("Project A", 0), ("Project A", 30), ("Project B", 0)])
+        self.assertEqual(len(self.db.get_completion_series("Project B")), 1)
+
+    def test_prune_keeps_window_and_latest(self):
+        self.db.create_project("Project A", 10)
+        self.db.create_project("Project B", 10)
+        self.db.update_project("Project A", completion=30)
+        with self.db.db.get_connection() as conn:
+            conn.execute("UPDATE project_history SET recorded_at = datetime('now', '-40 days')")
+        self.db.update_project("Project A", completion=60)
+
+        self.assertEqual(self.db.prune_history(30), 2)
+        self.assertEqual([h["completion"] for h in self.db.get_project_history("Project A")], [60])
+        self.assertEqual([h["completion"] for h in self.db.get_project_history("Project B")], [0])
+
+    def test_writes_prune_when_retention_set(self):
+        db = DatabaseManager(db_path=self.db_path, history_retention_days=30)
+        db.create_project("Project A", 10)
+        db.update_project("Project A", completion=30)
+        with db.db.get_connection() as conn:
+            conn.execute("UPDATE project_history SET recorded_at = datetime('now', '-40 days')")
+        db.update_project("Project A", completion=45)
+        self.assertEqual(len(db.get_project_history("Project A")), 3)   # Pruned at most hourly
+
+        db._history_prune_due = 0
+        db.update_project("Project A", completion=50)
+        self.assertEqual([h["completion"] for h in db.get_project_history("Project A")], [50, 45])
+
+
+class TestBatchFetch(DatabaseTestCase):
+    """Test fetching several projects in one round of queries."""
+
+    def test_get_projects(self):
+        self.create("Project A", {
+            "frontend": {"count": 4, "people": ["John", "Sarah"]},
+            "backend": {"count": 2, "people": []},
+        })
+        self.db.create_project("Project B", 3)
+
+        projects = self.db.get_projects(["Project A", "Project B", "Missing"])
+        self.assertEqual(set(projects), {"Project A", "Project B"})
+        self.assertEqual(projects["Project A"]["allocations"], {
+            "frontend": {"count": 4, "people": ["John", "Sarah"]},
+            "backend": {"count": 2, "people": []},
+        })
+        self.assertEqual(projects["Project B"]["allocations"], {})
+        self.assertEqual(self.db.get_project("Project A"), projects["Project A"])
+
+
+class TestSimulationInputs(DatabaseTestCase):
+    """Test the throughput samples and change markers used by the simulator."""
+
+    def test_task_throughput_per_team(self):
+        self.db.create_project("Project A", 10)
+        self.db.add_tasks("Project A", [
+            {"description": f"Task {i}", "team": "backend", "status": "Done" if i < 3 else "Todo"}
+            for i in range(6)
+        ] + [{"description": "Design", "team": "frontend"}])
+
+        teams = self.db.get_simulation_inputs(["Project A"])["Project A"]["teams"]
+        self.assertEqual(teams["backend"], (3, [3]))
+        self.assertEqual(teams["frontend"], (1, [0]))
+
+    def test_completed_at_follows_status(self):
+        self.db.create_project("Project A", 1)
+        self.db.add_tasks("Project A", [{"description": "Task"}])
+        task_id = self.db.get_tasks("Project A")[0]["id"]
+
+        self.db.update_task(task_id, status="Done")
+        self.assertEqual(self.db.get_simulation_inputs()["Project A"]["teams"]["unassigned"], (0, [1]))
+        self.db.update_task(task_id, status="In Progress")
+        self.assertEqual(self.db.get_simulation_inputs()["Project A"]["teams"]["unassigned"], (1, [0]))
+
+    def test_untracked_project_uses_completion_gains(self):
+        self.db.create_project("Project A", 10)
+        self.db.update_project("Project A", status="In Progress", completion=30)
+        self.db.update_project("Project A", completion=45)
+        self.assertEqual(self.db.get_simulation_inputs()["Project A"]["teams"], {"project": (55, [45])})
+
+    def test_change_marker_moves_on_write(self):
+        self.db.create_project("Project A", 10)
+        before = self.db.get_change_markers(["Project A", "Missing"])
+        self.assertEqual(list(before), ["Project A"])
+        self.db.update_project("Project A", completion=10)
+        self.assertGreater(self.db.get_change_markers()["Project A"], before["Project A"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,8 @@
 import sys
 import os
 import json
-from unittest.mock import MagicMock
+import tempfile
+from unittest.mock import MagicMock, patch
 
 # Add backend to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
@@ -10,9 +11,16 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'b
 sys.modules["google"] = MagicMock()
 sys.modules["google.genai"] = MagicMock()
 
+from config import config
 from nlp_processor import NLPProcessor
 from java_gateway import JavaGateway
 
+# Keep the demo project out of the real database
+fd, DB_PATH = tempfile.mkstemp(suffix=".db")
+os.close(fd)
+database_path = patch.object(config, "DATABASE_PATH", DB_PATH)
+database_path.start()
+
 print("=" * 80)
 print("TESTING USER'S DEMO COMMAND")
 print("=" * 80)
@@ -95,3 +103,8 @@ if saved_project:
     print("\n🎉 READY FOR DEMO!")
 else:
     print("❌ FAILED: Project not found in database.")
+
+gateway.close()
+gateway_verify.close()
+database_path.stop()
+os.remove(DB_PATH)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for completion-velocity forecasting.
+Covers the vectorized regression, trend classification, and portfolio timing.
+"""
+
+import sys
+import os
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from forecaster import forecast_completion, JULIAN_UNIX_EPOCH
+
+DAY0 = JULIAN_UNIX_EPOCH + 20000  # 2024-10-04
+
+
+class TestForecastCompletion(unittest.TestCase):
+    """Test per-project forecasts from a flat history series."""
+
+    def test_linear_progress(self):
+        rows = [("Project A", DAY0 + d, 10 * d) for d in range(5)]  # 10% per day, 40% now
+        forecast = forecast_completion(rows)["Project A"]
+        self.assertAlmostEqual(forecast["velocity_per_day"], 10.0)
+        self.assertEqual(forecast["trend"], "on_track")
+        self.assertEqual(forecast["estimated_completion_date"], "2024-10-14T00:00:00")
+
+    def test_trends(self):
+        rows = (
+            [("Done", DAY0, 90), ("Done", DAY0 + 1, 100)]
+            + [("Flat", DAY0, 30), ("Flat", DAY0 + 3, 30)]
+            + [("Single", DAY0, 20)]
+        )
+        forecasts = forecast_completion(rows)
+        self.assertEqual(forecasts["Done"]["trend"], "completed")
+        self.assertEqual(forecasts["Flat"]["trend"], "stalled")
+        self.assertIsNone(forecasts["Flat"]["estimated_completion_date"])
+        self.assertEqual(forecasts["Single"]["trend"], "insufficient_history")
+        self.assertEqual(forecasts["Single"]["samples"], 1)
+
+    def test_empty(self):
+        self.assertEqual(forecast_completion([]), {})
+
+    def test_portfolio_speed(self):
+        rows = [
+            (f"Project {p}", DAY0 + d * 0.5, min(100, (p % 9 + 1) * d))
+            for p in range(10000)
+            for d in range(10)
+        ]
+        started = time.perf_counter()
+        forecasts = forecast_completion(rows)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(len(forecasts), 10000)
+        self.assertLess(elapsed, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
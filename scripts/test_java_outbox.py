@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Tests for the Java sync outbox and its dispatcher.
+Runs the dispatcher against a local HTTP stand-in for the Java backend.
+"""
+
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from db_manager import DatabaseManager
+from java_outbox import OutboxDispatcher
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        backend = self.server.backend
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with backend.lock:
+            status = backend.statuses.pop(0) if backend.statuses else 200
+            if callable(status):
+                status = status(body)
+            backend.requests.append((self.path, status, body))
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class JavaBackendStub:
+    """Records sync requests; answers with queued statuses, then 200."""
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.backend = self
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def delivered(self):
+        """(eventId, action, project name) of every accepted event, in order."""
+        return [
+            (event["eventId"], event["action"], event["project"]["name"])
+            for _, status, body in self.requests if status < 300
+            for event in body["events"]
+        ]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class OutboxTestCase(unittest.TestCase):
+    """Base class providing an outbox-enabled database and a backend stub."""
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.db = DatabaseManager(db_path=self.db_path, outbox=True)
+        self.backend = JavaBackendStub()
+        self.dispatcher = OutboxDispatcher(
+            self.db, self.backend.url, batch_size=2, poll_interval=0.05,
+            timeout=2, retry_initial=0.05, retry_max=0.2
+        )
+
+    def tearDown(self):
+        self.dispatcher.stop()
+        self.backend.close()
+        os.remove(self.db_path)
+
+    def outbox_rows(self):
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT project_name, action, state FROM java_outbox ORDER BY id").fetchall()
+        conn.close()
+        return rows
+
+    def drain(self):
+        while self.dispatcher.dispatch_once():
+            pass
+
+    def wait_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertTrue(condition())
+
+
+class TestOutboxWrites(OutboxTestCase):
+    """Test that project writes queue events transactionally."""
+
+    def test_writes_queue_events(self):
+        self.db.create_project("Project A", 4, {"frontend": {"count": 4, "people": ["John"]}})
+        self.db.update_project("Project A", status="In Progress")
+        self.db.delete_project("Project A")
+        self.assertEqual(self.outbox_rows(), [
+            ("Project A", "CREATE", "pending"),
+            ("Project A", "UPDATE", "pending"),
+            ("Project A", "DELETE", "pending"),
+        ])
+
+        created = self.db.claim_outbox(10, 30)[0]["payload"]["project"]
+        self.assertEqual(created["status"], "Created")
+        self.assertEqual(created["teams"][0]["members"], [{"name": "John", "assignedTasks": 4}])
+
+    def test_updates_are_versioned_deltas(self):
+        people = [f"person{i}" for i in range(200)]
+        self.db.create_project("Project A", 400, {"backend": {"count": 400, "people": people}})
+        self.db.update_project("Project A", status="In Progress")
+        self.db.update_project("Project A", completion=40)
+        self.db.delete_project("Project A")
+
+        events = [event["payload"] for event in self.db.claim_outbox(10, 30)]
+        self.assertEqual([event.get("version") for event in events], [1, 2, 3, 4])
+        self.assertNotIn("delta", events[0])
+        self.assertEqual(events[1]["project"], {"name": "Project A", "status": "In Progress"})
+        self.assertEqual((events[2]["baseVersion"], events[2]["project"]), (2, {"name": "Project A", "completion": 40}))
+        self.assertLess(len(json.dumps(events[1])), len(json.dumps(events[0])) // 50)
+
+    def test_rolled_back_write_queues_nothing(self):
+        self.db.create_project("Project A", 1)
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.create_project("Project A", 1)
+        self.assertEqual(len(self.outbox_rows()), 1)
+
+    def test_disabled_outbox_queues_nothing(self):
+        plain = DatabaseManager(db_path=self.db_path)
+        plain.create_project("Project A", 1)
+        plain.update_project("Project A", completion=50)
+        self.assertEqual(self.outbox_rows(), [])
+
+
+class TestDispatcher(OutboxTestCase):
+    """Test batched delivery, retries and ordering."""
+
+    def test_delivers_in_batches_and_clears_outbox(self):
+        for name in ("Project A", "Project B"):
+            self.db.create_project(name, 1)
+        self.db.update_project("Project A", completion=50)
+        self.drain()
+
+        self.assertEqual([path for path, _, _ in self.backend.requests], ["/api/projects/sync"] * 2)
+        self.assertEqual([action for _, action, _ in self.backend.delivered()], ["CREATE", "CREATE", "UPDATE"])
+        self.assertEqual(self.outbox_rows(), [])
+        stats = self.dispatcher.stats()
+        self.assertEqual((stats["delivered"], stats["batches"]), (3, 2))
+        self.assertIsNotNone(stats["last_lag_seconds"])
+        self.assertEqual(stats["backlog"]["pending"], 0)
+
+    def test_retries_with_backoff_and_keeps_order(self):
+        self.backend.statuses = [503, 503]
+        self.db.create_project("Project A", 1)
+        for completion in (10, 20, 30):
+            self.db.update_project("Project A", completion=completion)
+
+        self.dispatcher.start()
+        self.wait_until(lambda: len(self.backend.delivered()) == 4)
+
+        delivered = self.backend.delivered()
+        self.assertEqual([event_id for event_id, _, _ in delivered], sorted(event_id for event_id, _, _ in delivered))
+        self.assertEqual(self.dispatcher.stats()["retries"], 4)
+        self.assertEqual(self.outbox_rows(), [])
+
+    def test_failing_project_does_not_block_others(self):
+        self.db.create_project("Project A", 1)
+        self.drain()
+        self.backend.statuses = [400, 503, 200]   # batch rejected, then A retried, B accepted
+        self.db.update_project("Project A", completion=10)
+        self.db.create_project("Project B", 1)
+        self.db.update_project("Project A", completion=20)
+        self.dispatcher.dispatch_once()
+
+        self.assertEqual(self.backend.delivered()[-1][2], "Project B")
+        self.assertEqual(self.outbox_rows(), [("Project A", "UPDATE", "pending")] * 2)
+        self.assertEqual(self.db.claim_outbox(10, 30), [])   # A is backing off, B is done
+
+        self.wait_until(lambda: self.dispatcher.dispatch_once() == 0 and not self.outbox_rows())
+        actions = [(action, name) for _, action, name in self.backend.delivered()]
+        self.assertEqual(actions[-2:], [("UPDATE", "Project A")] * 2)
+
+    def test_rejected_event_is_parked(self):
+        self.backend.statuses = [lambda body: 422 if body["events"][0]["action"] == "CREATE" else 200]
+        self.db.create_project("Project A", 1)
+        self.drain()
+        self.db.update_project("Project A", completion=10)
+        self.drain()
+
+        self.assertEqual(self.outbox_rows(), [("Project A", "CREATE", "failed")])
+        self.assertEqual(self.backend.delivered()[-1][1], "UPDATE")
+        stats = self.dispatcher.stats()
+        self.assertEqual((stats["failed"], stats["backlog"]["failed"]), (1, 1))
+
+    def test_concurrent_dispatchers_send_each_event_once(self):
+        for i in range(20):
+            self.db.create_project(f"Project {i}", 1)
+        other = OutboxDispatcher(DatabaseManager(db_path=self.db_path, outbox=True), self.backend.url, batch_size=3)
+        threads = [
+            threading.Thread(target=lambda d=d: [d.dispatch_once() for _ in range(10)])
+            for d in (self.dispatcher, other)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        other.stop()
+
+        event_ids = [event_id for event_id, _, _ in self.backend.delivered()]
+        self.assertEqual(sorted(event_ids), list(range(1, 21)))
+
+
+if __name__ == "__main__":
+    unittest.main()
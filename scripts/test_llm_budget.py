@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Tests for LLM token accounting and quota budgets: the counter stores,
+the budget rules (watermarks, fair share, cooldown) and the local
+fallbacks in NLPProcessor.
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ["LLM_BUDGET_BACKEND"] = "memory"
+sys.modules["google"] = MagicMock()
+sys.modules["google.genai"] = MagicMock()
+
+import metrics
+from llm_budget import LLMBudget, MemoryCounterStore, RedisCounterStore, SqliteCounterStore, get_budget
+from redis_stub import RedisStub
+
+PROMPT = "x" * 400   # 100 prompt tokens + expected output
+
+
+def usage(prompt_tokens, output_tokens):
+    return SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens)
+
+
+def denials(call, reason):
+    return metrics.LLM_BUDGET_DENIALS.labels(call, reason).value
+
+
+class StoreContract:
+    """Checks every counter store must pass (mixed into a TestCase with self.store)."""
+
+    def test_reserve_respects_limits(self):
+        ttls = {"a": 60, "b": 60}
+        self.assertIsNone(self.store.reserve({"a": 3, "b": 1}, {"a": 5}, ttls))
+        self.assertEqual(self.store.reserve({"a": 3, "b": 1}, {"a": 5}, ttls), "a")
+        self.assertEqual(self.store.get(["a", "b"]), {"a": 3, "b": 1})   # Denied reservations leave no trace
+
+        self.assertEqual(self.store.reserve({"a": 1}, {"blocked": 0}, ttls), None)
+        self.store.add({"blocked": 1}, {"blocked": 60})
+        self.assertEqual(self.store.reserve({"a": 1}, {"blocked": 0}, ttls), "blocked")
+        self.store.add({"a": -2}, ttls)
+        self.assertEqual(self.store.get(["a", "missing"]), {"a": 2, "missing": 0})
+
+    def test_counters_expire(self):
+        self.store.add({"short": 5}, {"short": 1})
+        self.assertEqual(self.store.get(["short"]), {"short": 5})
+        time.sleep(1.1)
+        self.assertEqual(self.store.get(["short"]), {"short": 0})
+        self.assertIsNone(self.store.reserve({"short": 5}, {"short": 5}, {"short": 60}))
+
+
+class TestMemoryStore(StoreContract, unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryCounterStore()
+
+
+class TestSqliteStore(StoreContract, unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.store = SqliteCounterStore(self.path)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_limit_holds_across_workers(self):
+        # Separate stores on one file stand in for separate worker processes
+        stores = [SqliteCounterStore(self.path) for _ in range(4)]
+        granted = []
+
+        def worker(store):
+            for _ in range(25):
+                if store.reserve({"n": 1}, {"n": 30}, {"n": 60}) is None:
+                    granted.append(1)
+
+        threads = [threading.Thread(target=worker, args=(store,)) for store in stores]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(granted), self.store.get(["n"])["n"]), (30, 30))
+
+
+class TestRedisStore(StoreContract, unittest.TestCase):
+
+    def setUp(self):
+        self.stub = RedisStub().start()
+        self.store = RedisCounterStore(host="127.0.0.1", port=self.stub.port)
+
+    def tearDown(self):
+        self.stub.stop()
+
+    def test_reservation_is_one_transaction(self):
+        self.store.get(["warm"])   # Connect first
+        self.stub.reset_counters()
+        self.store.reserve({"a": 1}, {"a": 5, "cooldown": 0}, {"a": 60})
+        self.assertEqual(self.stub.round_trips, 1)
+        self.assertEqual([command[0] for command in self.stub.commands],
+                         [b"MULTI", b"INCRBY", b"EXPIRE", b"MGET", b"EXEC"])
+
+    def test_outage_falls_back_to_memory(self):
+        budget = LLMBudget(self.store, requests_per_minute=100)
+        self.stub.stop()
+        self.assertIsNotNone(budget.acquire("parse", PROMPT))
+        self.assertEqual(budget.stats()["backend"], "memory")
+
+
+class TestBudget(unittest.TestCase):
+    """Test the budget rules on a private memory store."""
+
+    def budget(self, **limits):
+        return LLMBudget(MemoryCounterStore(), **{"session_share": 0, "cooldown_seconds": 30, **limits})
+
+    def test_unlimited_budget_skips_the_store(self):
+        store = MagicMock(spec=MemoryCounterStore)
+        budget = LLMBudget(store, session_share=0, cooldown_seconds=0.3)
+        tokens = metrics.LLM_TOKENS.labels("parse", "prompt").value
+        reservation = budget.acquire("parse", PROMPT, "s1")
+        self.assertEqual(reservation.estimated_tokens, 350)
+        budget.settle(reservation, usage(120, 80))
+        self.assertEqual(metrics.LLM_TOKENS.labels("parse", "prompt").value, tokens + 120)
+        self.assertEqual(store.method_calls, [])
+
+        # The 429 cooldown still applies, kept in this worker
+        budget.settle(budget.acquire("parse", PROMPT), failed=True, rate_limited=True)
+        self.assertEqual(budget.stats(), {"backend": None, "unlimited": True, "cooling_down": True})
+        self.assertIsNone(budget.acquire("parse", PROMPT))
+        self.assertEqual(store.method_calls, [])
+        time.sleep(0.35)
+        self.assertIsNotNone(budget.acquire("parse", PROMPT))
+
+    def test_limited_budget_counts(self):
+        budget = self.budget(requests_per_day=100)
+        budget.settle(budget.acquire("parse", PROMPT), usage(120, 80))
+        stats = budget.stats()
+        self.assertEqual(stats["minute"]["tokens"], {"used": 200, "limit": None})
+        self.assertEqual(stats["day"]["requests"], {"used": 1, "limit": 100})
+
+    def test_budget_is_shared(self):
+        from nlp_processor import NLPProcessor
+        import ai_engine
+        self.assertIs(NLPProcessor().budget, get_budget())
+        self.assertIs(ai_engine.budget, get_budget())
+
+    def test_optional_calls_stop_before_parsing(self):
+        budget = self.budget(requests_per_minute=10, low_watermark=0.2, headroom=0.1)
+        before = denials("response", "minute")
+        calls = ["response" if budget.acquire("response", PROMPT) else None for _ in range(10)]
+        self.assertEqual(calls.count("response"), 8)
+        self.assertEqual(denials("response", "minute"), before + 2)
+        # Parsing can still use the low-watermark reserve, up to its own headroom
+        self.assertIsNotNone(budget.acquire("parse", PROMPT))
+        self.assertIsNone(budget.acquire("parse", PROMPT))
+
+    def test_settle_charges_real_usage(self):
+        budget = self.budget(tokens_per_minute=1100, headroom=0)
+        tokens = metrics.LLM_TOKENS.labels("parse", "output").value
+        budget.settle(budget.acquire("parse", PROMPT), usage(600, 200))
+        self.assertEqual(budget.stats()["minute"]["tokens"]["used"], 800)
+        self.assertEqual(metrics.LLM_TOKENS.labels("parse", "output").value, tokens + 200)
+        self.assertIsNone(budget.acquire("parse", PROMPT))   # 800 + 350 estimated > 1100
+
+        budget.settle(budget.acquire("parse", "short"), failed=True)   # Fits: failures use no tokens
+        self.assertEqual(budget.stats()["minute"]["tokens"]["used"], 800)
+
+    def test_sessions_get_a_fair_share(self):
+        budget = self.budget(requests_per_minute=20, session_share=0.25)
+        granted = sum(budget.acquire("parse", PROMPT, "greedy") is not None for _ in range(10))
+        self.assertEqual(granted, 5)
+        self.assertIsNotNone(budget.acquire("parse", PROMPT, "other"))
+        self.assertGreater(denials("parse", "session"), 0)
+
+    def test_rate_limit_starts_cooldown(self):
+        budget = self.budget(cooldown_seconds=0.3)
+        budget.settle(budget.acquire("parse", PROMPT), failed=True, rate_limited=True)
+        self.assertTrue(budget.stats()["cooling_down"])
+        self.assertIsNone(budget.acquire("parse", PROMPT))
+        time.sleep(0.35)
+        self.assertIsNotNone(budget.acquire("parse", PROMPT))
+
+
+class TestProcessorFallbacks(unittest.TestCase):
+    """Test that NLPProcessor answers locally when the budget says so."""
+
+    def setUp(self):
+        from nlp_processor import NLPProcessor
+        self.nlp = NLPProcessor()
+        self.nlp.nlp = None   # spaCy enrichment is not under test
+        self.nlp.budget = LLMBudget(MemoryCounterStore(), requests_per_minute=4, headroom=0,
+                                    low_watermark=0.5, session_share=0)
+        self.generate = self.nlp.client.models.generate_content
+        self.generate.reset_mock(side_effect=True)
+        self.generate.return_value = SimpleNamespace(
+            text=json.dumps({"intent": "LIST_PROJECTS", "project_name": None}),
+            usage_metadata=usage(300, 40)
+        )
+
+    def test_exhausted_budget_uses_local_parser(self):
+        self.assertEqual(self.nlp.parse_input("list all projects")["intent"], "LIST_PROJECTS")
+        self.assertEqual(self.nlp.budget.stats()["minute"]["tokens"]["used"], 340)
+        # Responses may use half of the 4 requests; templates answer from there
+        self.assertNotIn("local processing", self.nlp.generate_smart_response({"intent": "UNKNOWN"}))
+        self.assertIn("local processing", self.nlp.generate_smart_response({"intent": "UNKNOWN"}))
+
+        self.nlp.parse_input("list all projects")
+        self.nlp.parse_input("list all projects")
+        parsed = self.nlp.parse_input("Delete Project Alpha")
+        self.assertEqual((parsed["intent"], parsed["project_name"]), ("DELETE_PROJECT", "Project Alpha"))
+        self.assertEqual(self.generate.call_count, 4)
+
+    def test_429_switches_to_local_answers(self):
+        self.generate.side_effect = RuntimeError("429 RESOURCE_EXHAUSTED")
+        self.nlp.budget.limits["minute"]["requests"] = 0
+        self.assertEqual(self.nlp.parse_input("Delete Project Alpha")["intent"], "DELETE_PROJECT")
+        self.nlp.parse_input("Delete Project Alpha")
+        self.assertEqual(self.generate.call_count, 1)   # Cooling down after the 429
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the load-test harness: the Gemini stand-in, the workload driver
+and the latency report.
+"""
+
+import sys
+import os
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from gemini_stub import GeminiStub
+from load_test import Workload, parse_mix, percentile, run_workload, summarize
+
+
+def generate(stub, text):
+    return requests.post(
+        f"{stub.url}/v1beta/models/gemini-2.5-flash:generateContent",
+        json={"contents": [{"role": "user", "parts": [{"text": text}]}]},
+        timeout=5
+    )
+
+
+class TestGeminiStub(unittest.TestCase):
+    """Test the generateContent stand-in."""
+
+    def test_parse_prompts_get_parser_json(self):
+        stub = GeminiStub().start()
+        try:
+            response = generate(stub, 'Parse this.\n        User Input: "Delete Project Alpha"\n        ...')
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            parsed = json.loads(body["candidates"][0]["content"]["parts"][0]["text"])
+            self.assertEqual((parsed["intent"], parsed["project_name"]), ("DELETE_PROJECT", "Project Alpha"))
+            self.assertGreater(body["usageMetadata"]["totalTokenCount"], 0)
+
+            reply = generate(stub, "You are a senior project manager AI.").json()
+            self.assertIn("Done.", reply["candidates"][0]["content"]["parts"][0]["text"])
+        finally:
+            stub.stop()
+
+    def test_injected_failures_are_reproducible(self):
+        outcomes = []
+        for _ in range(2):
+            stub = GeminiStub(rate_limit_rate=0.3, error_rate=0.2, seed=7).start()
+            try:
+                outcomes.append([generate(stub, "hi").status_code for _ in range(40)])
+            finally:
+                stub.stop()
+
+        self.assertEqual(outcomes[0], outcomes[1])
+        self.assertIn(429, outcomes[0])
+        self.assertIn(500, outcomes[0])
+        stats = stub.stats()
+        self.assertEqual(stats["rate_limited"], outcomes[0].count(429))
+        self.assertEqual(sum(stats.values()), 40)
+
+
+class _AppHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _answer(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        status = 201 if self.command == "POST" and self.path == "/projects" else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    do_GET = do_POST = do_PUT = _answer
+
+    def log_message(self, *args):
+        pass
+
+
+class TestWorkload(unittest.TestCase):
+    """Test the driver and report against a trivial HTTP app."""
+
+    def test_mix_runs_and_is_reported(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _AppHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            work = Workload(f"http://127.0.0.1:{server.server_address[1]}", ["Project A"])
+            samples, elapsed = run_workload(work, parse_mix("chat=1,create=1,get=1"), concurrency=4, duration=0.5)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        report = summarize(samples, elapsed)
+        self.assertEqual(set(report), {"POST /chat", "POST /projects", "GET /projects/{name}", "TOTAL"})
+        self.assertEqual(report["TOTAL"]["requests"], len(samples))
+        self.assertEqual(report["TOTAL"]["errors"], 0)
+        self.assertGreater(len(work.projects), 1)   # Created projects join the pool
+
+    def test_percentiles_and_errors(self):
+        samples = [("GET /x", 200, ms / 1000) for ms in range(1, 101)] + [("GET /x", 500, 0.2), ("GET /x", 0, 0.3)]
+        row = summarize(samples, elapsed=2.0)["GET /x"]
+        self.assertEqual((row["requests"], row["errors"], row["rps"]), (102, 2, 51.0))
+        self.assertEqual((row["p50_ms"], row["p99_ms"], row["max_ms"]), (51.0, 200.0, 300.0))
+        self.assertEqual(percentile([], 95), 0.0)
+        with self.assertRaises(ValueError):
+            parse_mix("chat=1,bogus=2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-process metrics (histograms, counters, Prometheus
+rendering) and the /metrics endpoint.
+"""
+
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app_harness import AppTestCase
+import metrics
+from metrics import Counter, Histogram, Registry, StageTimer, timed_methods
+
+
+def parse_samples(text):
+    """{'name{labels}': value} for every sample line of a Prometheus exposition."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            samples[name] = float(value)
+    return samples
+
+
+class TestMetricTypes(unittest.TestCase):
+    """Test histogram and counter recording and rendering."""
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("op_seconds", "Op latency", ["op"], buckets=(0.1, 1), registry=self.registry)
+        for value in (0.05, 0.5, 0.5, 3):
+            histogram.labels("read").observe(value)
+
+        samples = parse_samples(self.registry.render())
+        self.assertEqual(samples['op_seconds_bucket{op="read",le="0.1"}'], 1)
+        self.assertEqual(samples['op_seconds_bucket{op="read",le="1.0"}'], 3)
+        self.assertEqual(samples['op_seconds_bucket{op="read",le="+Inf"}'], 4)
+        self.assertEqual(samples['op_seconds_count{op="read"}'], 4)
+        self.assertAlmostEqual(samples['op_seconds_sum{op="read"}'], 4.05)
+        self.assertIn("# TYPE op_seconds histogram", self.registry.render())
+
+    def test_counter_labels_are_escaped(self):
+        counter = Counter("events_total", "Events", ["kind"], registry=self.registry)
+        counter.labels('say "hi"\n').inc()
+        counter.labels(kind="plain").inc(2)
+
+        text = self.registry.render()
+        self.assertIn('events_total{kind="say \\"hi\\"\\n"} 1.0', text)
+        self.assertIn('events_total{kind="plain"} 2.0', text)
+        with self.assertRaises(ValueError):
+            counter.labels("a", "b")
+        with self.assertRaises(ValueError):
+            Counter("events_total", "Duplicate", registry=self.registry)
+
+    def test_stage_timer_charges_running_stage(self):
+        histogram = Histogram("stage_seconds", "Stages", ["stage"], registry=self.registry)
+        stages = StageTimer(histogram)
+        stages.start("parse")
+        stages.start("handle")
+        stages.finish()
+        stages.finish()
+
+        samples = parse_samples(self.registry.render())
+        self.assertEqual(samples['stage_seconds_count{stage="parse"}'], 1)
+        self.assertEqual(samples['stage_seconds_count{stage="handle"}'], 1)
+
+    def test_timed_methods(self):
+        histogram = Histogram("method_seconds", "Methods", ["method"], registry=self.registry)
+
+        @timed_methods(histogram)
+        class Store:
+            def get(self, key):
+                return key
+
+            def fail(self):
+                raise KeyError("missing")
+
+            def _private(self):
+                return None
+
+        store = Store()
+        self.assertEqual(store.get("a"), "a")
+        with self.assertRaises(KeyError):
+            store.fail()
+        store._private()
+
+        samples = parse_samples(self.registry.render())
+        self.assertEqual(samples['method_seconds_count{method="get"}'], 1)
+        self.assertEqual(samples['method_seconds_count{method="fail"}'], 1)
+        self.assertNotIn('method_seconds_count{method="_private"}', samples)
+
+        self.registry.reset()
+        store.get("b")
+        self.assertEqual(parse_samples(self.registry.render())['method_seconds_count{method="get"}'], 1)
+
+
+class TestMetricsEndpoint(AppTestCase):
+    """Test /metrics after real requests."""
+
+    def setUp(self):
+        metrics.REGISTRY.reset()
+
+    def scrape(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        return parse_samples(response.text)
+
+    def test_chat_pipeline_is_measured(self):
+        gemini = self.main.nlp.client.models.generate_content
+        with patch.object(gemini, "side_effect", Exception("429 RESOURCE_EXHAUSTED")):
+            response = self.client.post("/chat", json={
+                "message": "Create Project Metrics with 4 tasks, assign 4 to frontend (Ann)"
+            })
+        self.assertEqual(response.status_code, 200)
+
+        samples = self.scrape()
+        for stage in ("parse", "context", "handle", "respond", "session"):
+            self.assertEqual(samples[f'chat_stage_seconds_count{{stage="{stage}"}}'], 1, stage)
+        self.assertEqual(samples['gemini_request_seconds_count{call="parse",outcome="error"}'], 1)
+        # The 429 starts the budget cooldown, so the response is not even attempted
+        self.assertNotIn('gemini_request_seconds_count{call="response",outcome="error"}', samples)
+        self.assertEqual(samples['llm_budget_denials_total{call="response",reason="cooldown"}'], 1)
+        self.assertEqual(samples['llm_fallbacks_total{call="parse"}'], 1)
+        self.assertEqual(samples['llm_fallbacks_total{call="response"}'], 1)
+        self.assertEqual(samples['chat_intents_total{intent="CREATE_PROJECT"}'], 1)
+        self.assertEqual(samples['db_query_seconds_count{method="create_project"}'], 1)
+        self.assertEqual(samples['session_operation_seconds_count{operation="write"}'], 1)
+        self.assertEqual(samples['http_request_duration_seconds_count{method="POST",route="/chat",status="200"}'], 1)
+
+    def test_etag_cache_hits(self):
+        etag = self.client.get("/projects").headers["etag"]
+        self.client.get("/projects", headers={"If-None-Match": etag})
+        self.client.get("/projects", headers={"If-None-Match": '"stale"'})
+
+        samples = self.scrape()
+        self.assertEqual(samples['cache_requests_total{cache="etag",result="hit"}'], 1)
+        self.assertEqual(samples['cache_requests_total{cache="etag",result="miss"}'], 1)
+        self.assertEqual(samples['http_request_duration_seconds_count{method="GET",route="/projects",status="304"}'], 1)
+
+    def test_disabled(self):
+        with patch.object(self.main.config, "METRICS_ENABLED", False):
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
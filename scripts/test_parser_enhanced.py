@@ -14,7 +14,7 @@ from parser import parse_command
 
 
 class TestParserIntents(unittest.TestCase):
-    """Test intent detection across all 6 types."""
+    """Test intent detection across all 7 types."""
 
     def test_get_status(self):
         for msg in ["What is the status of Project A?", "How is Project B doing?",
@@ -49,6 +49,17 @@ class TestParserIntents(unittest.TestCase):
             result = parse_command(msg)
             self.assertEqual(result["intent"], "HELP", f"Failed for: {msg}")
 
+    def test_risk_portfolio(self):
+        for msg in ["Show the top 5 riskiest projects", "Which projects are most at risk?",
+                     "Give me the risk ranking"]:
+            result = parse_command(msg)
+            self.assertEqual(result["intent"], "RISK_PORTFOLIO", f"Failed for: {msg}")
+
+    def test_risk_top_n(self):
+        self.assertEqual(parse_command("Show the top 5 riskiest projects")["top_n"], 5)
+        self.assertEqual(parse_command("List the 3 riskiest projects")["top_n"], 3)
+        self.assertIsNone(parse_command("Which projects are most at risk?")["top_n"])
+
     def test_unknown(self):
         result = parse_command("The weather is nice today")
         self.assertEqual(result["intent"], "UNKNOWN")
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Tests for SQL statement auditing: timings, the slow-query log and the
+query-plan check that keeps hot-path queries off full table scans.
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import metrics
+from config import config
+from database import Database, QueryAuditor, table_scans
+from db_manager import DatabaseManager
+from task_assigner import auto_assign_tasks
+
+
+class AuditTestCase(unittest.TestCase):
+    """Base class providing a fresh database file."""
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+
+class TestPlanParsing(unittest.TestCase):
+
+    def test_table_scans(self):
+        plan = [
+            'SCAN projects',
+            'SCAN tm',
+            'SCAN projects USING INDEX idx_projects_created',
+            'SCAN people USING COVERING INDEX idx_people_load',
+            'SEARCH p USING INTEGER PRIMARY KEY (rowid=?)',
+            'SCAN CONSTANT ROW',
+            'SCAN (subquery-1)',
+            'USE TEMP B-TREE FOR ORDER BY',
+        ]
+        self.assertEqual(table_scans(plan), ['projects', 'tm'])
+
+
+class TestQueryAuditor(AuditTestCase):
+
+    def test_statements_are_timed_and_slow_ones_logged(self):
+        auditor = QueryAuditor(slow_ms=1e-6, explain=False)   # Everything is "slow"
+        db = Database(self.db_path, auditor=auditor)
+        before = metrics.DB_SLOW_QUERIES.labels().value
+        with db.get_connection() as conn:
+            conn.execute('INSERT INTO people (name) VALUES (?)', ('Ann',))
+            conn.executemany('INSERT INTO people (name) VALUES (?)', [('Bob',), ('Cy',)])
+            for _ in range(3):
+                conn.cursor().execute('SELECT name FROM people WHERE name = ?', ('Ann',)).fetchone()
+
+        report = auditor.report()
+        calls = {item['sql']: item['calls'] for item in report['top']}
+        self.assertEqual(calls['SELECT name FROM people WHERE name = ?'], 3)
+        self.assertEqual(calls['INSERT INTO people (name) VALUES (?)'], 2)   # execute + executemany
+        self.assertEqual(metrics.DB_SLOW_QUERIES.labels().value - before, report['executions'])
+        self.assertEqual(report['slow'][-1]['sql'], 'SELECT name FROM people WHERE name = ?')
+
+    def test_new_statements_are_explained(self):
+        auditor = QueryAuditor(slow_ms=0, explain=True)
+        db = Database(self.db_path, auditor=auditor)
+        with db.get_connection() as conn:
+            conn.execute('SELECT name FROM people WHERE capacity IS NULL').fetchall()
+            conn.execute('SELECT name FROM people WHERE name = ?', ('Ann',)).fetchall()
+            conn.execute('PRAGMA table_info(people)').fetchall()
+
+        plans = auditor.plans()
+        self.assertEqual(table_scans(plans['SELECT name FROM people WHERE capacity IS NULL']), ['people'])
+        self.assertEqual(table_scans(plans['SELECT name FROM people WHERE name = ?']), [])
+        self.assertNotIn('PRAGMA table_info(people)', plans)
+        self.assertEqual([item['tables'] for item in auditor.report()['table_scans']], [['people']])
+        self.assertEqual(auditor.report()['slow'], [])
+
+    def test_auditing_is_opt_in(self):
+        with patch.object(config, 'DB_QUERY_AUDIT_ENABLED', False):
+            db = DatabaseManager(db_path=self.db_path)
+        with db.db.get_connection() as conn:
+            self.assertIs(type(conn), sqlite3.Connection)
+        self.assertEqual(db.get_query_report(), {'enabled': False})
+
+        with patch.object(config, 'DB_QUERY_AUDIT_ENABLED', True):
+            db = DatabaseManager(db_path=self.db_path)
+        db.list_all_projects()
+        report = db.get_query_report()
+        self.assertTrue(report['enabled'])
+        self.assertIn('SELECT name FROM projects ORDER BY created_at DESC', [item['sql'] for item in report['top']])
+
+
+class TestHotPathPlans(AuditTestCase):
+    """Fails when a hot-path query reads a whole table (add or fix an index)."""
+
+    def setUp(self):
+        super().setUp()
+        self.db = DatabaseManager(db_path=self.db_path)
+        for i in range(20):
+            allocations = {"frontend": {"count": 4, "people": [f"Dev{i}", "Ann"]}, "backend": {"count": 2, "people": []}}
+            self.db.create_project(f"Project {i}", 6, auto_assign_tasks(6, allocations))
+        self.db.add_tasks("Project 1", [{"description": f"Task {n}", "team": "frontend"} for n in range(10)])
+        self.auditor = self.db.db.auditor = QueryAuditor(slow_ms=0, explain=True)
+
+    def test_hot_paths_use_indexes(self):
+        db = self.db
+        allocations = {"design": {"count": 3, "people": ["Ann"]}}
+        db.create_project("Hot", 3, auto_assign_tasks(3, allocations))
+        db.get_project("Hot")
+        db.get_projects(["Hot", "Project 1"])
+        db.update_project("Hot", status="In Progress", completion=40)
+        db.list_all_projects()
+        db.get_all_projects_summary()
+        db.get_portfolio_revision()
+        db.get_project_version("Hot")
+        db.get_top_risk_projects(5)
+        db.get_project_history("Hot")
+        db.get_change_markers(["Hot"])
+        tasks = db.get_tasks("Project 1", limit=5)
+        db.get_tasks("Project 1", status="Todo")
+        db.add_tasks("Hot", [{"description": "One more", "team": "design", "assignee": "Ann"}])
+        db.update_task(tasks[0]["id"], status="Done")
+        db.update_task(tasks[1]["id"], assignee="Bob")
+        db.get_completion_series("Hot")
+        db.get_completion_series()
+        db.prune_history(30)
+        db.get_simulation_inputs(["Hot", "Project 1", "Project 2"])
+        db.claim_outbox(10, 30)
+        db.get_person("Ann")
+        db.get_person_workloads(["Ann"])
+        db.get_overloaded_people(1)
+        db.delete_project("Hot")
+
+        plans = self.auditor.plans()
+        self.assertGreater(len(plans), 20)
+        scans = {sql: table_scans(plan) for sql, plan in plans.items() if table_scans(plan)}
+        self.assertEqual(scans, {}, "hot-path queries scan whole tables")
+
+        # Newest-first listings walk idx_projects_created instead of sorting
+        listing = plans['SELECT name FROM projects ORDER BY created_at DESC']
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', listing)
+
+        # The portfolio-wide history window seeks on recorded_at
+        series = [plan for sql, plan in plans.items() if 'ORDER BY +h.project_id' in sql]
+        self.assertIn('SEARCH h USING INDEX idx_history_time (recorded_at>?)', series[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
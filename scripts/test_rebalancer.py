@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for the portfolio workload rebalancer.
+Covers the min-cost flow solver, move planning, and large-portfolio timing.
+"""
+
+import sys
+import os
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from rebalancer import MinCostFlow, plan_rebalance
+
+
+def _people(loads, capacities=None):
+    capacities = capacities or {}
+    return {
+        pid: {"name": f"P{pid}", "load": load, "capacity": capacities.get(pid)}
+        for pid, load in loads.items()
+    }
+
+
+class TestMinCostFlow(unittest.TestCase):
+    """Test the flow solver on small graphs."""
+
+    def test_prefers_cheaper_path(self):
+        solver = MinCostFlow(4)
+        solver.add_edge(0, 1, 5, 0)
+        cheap = solver.add_edge(1, 3, 3, 1)
+        dear = solver.add_edge(1, 2, 5, 4)
+        solver.add_edge(2, 3, 5, 0)
+        flow, cost = solver.solve(0, 3)
+        self.assertEqual((flow, cost), (5, 3 * 1 + 2 * 4))
+        self.assertEqual((solver.flow(cheap), solver.flow(dear)), (3, 2))
+
+    def test_no_path(self):
+        solver = MinCostFlow(3)
+        solver.add_edge(0, 1, 5, 1)
+        self.assertEqual(solver.solve(0, 2), (0, 0))
+
+    def test_long_paths_do_not_recurse(self):
+        length = 5000
+        solver = MinCostFlow(length)
+        for v in range(length - 1):
+            solver.add_edge(v, v + 1, 2, 1)
+        self.assertEqual(solver.solve(0, length - 1), (2, 2 * (length - 1)))
+
+
+class TestPlanRebalance(unittest.TestCase):
+    """Test minimal-churn move planning."""
+
+    def test_moves_within_team(self):
+        people = _people({1: 12, 2: 2})
+        workload = [(1, 100, "frontend", 12), (2, 100, "frontend", 2)]
+        plan = plan_rebalance(people, workload, default_capacity=10)
+        self.assertEqual(plan["moves"], [
+            {"from_id": 1, "to_id": 2, "project_id": 100, "team": "frontend", "tasks": 2}
+        ])
+        self.assertEqual((plan["moved_tasks"], plan["churn_cost"], plan["overload_after"]), (2, 2, 0))
+
+    def test_cross_project_only_when_needed(self):
+        people = _people({1: 15, 2: 9, 3: 0})
+        workload = [
+            (1, 100, "backend", 15),
+            (2, 100, "backend", 9),
+            (3, 200, "backend", 0),
+        ]
+        plan = plan_rebalance(people, workload, default_capacity=10, cross_project_cost=3)
+        moved_to = {m["to_id"]: m["tasks"] for m in plan["moves"]}
+        self.assertEqual(moved_to, {2: 1, 3: 4})
+        self.assertEqual(plan["churn_cost"], 1 + 4 * 3)
+
+    def test_cross_project_disabled(self):
+        people = _people({1: 15, 3: 0})
+        workload = [(1, 100, "backend", 15), (3, 200, "backend", 0)]
+        plan = plan_rebalance(people, workload, default_capacity=10, cross_project_cost=0)
+        self.assertEqual(plan["moves"], [])
+        self.assertEqual(plan["overload_after"], 5)
+
+    def test_respects_personal_capacity(self):
+        people = _people({1: 8, 2: 0}, capacities={1: 5, 2: 1})
+        workload = [(1, 100, "qa", 8), (2, 100, "qa", 0)]
+        plan = plan_rebalance(people, workload, default_capacity=10)
+        self.assertEqual(plan["moved_tasks"], 1)
+        self.assertEqual(plan["overload_after"], 2)
+
+    def test_large_portfolio(self):
+        rng = random.Random(7)
+        teams = ["frontend", "backend", "testing", "devops", "design"]
+        loads = {pid: 0 for pid in range(3000)}
+        workload = []
+        for project in range(1000):
+            for team in rng.sample(teams, 3):
+                for pid in rng.sample(range(3000), 4):
+                    tasks = rng.randint(0, 6)
+                    workload.append((pid, project, team, tasks))
+                    loads[pid] += tasks
+        plan = plan_rebalance(_people(loads), workload, default_capacity=20)
+
+        self.assertGreater(plan["overload_before"], 0)
+        self.assertEqual(sum(m["tasks"] for m in plan["moves"]), plan["moved_tasks"])
+        after = dict(loads)
+        for move in plan["moves"]:
+            after[move["from_id"]] -= move["tasks"]
+            after[move["to_id"]] += move["tasks"]
+        self.assertTrue(all(load <= 20 for pid, load in after.items() if loads[pid] <= 20))
+        self.assertLess(plan["solve_time_ms"], 10000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Tests for on-demand request profiling: the profile ring buffer, the
+cProfile and sampling profilers and the /admin/profiles endpoints.
+"""
+
+import sys
+import os
+import marshal
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app_harness import AppTestCase
+from request_profiler import ProfileStore, ProfilingMiddleware, RequestProfile
+
+
+TOKEN = "let-me-profile"
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+    return "done"
+
+
+class TestProfileStore(unittest.TestCase):
+    """Test the on-disk ring buffer."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = ProfileStore(self.directory, max_files=3)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_keeps_newest_profiles(self):
+        ids = []
+        for i in range(5):
+            profile_id = self.store.new_id()
+            ids.append(profile_id)
+            self.store.save(profile_id, b"stacks 1\n", {"mode": "sampling", "path": f"/p{i}", "started_at": i})
+
+        self.assertEqual([item["id"] for item in self.store.list()], ids[:1:-1])
+        self.assertEqual(len(os.listdir(self.directory)), 6)   # Profile + metadata each
+        self.assertIsNone(self.store.path_for(ids[0]))
+        path, metadata = self.store.path_for(ids[-1])
+        self.assertEqual((os.path.basename(path), metadata["bytes"]), (ids[-1] + ".collapsed", 9))
+
+    def test_rejects_unsafe_ids(self):
+        self.assertIsNone(self.store.path_for("../../etc/passwd"))
+        self.assertIsNone(self.store.path_for("1-2-3"))
+
+
+class TestProfilers(unittest.TestCase):
+    """Test the two profiler modes."""
+
+    def test_cprofile(self):
+        profile = RequestProfile("cprofile", 0.001)
+        self.assertEqual(profile.run(busy, 0.01), "done")
+        functions = {name for _, _, name in marshal.loads(profile.dump())}
+        self.assertIn("busy", functions)
+
+    def test_sampling(self):
+        profile = RequestProfile("sampling", 0.001)
+        self.assertEqual(profile.run(busy, 0.1), "done")
+        lines = profile.dump().decode().splitlines()
+        self.assertTrue(lines)
+        stack, _, samples = lines[0].rpartition(" ")
+        self.assertIn("busy (test_request_profiler.py", stack.split(";")[-1])
+        self.assertGreater(int(samples), 5)
+
+    def test_sample_rate_selects_requests(self):
+        scope = {"type": "http", "path": "/projects", "headers": []}
+        always = ProfilingMiddleware(None, store=MagicMock(), token=TOKEN, sample_rate=1.0, mode="sampling")
+        never = ProfilingMiddleware(None, store=MagicMock(), token=TOKEN, sample_rate=0.0)
+        self.assertEqual(always._select(scope), "sampling")
+        self.assertIsNone(never._select(scope))
+        self.assertIsNone(always._select({**scope, "path": "/admin/profiles"}))
+        self.assertIsNone(ProfilingMiddleware(None, store=MagicMock(), token="")._select(
+            {**scope, "headers": [(b"x-profile-token", b"")]}
+        ))
+
+
+class TestProfilingEndpoints(AppTestCase):
+    """Test profiling real requests through the app."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.profile_dir = tempfile.mkdtemp()
+        cls.app_env = {
+            "PROFILING_ENABLED": "true",
+            "PROFILING_TOKEN": TOKEN,
+            "PROFILING_DIR": cls.profile_dir,
+            "PROFILING_SAMPLE_INTERVAL_MS": "1",
+        }
+        super().setUpClass()
+        cls.client.post("/projects", json={"name": "Profiled", "total_tasks": 2})
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.profile_dir)
+
+    def admin(self, path, token=TOKEN):
+        return self.client.get(path, headers={"X-Profile-Token": token})
+
+    def test_only_requested_requests_are_profiled(self):
+        before = self.admin("/admin/profiles").json()["total"]
+        response = self.client.get("/projects")
+        self.assertNotIn("x-profile-id", response.headers)
+        response = self.client.get("/projects", headers={"X-Profile-Token": "wrong"})
+        self.assertNotIn("x-profile-id", response.headers)
+        self.assertEqual(self.admin("/admin/profiles").json()["total"], before)
+
+    def test_cprofile_download(self):
+        response = self.client.get("/projects/Profiled", headers={"X-Profile-Token": TOKEN})
+        self.assertEqual(response.status_code, 200)
+        profile_id = response.headers["x-profile-id"]
+
+        listed = {item["id"]: item for item in self.admin("/admin/profiles").json()["profiles"]}
+        self.assertEqual(listed[profile_id]["route"], "/projects/{name}")
+        self.assertEqual((listed[profile_id]["mode"], listed[profile_id]["status"]), ("cprofile", 200))
+
+        download = self.admin(f"/admin/profiles/{profile_id}")
+        self.assertEqual(download.status_code, 200)
+        functions = {name for _, _, name in marshal.loads(download.content)}
+        self.assertIn("get_project", functions)
+
+    def test_sampling_download(self):
+        real = self.main.gateway.list_all_projects
+        with patch.object(self.main.gateway, "list_all_projects", lambda: busy(0.05) and real()):
+            response = self.client.get("/projects", headers={"X-Profile-Token": TOKEN, "X-Profile-Mode": "sampling"})
+        download = self.admin(f"/admin/profiles/{response.headers['x-profile-id']}")
+        self.assertTrue(download.headers["content-type"].startswith("text/plain"))
+        self.assertIn("list_projects (main.py", download.text)
+        self.assertIn("busy (test_request_profiler.py", download.text)
+
+    def test_admin_endpoints_need_token(self):
+        self.assertEqual(self.admin("/admin/profiles", token="wrong").status_code, 403)
+        self.assertEqual(self.client.get("/admin/profiles").status_code, 403)
+        self.assertEqual(self.admin("/admin/profiles/999-1-0").status_code, 404)
+        with patch.object(self.main, "profile_store", None):
+            self.assertEqual(self.admin("/admin/profiles").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
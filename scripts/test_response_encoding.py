@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for orjson rendering, response compression and /chat field trimming.
+"""
+
+import sys
+import os
+import gzip
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app_harness import AppTestCase
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from response_encoding import CompressionMiddleware, ORJSONRoute, negotiate_encoding
+
+
+def make_app():
+    app = FastAPI()
+    app.router.route_class = ORJSONRoute
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big(response: Response):
+        response.headers["ETag"] = '"v1"'
+        return {"items": ["x" * 20] * 50}
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.post("/created", status_code=201)
+    async def created():
+        return {"tags": {"a"}}   # orjson can't encode sets; falls back to jsonable_encoder
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"line {i}\n" for i in range(3)), media_type="application/x-ndjson")
+
+    return app
+
+
+class TestNegotiation(unittest.TestCase):
+    """Test Accept-Encoding parsing."""
+
+    def test_negotiate(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertIsNone(negotiate_encoding("gzip;q=0, identity"))
+        self.assertIsNone(negotiate_encoding(""))
+        self.assertEqual(negotiate_encoding("*"), "gzip")
+
+    def test_brotli_preferred_when_available(self):
+        with patch("response_encoding.brotli", MagicMock()):
+            self.assertEqual(negotiate_encoding("gzip, br"), "br")
+            self.assertEqual(negotiate_encoding("gzip, br;q=0"), "gzip")
+
+
+class TestEncodingMiddleware(unittest.TestCase):
+    """Test orjson rendering and compression on a small app."""
+
+    def setUp(self):
+        self.client = TestClient(make_app())
+
+    def test_large_response_gzipped(self):
+        response = self.client.get("/big", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertEqual(response.headers["etag"], 'W/"v1"')
+        self.assertEqual(len(response.json()["items"]), 50)
+        self.assertLess(int(response.headers["content-length"]), 200)
+
+    def test_small_or_unaccepted_uncompressed(self):
+        small = self.client.get("/small", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", small.headers)
+        plain = self.client.get("/big", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", plain.headers)
+        self.assertEqual(plain.headers["etag"], '"v1"')
+        self.assertEqual(plain.content, json.dumps({"items": ["x" * 20] * 50}, separators=(",", ":")).encode())
+
+    def test_status_code_and_fallback(self):
+        response = self.client.post("/created")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"tags": ["a"]})
+
+    def test_stream_compressed_per_chunk(self):
+        with self.client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+            self.assertEqual(response.headers["content-encoding"], "gzip")
+            raw = b"".join(response.iter_raw())
+        self.assertEqual(gzip.decompress(raw), b"line 0\nline 1\nline 2\n")
+
+
+class TestChatFields(AppTestCase):
+    """Test ?fields= trimming of /chat's data object."""
+
+    def test_fields_trim_data(self):
+        parsed = {"intent": "HELP", "entities": {"a": 1}, "project_name": None, "allocations": {}}
+        with patch.object(self.main.nlp, "parse_input", return_value=dict(parsed)):
+            full = self.client.post("/chat", json={"message": "help"}).json()
+            trimmed = self.client.post("/chat?fields=intent,missing", json={"message": "help"}).json()
+            empty = self.client.post("/chat?fields=", json={"message": "help"}).json()
+        self.assertEqual(set(full["data"]), set(parsed))
+        self.assertEqual(trimmed["data"], {"intent": "HELP"})
+        self.assertEqual(empty["data"], {})
+        self.assertEqual(trimmed["response"], full["response"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite session backend.
+Covers ordering, trimming, TTL sweeping, persistence, and multi-process writers.
+"""
+
+import sys
+import os
+import multiprocessing
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from session_backends import SqliteSessionBackend
+from session_manager import SessionManager
+
+
+def _writer(db_path, worker, turns):
+    backend = SqliteSessionBackend(db_path, ttl_seconds=600, max_messages=10 ** 6)
+    for i in range(turns):
+        backend.write("shared", [
+            {"role": "user", "content": f"{worker}:{i}:q"},
+            {"role": "assistant", "content": f"{worker}:{i}:a"},
+        ])
+    backend.close()
+
+
+class SqliteTestCase(unittest.TestCase):
+    """Base class providing a backend on a fresh database file."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "sessions.db")
+        self.backend = SqliteSessionBackend(self.db_path, ttl_seconds=600, max_messages=50)
+
+    def tearDown(self):
+        self.backend.close()
+        shutil.rmtree(self.tmpdir)
+
+
+class TestSqliteBackend(SqliteTestCase):
+    """Test reads, writes, and maintenance."""
+
+    def test_write_and_read(self):
+        self.backend.write("s1", [{"role": "user", "content": "hi"}], "Project Alpha")
+        self.backend.write("s1", [{"role": "assistant", "content": "hello"}])
+        self.assertEqual(
+            self.backend.get_messages("s1", 5),
+            [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+        )
+        self.assertEqual(self.backend.get_messages("s1", 1), [{"role": "assistant", "content": "hello"}])
+        self.assertEqual(self.backend.get_project("s1"), "Project Alpha")
+        self.assertIsNone(self.backend.get_project("s2"))
+
+    def test_trims_to_max_messages(self):
+        for i in range(60):
+            self.backend.write("s1", [{"role": "user", "content": str(i)}])
+        messages = self.backend.get_messages("s1", 100)
+        self.assertEqual(len(messages), 50)
+        self.assertEqual(messages[0]["content"], "10")
+        self.assertEqual(self.backend.stats()["messages"], 50)
+
+    def test_uses_wal_and_session_seq_key(self):
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT payload FROM chat_messages WHERE session_id = ? ORDER BY seq DESC LIMIT 5",
+            ("s1",)
+        ).fetchall()
+        conn.close()
+        self.assertTrue(any("PRIMARY KEY" in row[-1] for row in plan))
+
+    def test_expiry_and_sweep(self):
+        self.backend.write("old", [{"role": "user", "content": "x"}], "Project Alpha")
+        self.backend.write("new", [{"role": "user", "content": "y"}])
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE chat_sessions SET expires_at = ? WHERE session_id = 'old'", (time.time() - 1,))
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(self.backend.get_messages("old", 5), [])
+        self.assertIsNone(self.backend.get_project("old"))
+        self.assertEqual(self.backend.sweep(), 1)
+        self.assertEqual(self.backend.stats(), {"sessions": 1, "messages": 1, "swept_sessions": 1})
+
+    def test_failed_delete_rolls_back(self):
+        self.backend.write("s1", [{"role": "user", "content": "x"}])
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TRIGGER no_delete BEFORE DELETE ON chat_sessions BEGIN SELECT RAISE(ABORT, 'locked'); END")
+        conn.commit()
+        with self.assertRaises(sqlite3.DatabaseError):
+            self.backend.delete("s1")
+        self.assertEqual(self.backend.get_messages("s1", 5), [{"role": "user", "content": "x"}])
+
+        conn.execute("DROP TRIGGER no_delete")
+        conn.commit()
+        conn.close()
+        self.backend.delete("s1")   # The connection is not stuck in the failed transaction
+        self.assertEqual(self.backend.stats()["sessions"], 0)
+
+    def test_write_after_expiry_starts_fresh(self):
+        self.backend.write("s1", [{"role": "user", "content": "old"}], "Project Alpha")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE chat_sessions SET expires_at = ? WHERE session_id = 's1'", (time.time() - 1,))
+        conn.commit()
+        conn.close()
+
+        self.backend.write("s1", [{"role": "user", "content": "new"}])
+        self.assertEqual(self.backend.get_messages("s1", 5), [{"role": "user", "content": "new"}])
+        self.assertIsNone(self.backend.get_project("s1"))
+        self.assertEqual(self.backend.stats()["messages"], 1)
+
+    def test_background_sweeper(self):
+        backend = SqliteSessionBackend(self.db_path, ttl_seconds=0.05, sweep_interval=0.05)
+        backend.write("s1", [{"role": "user", "content": "x"}])
+        deadline = time.monotonic() + 3
+        while backend.stats()["sessions"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(backend.stats()["sessions"], 0)
+        backend.close()
+
+    def test_close_releases_every_thread(self):
+        backend = SqliteSessionBackend(self.db_path, ttl_seconds=600, sweep_interval=0.05)
+        worker = threading.Thread(target=backend.write, args=("s1", [{"role": "user", "content": "x"}]))
+        worker.start()
+        worker.join()
+        time.sleep(0.1)   # Let the sweeper open its connection too
+        connections = list(backend._connections)
+        self.assertGreaterEqual(len(connections), 3)
+
+        backend.close()
+        self.assertFalse(backend._sweeper.is_alive())
+        for conn in connections:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+
+    def test_concurrent_processes(self):
+        workers, turns = 4, 50
+        processes = [
+            multiprocessing.Process(target=_writer, args=(self.db_path, w, turns))
+            for w in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        backend = SqliteSessionBackend(self.db_path, ttl_seconds=600, max_messages=10 ** 6)
+        messages = backend.get_messages("shared", 10 ** 6)
+        backend.close()
+        self.assertEqual(len(messages), workers * turns * 2)
+        for question, answer in zip(messages[0::2], messages[1::2]):
+            self.assertEqual(answer["content"], question["content"][:-1] + "a")
+
+
+class TestSqliteSessionManager(SqliteTestCase):
+    """Test SessionManager on the SQLite backend."""
+
+    def test_sessions_survive_restart(self):
+        sessions = SessionManager(backend=self.backend)
+        with sessions.unit_of_work("s1") as session:
+            session.add_message("user", "status of Project Alpha?")
+            session.set_last_project_reference("Project Alpha")
+        self.assertEqual(sessions.stats()["backend"], "sqlite")
+
+        restarted = SessionManager(backend=SqliteSessionBackend(self.db_path, ttl_seconds=600))
+        self.assertEqual(restarted.get_last_project_reference("s1"), "Project Alpha")
+        self.assertEqual(len(restarted.get_conversation_history("s1")), 1)
+        restarted.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the compact session message encoding.
+Covers round trips, legacy JSON entries, compression, and summaries.
+"""
+
+import sys
+import os
+import json
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from session_codec import encode_message, decode_message, summarize, ZLIB_FLAG
+from config import config
+
+
+class TestEncoding(unittest.TestCase):
+    """Test encoding and transparent decoding."""
+
+    def test_round_trip(self):
+        for message in (
+            {"role": "user", "content": "What is the status of Project Alpha?"},
+            {"role": "assistant", "content": "Project Alpha is on track. " * 40},
+            {"role": "summary", "content": ""},
+            {"role": "user", "content": "Ünïcödé ✅ " * 50},
+        ):
+            self.assertEqual(decode_message(encode_message(message)), message)
+
+    def test_short_messages_are_not_compressed(self):
+        encoded = encode_message({"role": "user", "content": "Help"})
+        self.assertEqual(encoded, b"\x01Help")
+
+    def test_long_messages_are_compressed(self):
+        content = "Project Alpha: 16 tasks, frontend John and Sarah, backend Mike. " * 20
+        encoded = encode_message({"role": "assistant", "content": content})
+        self.assertTrue(encoded[0] & ZLIB_FLAG)
+        self.assertLess(len(encoded), len(json.dumps({"role": "assistant", "content": content})) / 4)
+
+    def test_legacy_and_unknown_roles_use_json(self):
+        legacy = json.dumps({"role": "user", "content": "hi"})
+        self.assertEqual(decode_message(legacy), {"role": "user", "content": "hi"})
+        self.assertEqual(decode_message(legacy.encode()), {"role": "user", "content": "hi"})
+
+        odd = {"role": "tool", "content": "x", "name": "lookup"}
+        self.assertEqual(encode_message(odd)[:1], b"{")
+        self.assertEqual(decode_message(encode_message(odd)), odd)
+
+
+class TestSummarize(unittest.TestCase):
+    """Test folding messages into a summary entry."""
+
+    def test_summary_lines(self):
+        summary = summarize([
+            {"role": "user", "content": "Create Project Alpha\nwith 10 tasks"},
+            {"role": "assistant", "content": "x" * 200},
+        ])
+        lines = summary["content"].split("\n")
+        self.assertEqual(summary["role"], "summary")
+        self.assertEqual(lines[0], "user: Create Project Alpha")
+        self.assertEqual(len(lines[1]), len("assistant: ") + 80)
+
+    def test_summary_extends_previous_and_is_bounded(self):
+        previous = {"role": "summary", "content": "user: first"}
+        summary = summarize([{"role": "user", "content": "second"}], previous)
+        self.assertEqual(summary["content"], "user: first\nuser: second")
+
+        many = [{"role": "user", "content": f"question {i} " + "y" * 60} for i in range(200)]
+        bounded = summarize(many)
+        self.assertLessEqual(len(bounded["content"]), config.SESSION_SUMMARY_MAX_CHARS)
+        self.assertIn("question 199", bounded["content"])
+
+
+if __name__ == "__main__":
+    unittest.main()
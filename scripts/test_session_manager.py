@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Tests for SessionManager against an in-process Redis stand-in.
+Covers pipelined writes, the per-request unit of work, history trimming,
+the bounded in-memory fallback store, recovery after a Redis outage, and
+concurrent writers on the lock-striped store, and compact storage.
+"""
+
+import sys
+import os
+import json
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from redis_stub import RedisStub
+from session_manager import SessionManager, get_connection_pool
+from session_store import MemorySessionStore, ShardedSessionStore, MESSAGE_OVERHEAD_BYTES
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RedisTestCase(unittest.TestCase):
+    """Base class providing a fresh Redis stand-in and SessionManager."""
+
+    def setUp(self):
+        self.stub = RedisStub().start()
+        self.sessions = SessionManager(host="127.0.0.1", port=self.stub.port)
+        self.assertTrue(self.sessions.use_backend)
+        self.stub.reset_counters()
+
+    def tearDown(self):
+        self.sessions.close()
+        self.stub.stop()
+
+
+class TestPipelinedWrites(RedisTestCase):
+    """Test that multi-command writes take one round trip."""
+
+    def test_add_message_is_one_round_trip(self):
+        self.sessions.add_message("s1", "user", "hello")
+        self.assertEqual(self.stub.round_trips, 1)
+        names = [command[0] for command in self.stub.commands]
+        self.assertEqual(names, [b"MULTI", b"RPUSH", b"EXPIRE", b"LTRIM", b"EXEC"])
+        self.assertEqual(self.sessions.get_conversation_history("s1"), [{"role": "user", "content": "hello"}])
+
+    def test_history_is_trimmed(self):
+        self.sessions.backend.max_messages = 3
+        for i in range(5):
+            self.sessions.add_message("s1", "user", f"m{i}")
+        history = self.sessions.get_conversation_history("s1", limit=10)
+        self.assertEqual([m["content"] for m in history], ["m2", "m3", "m4"])
+
+    def test_managers_share_a_pool(self):
+        other = SessionManager(host="127.0.0.1", port=self.stub.port)
+        self.assertIs(other.backend.client.connection_pool, self.sessions.backend.client.connection_pool)
+        self.assertIs(get_connection_pool("127.0.0.1", self.stub.port, 0), other.backend.client.connection_pool)
+
+
+class TestUnitOfWork(RedisTestCase):
+    """Test buffering a chat turn and flushing it once."""
+
+    def test_turn_flushes_once(self):
+        self.sessions.set_last_project_reference("s1", "Project Alpha")
+        self.stub.reset_counters()
+
+        with self.sessions.unit_of_work("s1") as session:
+            session.add_message("user", "what about it?")
+            self.assertEqual(session.get_last_project_reference(), "Project Alpha")
+            self.assertEqual(session.get_last_project_reference(), "Project Alpha")
+            session.add_message("assistant", "It is on track.")
+            session.set_last_project_reference("Project Beta")
+            self.assertEqual(self.stub.round_trips, 1)  # the single reference read
+
+        self.assertEqual(self.stub.round_trips, 2)
+        self.assertEqual(self.sessions.get_last_project_reference("s1"), "Project Beta")
+        self.assertEqual(
+            [m["content"] for m in self.sessions.get_conversation_history("s1")],
+            ["what about it?", "It is on track."]
+        )
+
+    def test_flushes_when_the_turn_fails(self):
+        with self.assertRaises(RuntimeError):
+            with self.sessions.unit_of_work("s1") as session:
+                session.add_message("user", "hello")
+                raise RuntimeError("boom")
+        self.assertEqual(len(self.sessions.get_conversation_history("s1")), 1)
+
+    def test_history_includes_pending(self):
+        self.sessions.add_message("s1", "user", "first")
+        with self.sessions.unit_of_work("s1") as session:
+            session.add_message("assistant", "second")
+            self.assertEqual([m["content"] for m in session.get_conversation_history()], ["first", "second"])
+
+
+class TestCompactStorage(RedisTestCase):
+    """Test the binary encoding and compaction on Redis."""
+
+    def chat(self, turns, start=0):
+        for i in range(start, start + turns):
+            self.sessions.write("s1", [
+                {"role": "user", "content": f"What is the status of Project {i}?"},
+                {"role": "assistant", "content": f"Project {i} is In Progress at 40% with 2 delayed tasks. " * 6},
+            ])
+
+    def stored_bytes(self):
+        return sum(len(entry) for entry in self.stub.data[b"session:s1:messages"])
+
+    def test_encoding_is_smaller_than_json(self):
+        self.sessions.backend.compact_threshold = 10 ** 6
+        self.chat(20)
+        history = self.sessions.get_conversation_history("s1", limit=40)
+        json_bytes = sum(len(json.dumps(message)) for message in history)
+        self.assertEqual(len(history), 40)
+        self.assertLess(self.stored_bytes(), json_bytes / 2)
+
+    def test_compaction_folds_old_turns(self):
+        self.sessions.backend.compact_threshold, self.sessions.backend.compact_keep = 10, 4
+        self.chat(6)
+        history = self.sessions.get_conversation_history("s1", limit=100)
+        self.assertLessEqual(len(history), 10)
+        self.assertEqual(history[0]["role"], "summary")
+        self.assertTrue(history[0]["content"].startswith("user: What is the status of Project 0?"))
+        self.assertEqual(history[-1]["content"], f"Project 5 is In Progress at 40% with 2 delayed tasks. " * 6)
+
+        # A later compaction extends the existing summary
+        self.chat(4, start=6)
+        history = self.sessions.get_conversation_history("s1", limit=100)
+        self.assertEqual([m["role"] for m in history].count("summary"), 1)
+        self.assertIn("Project 0?", history[0]["content"])
+        self.assertIn("Project 6?", history[0]["content"])
+
+    def test_reads_legacy_json_entries(self):
+        self.stub.data[b"session:s1:messages"] = [json.dumps({"role": "user", "content": "old"}).encode()]
+        self.sessions.add_message("s1", "assistant", "new")
+        self.assertEqual(
+            self.sessions.get_conversation_history("s1"),
+            [{"role": "user", "content": "old"}, {"role": "assistant", "content": "new"}]
+        )
+
+
+class TestMemorySessionStore(unittest.TestCase):
+    """Test caps, TTL expiry, LRU eviction, and usage metrics."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = MemorySessionStore(
+            max_sessions=3, max_messages=2, max_bytes=10 ** 6, ttl_seconds=60, clock=self.clock
+        )
+
+    def message(self, content):
+        return {"role": "user", "content": content}
+
+    def test_message_cap_per_session(self):
+        self.store.append("s1", [self.message("a"), self.message("b"), self.message("c")])
+        self.assertEqual([m["content"] for m in self.store.get_messages("s1", 10)], ["b", "c"])
+        stats = self.store.stats()
+        self.assertEqual(stats["messages"], 2)
+        self.assertEqual(stats["approx_bytes"], 2 * (len("user") + 1 + MESSAGE_OVERHEAD_BYTES))
+
+    def test_ttl_expiry(self):
+        self.store.append("s1", [self.message("a")])
+        self.store.set_project("s2", "Project Alpha")
+        self.clock.now += 30
+        self.assertEqual(self.store.get_project("s2"), "Project Alpha")  # renews s2
+        self.clock.now += 45
+        self.assertEqual(self.store.get_messages("s1", 5), [])
+        self.assertEqual(self.store.get_project("s2"), "Project Alpha")
+        stats = self.store.stats()
+        self.assertEqual((stats["sessions"], stats["messages"], stats["expirations"]), (1, 0, 1))
+        self.assertEqual(stats["approx_bytes"], 0)
+
+    def test_lru_eviction_by_count(self):
+        for session_id in ("s1", "s2", "s3"):
+            self.store.append(session_id, [self.message(session_id)])
+        self.store.get_messages("s1", 1)  # s2 is now least recently used
+        self.store.append("s4", [self.message("s4")])
+        self.assertEqual(self.store.get_messages("s2", 1), [])
+        self.assertEqual(len(self.store.get_messages("s1", 1)), 1)
+        self.assertEqual(self.store.stats()["evictions"], 1)
+
+    def test_lru_eviction_by_bytes(self):
+        store = MemorySessionStore(10, 10, max_bytes=2 * (MESSAGE_OVERHEAD_BYTES + 104), ttl_seconds=60)
+        store.append("s1", [self.message("x" * 100)])
+        store.append("s2", [self.message("x" * 100)])
+        store.append("s3", [self.message("x" * 100)])
+        stats = store.stats()
+        self.assertEqual(stats["sessions"], 2)
+        self.assertLessEqual(stats["approx_bytes"], stats["max_bytes"])
+        self.assertEqual(store.get_messages("s1", 1), [])
+
+
+class TestMemoryFallback(unittest.TestCase):
+    """Test SessionManager without Redis."""
+
+    def test_fallback_uses_bounded_store(self):
+        stub = RedisStub().start()
+        port = stub.port
+        stub.stop()
+        sessions = SessionManager(host="127.0.0.1", port=port)
+        self.assertFalse(sessions.use_backend)
+
+        for i in range(sessions.max_messages + 5):
+            sessions.add_message("s1", "user", f"m{i}")
+        sessions.set_last_project_reference("s1", "Project Alpha")
+
+        self.assertEqual(len(sessions.get_conversation_history("s1", limit=10 ** 6)), sessions.max_messages)
+        self.assertEqual(sessions.get_last_project_reference("s1"), "Project Alpha")
+        stats = sessions.stats()
+        self.assertEqual(stats["backend"], "memory")
+        self.assertEqual(stats["memory"]["messages"], sessions.max_messages)
+
+        sessions.clear_session("s1")
+        self.assertEqual(sessions.stats()["memory"]["sessions"], 0)
+        sessions.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestRecovery(unittest.TestCase):
+    """Test probing, replay on reconnect, and reported transitions."""
+
+    def setUp(self):
+        self.stub = RedisStub().start()
+        self.sessions = SessionManager(
+            host="127.0.0.1", port=self.stub.port, probe_interval=0.05, probe_max_interval=0.2
+        )
+
+    def tearDown(self):
+        self.sessions.close()
+        self.stub.stop()
+
+    def test_outage_and_recovery(self):
+        self.sessions.add_message("s1", "user", "before outage")
+
+        self.stub.stop()
+        self.sessions.add_message("s1", "assistant", "during outage")
+        self.sessions.set_last_project_reference("s1", "Project Alpha")
+        self.assertFalse(self.sessions.use_backend)
+        self.assertEqual(self.sessions.stats()["durable"]["state"], "disconnected")
+
+        self.stub.start()
+        self.assertTrue(wait_for(lambda: self.sessions.use_backend))
+
+        self.assertEqual(
+            [m["content"] for m in self.sessions.get_conversation_history("s1")],
+            ["before outage", "during outage"]
+        )
+        self.assertEqual(self.sessions.get_last_project_reference("s1"), "Project Alpha")
+        stats = self.sessions.stats()
+        self.assertEqual(stats["durable"]["replayed_messages"], 1)
+        self.assertEqual(stats["memory"]["sessions"], 0)
+        self.assertEqual(
+            [t["state"] for t in stats["durable"]["transitions"]],
+            ["connected", "disconnected", "connected"]
+        )
+
+    def test_backoff_grows_while_down(self):
+        self.stub.stop()
+        self.sessions.add_message("s1", "user", "hello")
+        time.sleep(0.5)
+        self.assertFalse(self.sessions.use_backend)
+        self.assertLessEqual(self.sessions.stats()["durable"]["next_probe_in_seconds"], 0.2)
+        self.assertEqual(self.sessions.get_conversation_history("s1"), [{"role": "user", "content": "hello"}])
+
+
+class TestConcurrency(unittest.TestCase):
+    """Stress the sharded store with many threads sharing sessions."""
+
+    THREADS = 64
+
+    def setUp(self):
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+
+    def run_threads(self, turn, turns, sessions):
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker(thread_id):
+            barrier.wait()
+            for i in range(turns):
+                turn(f"s{thread_id % sessions}", thread_id, i)
+
+        threads = [threading.Thread(target=worker, args=(t,)) for t in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def assert_complete_and_ordered(self, read, turns, sessions):
+        per_session = self.THREADS // sessions * turns * 2
+        for n in range(sessions):
+            messages = read(f"s{n}", per_session * 2)
+            self.assertEqual(len(messages), per_session)
+
+            last_turn = {}
+            for question, answer in zip(messages[0::2], messages[1::2]):
+                thread_id, i, _ = question["content"].split(":")
+                self.assertEqual((question["role"], answer["role"]), ("user", "assistant"))
+                self.assertEqual(answer["content"], f"{thread_id}:{i}:a")
+                self.assertGreater(int(i), last_turn.get(thread_id, -1))
+                last_turn[thread_id] = int(i)
+            self.assertEqual(set(last_turn.values()), {turns - 1})
+
+    def test_sharded_store(self):
+        store = ShardedSessionStore(4, max_sessions=1000, max_messages=10 ** 6, max_bytes=10 ** 9, ttl_seconds=60)
+
+        def turn(session_id, thread_id, i):
+            store.append(session_id, [
+                {"role": "user", "content": f"{thread_id}:{i}:q"},
+                {"role": "assistant", "content": f"{thread_id}:{i}:a"},
+            ])
+
+        self.run_threads(turn, turns=400, sessions=8)
+        self.assert_complete_and_ordered(store.get_messages, turns=400, sessions=8)
+        self.assertEqual(store.stats()["messages"], self.THREADS * 400 * 2)
+
+    def test_units_of_work_without_redis(self):
+        stub = RedisStub().start()
+        port = stub.port
+        stub.stop()
+        sessions = SessionManager(host="127.0.0.1", port=port)
+        # Two threads per session, staying within the per-session message cap
+        turns = sessions.max_messages // 4
+
+        def turn(session_id, thread_id, i):
+            with sessions.unit_of_work(session_id) as session:
+                session.add_message("user", f"{thread_id}:{i}:q")
+                session.add_message("assistant", f"{thread_id}:{i}:a")
+
+        try:
+            self.run_threads(turn, turns=turns, sessions=self.THREADS // 2)
+            self.assert_complete_and_ordered(sessions.get_conversation_history, turns=turns, sessions=self.THREADS // 2)
+        finally:
+            sessions.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for the Monte Carlo schedule simulator.
+Covers finish-day sampling, percentile dates, and pooled portfolio runs.
+"""
+
+import sys
+import os
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import process_pools
+import simulator
+from process_pools import shutdown_process_pools
+from simulator import simulate_finish_days, simulate_project, simulate_portfolio
+
+TODAY = datetime(2026, 1, 1)
+
+
+class TestFinishDays(unittest.TestCase):
+    """Test the vectorized per-team trials."""
+
+    def test_constant_throughput(self):
+        finish = simulate_finish_days(10, [2, 2, 2], 500, np.random.default_rng(0))
+        self.assertTrue(np.all(finish == 5))
+
+    def test_no_throughput_never_finishes(self):
+        finish = simulate_finish_days(10, [0, 0], 100, np.random.default_rng(0))
+        self.assertTrue(np.all(np.isinf(finish)))
+
+    def test_slow_team_crosses_blocks(self):
+        finish = simulate_finish_days(300, [1, 0, 2], 1000, np.random.default_rng(1))
+        self.assertTrue(np.all(np.isfinite(finish)))
+        self.assertAlmostEqual(finish.mean(), 300, delta=15)
+
+
+class TestSimulateProject(unittest.TestCase):
+    """Test percentile dates and statuses for one project."""
+
+    def test_slowest_team_sets_the_date(self):
+        result = simulate_project("Project A", {
+            "frontend": (10, [5, 5]),
+            "backend": (10, [1, 1]),
+        }, trials=200, today=TODAY)
+        self.assertEqual(result["status"], "simulated")
+        self.assertEqual(result["p50"], "2026-01-11")
+        self.assertEqual(result["p95"], "2026-01-11")
+        self.assertEqual(result["teams"]["frontend"]["p80_days"], 2.0)
+        self.assertEqual(result["remaining"], 20)
+
+    def test_percentiles_are_ordered(self):
+        result = simulate_project("Project A", {"backend": (40, [0, 1, 3, 0, 6])}, trials=5000, today=TODAY)
+        self.assertLess(result["p50"], result["p95"])
+        self.assertLessEqual(result["p50"], result["p80"])
+
+    def test_reproducible_for_same_seed(self):
+        teams = {"backend": (40, [0, 1, 3, 0, 6])}
+        first = simulate_project("Project A", teams, trials=1000, seed=7)
+        self.assertEqual(simulate_project("Project A", teams, trials=1000, seed=7), first)
+
+    def test_statuses(self):
+        self.assertEqual(simulate_project("Done", {"backend": (0, [1])}, 100, today=TODAY)["p80"], "2026-01-01")
+        self.assertEqual(simulate_project("New", {"backend": (5, [0, 0])}, 100)["status"], "insufficient_history")
+        stalled = simulate_project("Stalled", {"a": (5, [1]), "b": (5, [0])}, 100)
+        self.assertEqual(stalled["status"], "stalled")
+        self.assertIsNone(stalled["p80"])
+
+    def test_percentiles_past_unfinished_trials_are_none(self):
+        finish = np.concatenate([np.arange(1.0, 91.0), np.full(10, np.inf)])
+        p50, p80, p95 = simulator._finish_percentiles(finish, (50, 80, 95))
+        self.assertEqual((p50, p80), (51.0, 81.0))
+        self.assertIsNone(p95)
+
+
+class TestSimulatePortfolio(unittest.TestCase):
+    """Test portfolio runs in-process and over the pool."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdown_process_pools()
+
+    def test_pooled_matches_inline(self):
+        projects = {
+            f"Project {i}": ({"backend": (10 + i, [0, 1, 2, 3])}, i)
+            for i in range(40)
+        }
+        inline = simulate_portfolio(projects, trials=500, workers=1)
+        pooled = simulate_portfolio(projects, trials=500, workers=2)
+        self.assertEqual(len(inline), 40)
+        self.assertEqual(pooled, inline)
+
+    def test_pool_follows_requested_workers(self):
+        projects = {f"Project {i}": ({"backend": (5, [1, 2])}, i) for i in range(40)}
+        simulate_portfolio(projects, trials=100, workers=2)
+        simulate_portfolio(projects, trials=100, workers=3)
+        pools = {w: e._max_workers for (w, init), e in process_pools._pools.items() if init is None}
+        self.assertEqual(pools, {2: 2, 3: 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
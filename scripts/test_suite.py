@@ -6,18 +6,14 @@ from unittest.mock import MagicMock, patch
 
 # Add backend to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+sys.path.insert(0, os.path.dirname(__file__))
 
-from fastapi.testclient import TestClient
-# Mock google.genai BEFORE importing nlp_processor to avoid API key checks/init
-sys.modules["google"] = MagicMock()
-sys.modules["google.genai"] = MagicMock()
-
-from main import app
+# Mocks google.genai and gives the app its own temporary database
+from app_harness import AppTestCase
 from nlp_processor import NLPProcessor
 
-class TestChatbot(unittest.TestCase):
+class TestChatbot(AppTestCase):
     def setUp(self):
-        self.client = TestClient(app)
         self.nlp = NLPProcessor()
         
         # Mock the Gemini client inside NLPProcessor
@@ -43,7 +39,10 @@ class TestChatbot(unittest.TestCase):
             "allocations": {},
             "validation_error": None
         }
-        mock_gateway.get_project_status.return_value = {"name": "Project Alpha", "status": "In Progress"}
+        mock_gateway.get_project_with_risk.return_value = {
+            "project": {"name": "Project Alpha", "status": "In Progress"},
+            "risk_analysis": {"risk_score": 0, "risk_level": "LOW", "risk_factors": []}
+        }
         mock_gen.return_value = "Project Alpha is 75% complete."
 
         response = self.client.post("/chat", json={"message": "Status of Project Alpha"})
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Tests for the task auto-assignment engine.
-Covers keyword categorization, round-robin distribution, suggestion, and Java payload generation.
+Covers keyword categorization, round-robin and capacity-aware distribution,
+suggestion, and Java payload generation.
 """
 
 import sys
@@ -14,7 +15,10 @@ from task_assigner import (
     categorize_task,
     categorize_tasks_batch,
     distribute_tasks_round_robin,
+    distribute_tasks_by_capacity,
     auto_assign_tasks,
+    auto_assign_tasks_by_capacity,
+    build_task_rows,
     suggest_allocation,
     generate_java_payload,
 )
@@ -93,6 +97,76 @@ class TestAutoAssign(unittest.TestCase):
         self.assertEqual(result["frontend"]["assignments"], {})
 
 
+class TestCapacityAssignment(unittest.TestCase):
+    """Test workload-aware distribution against existing load and capacity."""
+
+    def test_balances_existing_load(self):
+        result, warnings = distribute_tasks_by_capacity(
+            6, ["John", "Sarah"], current_load={"John": 40, "Sarah": 0}
+        )
+        self.assertEqual(result, {"John": 0, "Sarah": 6})
+        self.assertEqual(warnings, [])
+
+    def test_levels_load(self):
+        result, _ = distribute_tasks_by_capacity(
+            10, ["A", "B", "C"], current_load={"A": 5, "B": 2, "C": 0}
+        )
+        totals = {"A": 5 + result["A"], "B": 2 + result["B"], "C": result["C"]}
+        self.assertEqual(sum(result.values()), 10)
+        self.assertLessEqual(max(totals.values()) - min(totals.values()), 1)
+
+    def test_respects_capacity(self):
+        result, warnings = distribute_tasks_by_capacity(
+            5, ["A", "B"], current_load={"A": 0, "B": 0}, capacities={"A": 1}
+        )
+        self.assertEqual(result, {"A": 1, "B": 4})
+        self.assertEqual(warnings, [])
+
+    def test_overflow_warning(self):
+        result, warnings = distribute_tasks_by_capacity(
+            5, ["A", "B"], current_load={"A": 2, "B": 2}, capacities={"A": 3, "B": 3}
+        )
+        self.assertEqual(sum(result.values()), 5)
+        self.assertTrue(any("exceed" in w for w in warnings))
+        self.assertTrue(any("A is over capacity" in w for w in warnings))
+
+    def test_person_on_two_teams(self):
+        allocations = {
+            "frontend": {"count": 4, "people": ["John", "Sarah"]},
+            "backend": {"count": 4, "people": ["John", "Mike"]},
+        }
+        result, _ = auto_assign_tasks_by_capacity(8, allocations, {"Sarah": 10})
+        self.assertEqual(result["frontend"]["assignments"], {"John": 4, "Sarah": 0})
+        self.assertEqual(result["backend"]["assignments"], {"John": 0, "Mike": 4})
+
+    def test_large_team(self):
+        people = [f"P{i}" for i in range(5000)]
+        load = {p: i % 7 for i, p in enumerate(people)}
+        result, warnings = distribute_tasks_by_capacity(20000, people, load)
+        self.assertEqual(sum(result.values()), 20000)
+        self.assertEqual(warnings, [])
+
+
+class TestBuildTaskRows(unittest.TestCase):
+    """Test task row generation for the tasks table."""
+
+    def test_categorized_round_robin(self):
+        allocations = {"frontend": {"count": 3, "people": ["John", "Sarah"]}}
+        rows = build_task_rows(
+            ["Build login page", "Style the header", "Create API endpoint", "Design footer layout"],
+            allocations
+        )
+        frontend = [r for r in rows if r["team"] == "frontend"]
+        self.assertEqual([r["assignee"] for r in frontend], ["John", "Sarah", "John"])
+        backend = [r for r in rows if r["team"] == "backend"]
+        self.assertEqual(backend, [{"description": "Create API endpoint", "team": "backend", "assignee": None}])
+
+    def test_explicit_team(self):
+        rows = build_task_rows(["Anything"], {"qa": {"count": 1, "people": ["Lisa"]}}, team="qa")
+        self.assertEqual(rows[0]["team"], "qa")
+        self.assertEqual(rows[0]["assignee"], "Lisa")
+
+
 class TestSuggestAllocation(unittest.TestCase):
     """Test allocation suggestion."""
 
@@ -129,6 +203,49 @@ class TestJavaPayload(unittest.TestCase):
         payload = generate_java_payload("P", 0, {}, action="DELETE")
         self.assertEqual(payload["action"], "DELETE")
 
+    def test_update_delta(self):
+        allocations = {
+            "frontend": {"count": 4, "people": ["John", "Sarah"], "assignments": {"John": 2, "Sarah": 2}},
+            "backend": {"count": 2, "people": ["Mike"], "assignments": {"Mike": 2}},
+        }
+        previous = generate_java_payload("P", 6, allocations, version=3, fields={"status": "Created"})
+        allocations = {
+            "frontend": {"count": 4, "people": ["John", "Lisa"], "assignments": {"John": 3, "Lisa": 1}},
+            "testing": {"count": 1, "people": [], "assignments": {}},
+        }
+        delta = generate_java_payload(
+            "P", 6, allocations, action="UPDATE", previous=previous, version=4, fields={"status": "In Progress"}
+        )
+
+        self.assertEqual(delta, {
+            "action": "UPDATE",
+            "delta": True,
+            "version": 4,
+            "baseVersion": 3,
+            "project": {
+                "name": "P",
+                "status": "In Progress",
+                "teams": [
+                    {
+                        "teamName": "frontend",
+                        "members": [{"name": "John", "assignedTasks": 3}, {"name": "Lisa", "assignedTasks": 1}],
+                        "removedMembers": ["Sarah"]
+                    },
+                    {"teamName": "testing", "taskCount": 1, "members": []},
+                ],
+                "removedTeams": ["backend"]
+            }
+        })
+
+    def test_unchanged_update_is_minimal(self):
+        people = [f"person{i}" for i in range(500)]
+        allocations = {"backend": {"count": 1000, "people": people}}
+        previous = generate_java_payload("P", 1000, allocations, version=1, fields={"completion": 10})
+        delta = generate_java_payload(
+            "P", 1000, allocations, action="UPDATE", previous=previous, version=2, fields={"completion": 20}
+        )
+        self.assertEqual(delta["project"], {"name": "P", "completion": 20})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -10,10 +10,13 @@ import unittest
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
+from config import config
 from validators import (
     validate_project_creation,
     validate_allocations,
     validate_project_update,
+    validate_tasks,
+    validate_task_update,
     check_duplicate_project,
 )
 
@@ -41,9 +44,9 @@ class TestProjectCreationValidation(unittest.TestCase):
         self.assertFalse(valid)
 
     def test_tasks_too_many(self):
-        valid, error = validate_project_creation("Project A", 1001)
+        valid, error = validate_project_creation("Project A", config.MAX_TASKS_PER_PROJECT + 1)
         self.assertFalse(valid)
-        self.assertIn("1000", error)
+        self.assertIn(str(config.MAX_TASKS_PER_PROJECT), error)
 
     def test_none_tasks(self):
         valid, error = validate_project_creation("Project A", None)
@@ -113,6 +116,34 @@ class TestProjectUpdateValidation(unittest.TestCase):
         self.assertFalse(valid)
 
 
+class TestTaskValidation(unittest.TestCase):
+    """Test task row and task update validation."""
+
+    def test_valid_tasks(self):
+        valid, error = validate_tasks([{"description": "Build login page", "due_date": "2026-01-31"}])
+        self.assertTrue(valid)
+
+    def test_empty_description(self):
+        valid, error = validate_tasks([{"description": "  "}])
+        self.assertFalse(valid)
+
+    def test_task_limit_counts_existing_tasks(self):
+        existing = config.MAX_TASKS_PER_PROJECT - 1
+        valid, error = validate_tasks([{"description": "Build login page"}], existing)
+        self.assertTrue(valid)
+        valid, error = validate_tasks([{"description": "Build login page"}] * 2, existing)
+        self.assertFalse(valid)
+        self.assertIn(str(config.MAX_TASKS_PER_PROJECT), error)
+
+    def test_invalid_due_date(self):
+        valid, error = validate_task_update(due_date="next week")
+        self.assertFalse(valid)
+
+    def test_invalid_task_status(self):
+        valid, error = validate_task_update(status="Finished")
+        self.assertFalse(valid)
+
+
 class TestDuplicateCheck(unittest.TestCase):
     """Test duplicate project detection."""
 